@@ -1,19 +1,16 @@
-from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QPushButton, QListWidget, QFileDialog,
-                              QListWidgetItem, QLineEdit, QLabel, QHBoxLayout, QCheckBox, QMessageBox)
-from PyQt5.QtGui import (QIcon, QPixmap, QFontDatabase, QDropEvent, QDragMoveEvent, QCloseEvent)
-from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QPushButton, QFileDialog, QAbstractItemView,
+                              QLineEdit, QLabel, QHBoxLayout, QMessageBox, QProgressBar)
+from PyQt5.QtGui import (QIcon, QPixmap, QCloseEvent, QPaintEvent)
+from PyQt5.QtCore import (Qt, QModelIndex, QTimer)
 
-import py7zr
 import rarfile
-import zipfile
 import sys
-import shutil
 import os
-import threading
+import multiprocessing
 import re
-import filecmp
 import errno
-import json
+import sqlite3
+import time
 
 try:
     import winreg
@@ -22,18 +19,22 @@ except ImportError: #this is thrown when executed on any os that isn't windows
     WINREG_IMPORTED = False
 
 from constants import *
-import deadlock_mod_browser
+from mod_store import (INGEST_BUFFER_SIZE, ContentHashIndex, compute_content_hash, make_content_key)
+from mod_extraction import ExtractedMod
+from mod_ingestion import (IngestionEngine, ImportJob, ImportResult, is_supported_mod_file)
+from mod_deployment import (DEPLOYMENT_SNAPSHOT_COUNT, deploy_staged, plan_deployment, rollback_deployment, list_snapshots, snapshot_pinned_size)
+from gameinfo_patcher import (GAMEINFO_SUBPATH, GameInfoPatcher, KeyValuesSyntaxError)
+from settings_store import SettingsStore
+from mod_library import (ModLibrary, ModRecord)
+from mod_list_model import (ModListModel, ModListView, MOD_ID_ROLE)
+from mod_search_index import ModSearchModel
+from startup_timing import StartupTimer
+from font_manager import FontManager
 
 APPLICATION_TITLE = "EZ Deadlock Mod Manager"
 APPLICATION_DIMENSIONS = [100, 100, 1000, 800]
 WARNING_DIMENSION = 20
 
-#extracted mods are stored in the paths here
-GAMEBANANA_DIRECTORY = os.path.join(APPLICATION_DIRECTORY, "GameBanana")
-MOD_DIRECTORY = os.path.join(GAMEBANANA_DIRECTORY, "Mods")
-SOUND_DIRECTORY = os.path.join(GAMEBANANA_DIRECTORY, "Sounds")
-VPK_DIRECTORY = os.path.join(APPLICATION_DIRECTORY, "VPK Files")
-
 #these are always found under /Deadlock/
 DEADLOCK_ADDON_SUBDIRECTORY = os.path.join("game", "citadel", "addons")
 DEADLOCK_GAME_SUBDIRECTORY = os.path.join("game", "bin", "win64", "deadlock.exe")
@@ -43,6 +44,10 @@ DEFAULT_GAME_FOLDER = os.path.join("C:\\", "Program Files (x86)", "Steam", "stea
 DEFAULT_ADDON_DIRECTORY = os.path.join("C:\\", "Program Files (x86)", "Steam", "steamapps", "common", "Deadlock", "game", "citadel", "addons")
 DEFAULT_GAME_EXECUTABLE_PATH = os.path.join("C:\\", "Program Files (x86)", "Steam", "steamapps", "common", "Deadlock", "game", "bin", "win64", "deadlock.exe")
 
+#the mod list is filled this many mods at a time at startup, for at most this many seconds before the event loop gets to run again (see start_loading())
+MOD_LIST_LOAD_BATCH_SIZE = 100
+MOD_LIST_LOAD_TIME_SLICE = 0.01
+
 #the maximum .vpk files that are loadable within the game, we will never copy over more than this amount into the game's addon folder
 MAXIMUM_MOD_AMOUNT = 99
 
@@ -109,10 +114,11 @@ def find_rar_tool() -> tuple[str | None, str | None]:
 
 class ModManager(QWidget):
     '''
-    The main mod manager application.
+    The main mod manager application. Only the window itself is built here, the settings and the mod list are loaded once it has been painted, see start_loading().
     '''
-    def __init__(self) -> None:
+    def __init__(self, startup_timer: StartupTimer | None=None) -> None:
         super().__init__()
+        self.startup_timer = startup_timer if startup_timer else StartupTimer()
 
         path_to_icon = get_resource_path(WINDOW_ICON_PATH_SUFFIX)
         self.setWindowIcon(QIcon(path_to_icon))
@@ -120,16 +126,41 @@ class ModManager(QWidget):
         self.setGeometry(*APPLICATION_DIMENSIONS)
         self.setObjectName("modmanager")
 
-        #these references belong to the mod browser (not mod list) and are needed to ensure that they aren't garbage collected
-        self.workers_and_threads = {}
-        self.worker_thread_lock = threading.Lock()
-        self.mod_browser = None
+        self.mod_browser = None #created the first time it is opened, see open_mod_browser()
 
         self.settings_menu = None
 
         self.finished_initial_load = False #set once .read_profile() is called successfully and mod list is loaded
+        self.loading_started = False #set once the window is first painted, see paintEvent()
+        self.pending_mods: list[ModRecord] = [] #mods read from the mod library that haven't been added to the mod list yet, see _load_mod_batch()
+        self.mod_batch_timer = QTimer(self)
+        self.mod_batch_timer.setInterval(0) #runs whenever the event loop is idle
+        self.mod_batch_timer.timeout.connect(self._load_mod_batch)
+        self.settings_store = SettingsStore() #all reads and writes of SETTINGS_FILE_PATH go through this, see settings_store.py
+
+        #the mod list is stored in an sqlite database, see mod_library.py
+        self.mod_library_opened = True
+        try:
+            self.mod_library = ModLibrary()
+        except sqlite3.Error as e:
+            print("Error with opening the mod library, changes to the mod list will not be saved: " + str(e))
+            self.mod_library = ModLibrary(":memory:")
+            self.mod_library_opened = False
         self.rar_tool_found = False
 
+        #content keys (size + hash) of every mod in the mod list, used for constant time duplicate detection
+        self.content_index = ContentHashIndex()
+        self.ingest_buffer_size = INGEST_BUFFER_SIZE #chunk size used when streaming mods out of archives
+        self.deployment_snapshot_count = DEPLOYMENT_SNAPSHOT_COUNT #previous addon folders kept for rolling back
+        self.gameinfo_patcher = GameInfoPatcher() #remembers the state of gameinfo.gi so it is only rewritten after Steam reverts it
+
+        #extracts added mods on worker threads, see add_mod()
+        self.ingestion_engine = IngestionEngine()
+        self.ingestion_engine.progress.connect(self._update_import_progress)
+        self.ingestion_engine.file_finished.connect(self._update_import_file_count)
+        self.ingestion_engine.batch_finished.connect(self._apply_import_results)
+        self.ingestion_engine.idle.connect(lambda: self.import_progress_widget.setVisible(False))
+
         #these are set once .load_settings() is called successfully
         self.game_files_found = False
         self.current_game_folder = ""
@@ -169,17 +200,19 @@ class ModManager(QWidget):
         self.search_bar = QLineEdit()
         self.search_bar.setPlaceholderText("Search your installed mods here!")
         self.search_bar.returnPressed.connect(self.search_mods)
-        self.search_bar.textChanged.connect(self.reset_search_index)
+        self.search_bar.textChanged.connect(self.filter_mods)
         self.layout.addWidget(self.search_bar)
-        #these are for self.search_mods() functionality
-        self.search_index = 0
-        self.search_term = ""
+        self.search_index = 0 #the search result selected by self.search_mods()
 
         #the custom mod list widget
         self.list_label = QLabel("Drag and drop to change load order! You can also toggle mods on and off!")
         self.layout.addWidget(self.list_label)
-        self.list_widget = NumberedModListWidget(self)
-        self.layout.addWidget(self.list_widget)
+        self.mod_list_model = ModListModel(self.mod_library, self)
+        self.mod_list_view = ModListView(self.mod_list_model)
+        self.mod_list_view.delegate.remove_requested.connect(self.confirm_mod_deletion)
+        self.layout.addWidget(self.mod_list_view)
+        self.mod_search_model = ModSearchModel(self.mod_list_model, self) #shown instead of the full mod list while searching, see filter_mods()
+        self.mod_search_model.modelReset.connect(self._show_search_results) #the results of a large search can arrive after the search bar changed
 
         #the rest of the buttons
         self.load_button = QPushButton("Load Mod Configuration to Game Folder")
@@ -226,15 +259,58 @@ class ModManager(QWidget):
         self.layout.addWidget(self.download_warning_widget)
         self.download_warning_widget.setVisible(False)
 
+        #import progress (only becomes visible when mods are being extracted)
+        self.import_progress_widget = QWidget()
+        import_progress_layout = QHBoxLayout()
+        self.import_progress_label = QLabel()
+        import_progress_layout.addWidget(self.import_progress_label)
+        self.import_progress_bar = QProgressBar()
+        self.import_progress_bar.setObjectName("import-progress")
+        import_progress_layout.addWidget(self.import_progress_bar)
+        self.import_progress_widget.setLayout(import_progress_layout)
+
+        self.layout.addWidget(self.import_progress_widget)
+        self.import_progress_widget.setVisible(False)
+
         self.setLayout(self.layout)
+        self.set_loading(True) #until the settings and mod list are loaded, see start_loading()
+
+    def paintEvent(self, event: QPaintEvent) -> None:
+        '''
+        Override for painting the window. Starts loading the settings and mod list right after the first paint, so the window shows up before they are loaded.
+        '''
+        super().paintEvent(event)
+        if not self.loading_started:
+            self.loading_started = True
+            self.startup_timer.mark("first paint")
+            QTimer.singleShot(0, self.start_loading)
 
-        #the gui is now done, load the game's folder path from the settings file
-        if not self.load_settings():
+    def set_loading(self, loading: bool) -> None:
+        '''
+        Shows or hides the loading state of the mod manager. While loading, everything that reads or changes the settings or the mod list is disabled.
+        '''
+        for widget in (self.gamebanana_button, self.add_button, self.search_bar, self.mod_list_view, self.load_button, self.launch_button, self.open_settings_button):
+            widget.setEnabled(not loading)
+        if loading:
+            self.list_label.setText("Loading your mods...")
+        else:
+            self.list_label.setText("Drag and drop to change load order! You can also toggle mods on and off!")
+
+    def start_loading(self) -> None:
+        '''
+        The second half of the startup, run on the event loop once the window is shown: loads the game's folder path from the settings file, looks for a .rar tool,
+        and reads the mod list from the mod library. The mod list is then filled a batch at a time (see _load_mod_batch()), so the window stays responsive with many mods.
+        Each phase is timed by self.startup_timer, see startup_timing.py.
+        '''
+        with self.startup_timer.phase("load settings"):
+            settings_loaded = self.load_settings()
+        if not settings_loaded:
             QMessageBox.information(self, "Warning!", f"There was an error loading the settings. Please ensure that this application has sufficient permissions, " \
                 f"and that the application folder at: {APPLICATION_DIRECTORY} has sufficient read/write permissions.")
 
         if not self.rar_tool_found:
-            rar_tool_name, rar_tool_path = find_rar_tool()
+            with self.startup_timer.phase("find rar tool"):
+                rar_tool_name, rar_tool_path = find_rar_tool()
             if rar_tool_name and os.path.exists(os.path.join(os.path.dirname(rar_tool_path), RAR_TOOL_EXECUTABLES[rar_tool_name])):
                 rarfile.UNRAR_TOOL = os.path.join(os.path.dirname(rar_tool_path), RAR_TOOL_EXECUTABLES[rar_tool_name])
                 self.rar_tool_found = True
@@ -243,8 +319,29 @@ class ModManager(QWidget):
                 " Other file formats (.zip, .7z, and .vpk) are operational. If you wish to use mods within .rar files, a known working tool is WinRAR (it is free):\n" \
                 "https://www.win-rar.com/")
 
-        self.read_profile() #this will populate the mod list from entries in the settings
-        self.finished_initial_load = True
+        with self.startup_timer.phase("read mod library"):
+            self.read_profile() #this will start populating the mod list from the mod library
+
+    def _load_mod_batch(self) -> None:
+        '''
+        Adds the next mods read by read_profile() to the mod list, MOD_LIST_LOAD_BATCH_SIZE at a time for up to MOD_LIST_LOAD_TIME_SLICE seconds,
+        then returns to the event loop. Runs on self.mod_batch_timer until every mod is in the list, which ends the loading state.
+        '''
+        slice_start = time.perf_counter()
+        while self.pending_mods and time.perf_counter() - slice_start < MOD_LIST_LOAD_TIME_SLICE:
+            batch = self.pending_mods[:MOD_LIST_LOAD_BATCH_SIZE]
+            del self.pending_mods[:MOD_LIST_LOAD_BATCH_SIZE]
+            self.mod_list_model.append_mods(batch)
+        self.startup_timer.add("fill mod list", time.perf_counter() - slice_start)
+
+        if self.pending_mods:
+            self.list_label.setText(f"Loading your mods... ({self.mod_list_model.rowCount()}/{self.mod_list_model.rowCount() + len(self.pending_mods)})")
+            return
+        self.mod_batch_timer.stop()
+        if not self.finished_initial_load:
+            self.finished_initial_load = True
+            self.set_loading(False)
+            print(self.startup_timer.report())
 
     def set_file_warning(self, files_detected: bool) -> None:
         '''
@@ -262,34 +359,36 @@ class ModManager(QWidget):
 
     def load_settings(self) -> bool:
         '''
-        Loads the application's settings from SETTINGS_FILE_PATH. This currently includes the game folder location, rar tool location, and the mod list.
-        Returns True if the settings folder was loaded successfully, False if not.
+        Loads the application's settings from SETTINGS_FILE_PATH into the settings store. This currently includes the game folder location and rar tool location,
+        the mod list is loaded from the mod library by read_profile(). Returns True if the settings folder was loaded successfully (and the mod library could be opened), False if not.
         '''
-        try:
-            if os.path.exists(SETTINGS_FILE_PATH):
-                with open(SETTINGS_FILE_PATH, "r", encoding="utf-8") as settings_file:
-                    settings = json.load(settings_file)
-                    if "game_folder_location" in settings:
-                        if check_game_folder(settings["game_folder_location"]):
-                            self.found_game_files(settings["game_folder_location"])
-                        else:
-                            QMessageBox.information(self, "Attention!", "If you are seeing this message, "\
-                                "the mod manager could not find your game folder. Please select it with the button at the bottom.")
-                            
-                    if "rar_tool_location" in settings and settings["rar_tool_location"]:
-                        self.rar_tool_found = True
-                        rarfile.UNRAR_TOOL = settings["rar_tool_location"]
-
-            else: #create a blank settings file
-                settings = {}
-                settings["game_folder_location"] = ""
-                settings["rar_tool_location"] = ""
-                settings["mods"] = []
-                with open(SETTINGS_FILE_PATH, "w", encoding="utf-8") as settings_file:
-                    json.dump(settings, settings_file, indent=JSON_INDENT_AMOUNT)
-            return True
-        except:
+        if not self.settings_store.load() or not self.mod_library_opened:
             return False
+        settings = self.settings_store
+        if "game_folder_location" in settings:
+            if check_game_folder(settings.get("game_folder_location")):
+                self.found_game_files(settings.get("game_folder_location"))
+            else:
+                QMessageBox.information(self, "Attention!", "If you are seeing this message, "\
+                    "the mod manager could not find your game folder. Please select it with the button at the bottom.")
+
+        if settings.get("rar_tool_location"):
+            self.rar_tool_found = True
+            rarfile.UNRAR_TOOL = settings.get("rar_tool_location")
+
+        if isinstance(settings.get("ingest_buffer_size"), int) and settings.get("ingest_buffer_size") > 0:
+            self.ingest_buffer_size = settings.get("ingest_buffer_size")
+        self.ingestion_engine.buffer_size = self.ingest_buffer_size
+
+        if isinstance(settings.get("parallel_import"), bool):
+            self.ingestion_engine.use_process_pool = settings.get("parallel_import")
+
+        if isinstance(settings.get("deployment_snapshot_count"), int):
+            self.deployment_snapshot_count = max(settings.get("deployment_snapshot_count"), 0)
+
+        if isinstance(settings.get("gameinfo_patch_state"), dict):
+            self.gameinfo_patcher = GameInfoPatcher(settings.get("gameinfo_patch_state"))
+        return True
 
     def found_game_files(self, game_folder_path) -> None:
         '''
@@ -311,111 +410,13 @@ class ModManager(QWidget):
         files, _ = QFileDialog.getOpenFileNames(self, "Select Files", filter=self.tr(".vpk or archive files (*.vpk *.zip *.7z *.rar)"))
         self.add_mod(files)
 
-    def _add_mods_helper(self, archive_file_name: str, vpk_name: str, from_gamebanana: bool, mod_real_name: str="", gamebanana_item_type: str="", gamebanana_mod_number: int=0,
-        source_file: None | zipfile.ZipExtFile | py7zr.SevenZipFile | rarfile.RarFile = None) -> None:
-        '''
-        Helper for add_mods(). Writes the mod to a folder that corresponds to both its item type and mod number from gamebanana, and adds it to the mod list within the
-        mod manager. Manually added mods check the VPK_DIRECTORY for any duplicates, and are not added if a duplicate is found.
-        '''
-        match gamebanana_item_type:
-            case "Mod":
-                mod_path = os.path.join(MOD_DIRECTORY, str(gamebanana_mod_number))
-                file_path = os.path.join(mod_path, os.path.splitext(os.path.basename(archive_file_name))[0])
-            case "Sound":
-                mod_path = os.path.join(SOUND_DIRECTORY, str(gamebanana_mod_number))
-                file_path = os.path.join(mod_path, os.path.splitext(os.path.basename(archive_file_name))[0])
-            case _: #manually added mods get added to a different path
-                #this doesnt matter
-                mod_path = VPK_DIRECTORY
-                file_path = os.path.join(mod_path, "Unnamed_VPK_0.vpk")
-
-        os.makedirs(mod_path, exist_ok=True) #e.x. /APPLICATION DIRECTORY/Mods/game_banana_mod_number/
-
-        #alert the user that we are overwriting an older version of a mod
-        mod_already_present = False
-        if gamebanana_item_type == "Mod" or gamebanana_item_type == "Sound":
-            if os.path.exists(os.path.join(file_path, vpk_name)):
-                mod_already_present = True
-                QMessageBox.information(self, "Alert!", "Mod already exists! Overwriting...")
-                #TODO: remove the previous contents of the file path
-
-        #must ensure a unique name for any manually added mods (they receive an anonymous name because they are not officially part of the gamebanana library)
-        if not gamebanana_item_type:
-            vpk_index = 0
-            while (os.path.exists(os.path.join(VPK_DIRECTORY, "Unnamed_VPK_" + str(vpk_index))) or os.path.exists(os.path.join(VPK_DIRECTORY, "Unnamed_VPK_" + str(vpk_index) + ".vpk"))):
-                vpk_index += 1
-            file_path = os.path.join(VPK_DIRECTORY, "Unnamed_VPK_" + str(vpk_index))
-            
-        #write the mod to the destination
-        match type(source_file):
-            case zipfile.ZipExtFile:
-                os.makedirs(os.path.join(file_path, os.path.dirname(vpk_name)), exist_ok=True)
-                with open(os.path.join(file_path, vpk_name), 'wb') as target_file:
-                    target_file.write(source_file.read())
-            case py7zr.SevenZipFile:
-                source_file.extract(targets=[vpk_name], path=file_path)
-            case rarfile.RarFile:
-                source_file.extract(vpk_name, path=file_path)
-            case _:
-                if not gamebanana_item_type:
-                    file_path += ".vpk"
-                shutil.copy(archive_file_name, file_path)
-                archive_file_name = ""
-        
-        mod_file_path = file_path
-        if archive_file_name:
-            mod_file_path = os.path.join(file_path, vpk_name) 
-            if WINREG_IMPORTED: #for some reason subfolders in archive folders always have forward slashes instead of backslashes on windows, this is mostly harmless though
-                mod_file_path = mod_file_path.replace("/", "\\")
-
-        #duplicate protection for manually added mods
-        if not gamebanana_item_type:
-
-            def recursively_find_vpk(vpk_list: str) -> bool:
-                '''
-                Tries to find a previously added vpk file that exactly matches the one we are trying to add. Checks all files within vpk_list, and 
-                recursively searches folders within vpk_list. If it finds a match, loops through the mod list to find
-                that exact entry, and notifies the user of its existence before deleting the new file (not the old one) and returning True. Returns False otherwise.
-                '''
-                for vpk_file in vpk_list:
-                    if os.path.isdir(vpk_file):
-                        if recursively_find_vpk([os.path.abspath(os.path.join(vpk_file, vpk)) for vpk in os.listdir(vpk_file)]) is True:
-                            return True
-                    
-                    elif vpk_file != mod_file_path and filecmp.cmp(mod_file_path, vpk_file, shallow=False): #same exact vpk already exists
-                        print("Found match at " + vpk_file)
-                        for i in range(self.list_widget.count()): #loop through the mod list to inform the user of the duplicate mod
-                            item = self.list_widget.item(i)
-                            item_widget = self.list_widget.itemWidget(item)
-                            if item_widget.file_path == vpk_file:
-                                QMessageBox.information(self, "Alert!", "Mod already added: " + item_widget.label.text() + ". Its path is at: " + vpk_file)
-                                try:
-                                    delete_path_and_parent_recursive(mod_file_path)
-                                    return True
-                                except Exception as e:
-                                    print("Error, could not remove duplicate .vpk file: " + str(e))
-                                    return False
-                        #if we got here then there is likely a problem with the mod list (or how it was loaded) or the user deleted a file manually, as this should not naturally occur
-                        return False
-                return False
-            
-            vpk_file_list = [os.path.abspath(os.path.join(VPK_DIRECTORY, vpk_file)) for vpk_file in os.listdir(VPK_DIRECTORY)]
-            mod_already_present = recursively_find_vpk(vpk_file_list)
-
-        if not mod_already_present: #add the mod to the mod list since its not there
-            #the name is a combination of the real_name given and the filename, this is because of multiple file versions
-            mod_name = mod_real_name + " (" + os.path.join(os.path.basename(archive_file_name), vpk_name) + ")"
-            item_widget = ModListItem(mod_name, mod_file_path, self.list_widget, main_window=self, number=self.list_widget.count() + 1, from_gamebanana=from_gamebanana)
-            list_item = QListWidgetItem(self.list_widget)
-            item_widget.add_to_list(list_item)
-            self.list_widget.scrollToItem(self.list_widget.item(self.list_widget.count() - 1), hint=QListWidget.PositionAtTop)
-
-        return True
-
-    def add_mod(self, files: list[str], real_name: str="", item_type: str="", number: int=0) -> None:
+    def add_mod(self, files: list[str], real_name: str="", item_type: str="", number: int=0, remove_source_files: bool=False) -> bool:
         '''
-        Takes a list of file paths to mods and adds them to the mod list. Valid file types are .vpk, .zip, .7z, and .rar.
+        Takes a list of file paths to mods and adds them to the mod list in the background. Valid file types are .vpk, .zip, .7z, and .rar.
         If mods are added manually: real_name, item_type, and number should not be set, as these as reserved for mods downloaded from gamebanana.
+        If remove_source_files is True, the files are deleted once their mods are extracted (used for temporary downloads).
+        The mods are extracted by self.ingestion_engine on worker threads, and added to the mod list together once every file is done, see _apply_import_results().
+        Returns True if the files were submitted for importing, False if nothing was submitted.
         '''
         if (item_type and not number) or (number and not item_type): #this is an invalid combination
             return False
@@ -429,217 +430,211 @@ class ModManager(QWidget):
         real_name = re.sub(r'[<>:"/\\|?*]', '', real_name)
         real_name = real_name.strip().strip('.')
 
-        for file in files:
-            try:
-                _, file_extension = os.path.splitext(file)
-                match file_extension:
-                    case ".zip":
-                        with zipfile.ZipFile(file, 'r') as zip_file:
-                            for name in zip_file.namelist():
-                                if ".vpk" in name:
-                                    with zip_file.open(name) as source_file:
-                                        self._add_mods_helper(file, name, from_gamebanana, real_name, item_type, number,
-                                                                source_file=source_file)
-                    case ".vpk":
-                        self._add_mods_helper(file, file, from_gamebanana, real_name, item_type, number) #the archive name is just the filename
-                    case ".7z":
-                        with py7zr.SevenZipFile(file, mode='r') as archive:
-                            file_list = archive.getnames()
-                            for name in file_list:
-                                _, extracted_file_extension = os.path.splitext(name)
-                                if extracted_file_extension == ".vpk":
-                                    self._add_mods_helper(file, name, from_gamebanana, real_name, item_type, number,
-                                                            source_file=archive)
-                    case ".rar":
-                        #warning: needs external .rar tool, also copies folders too like .7z archive extraction
-                        with rarfile.RarFile(file) as archive:
-                            for info in archive.infolist():
-                                _, extracted_file_extension = os.path.splitext(info.filename)
-                                if extracted_file_extension == ".vpk":
-                                    self._add_mods_helper(file, info.filename, from_gamebanana, real_name, item_type, number,
-                                                            source_file=archive)
-                    case _:
-                        return
-            except Exception as e:
-                print(e)
-                QMessageBox.information(self, "Error", "Error with adding mods. Check if the file(s) are of a valid format, and if it is a .rar file, check if you have a valid unrar tool.")
-                return
-        self.save_profile() #this makes it so that we save the new file path as an added mod to our configuration
-    
-    def _search_mods_helper(self, mod_list_index: int) -> bool:
+        #warning: .rar files need an external .rar tool
+        jobs = [ImportJob(file, from_gamebanana, real_name, item_type, number, remove_source_files) for file in files if is_supported_mod_file(file)]
+        if not jobs:
+            return False
+
+        self.import_progress_label.setText(f"Importing mods... (0/{len(jobs)} files)")
+        self.import_progress_bar.setValue(0)
+        self.import_progress_widget.setVisible(True)
+        self.ingestion_engine.submit(jobs)
+        return True
+
+    def _update_import_progress(self, file: str, vpk_name: str, copied: int, total: int) -> None:
         '''
-        Helper for self.search_mods. Scrolls to and selects whatever mod is found, and increments self.search_index (modulo the length of the mod list).
-        Returns True if it finds the next mod that matches the text in self.search_term, returns False otherwise.
+        Shows the progress of the .vpk currently being written by the ingestion engine. Bound to self.ingestion_engine.progress.
         '''
-        item_widget = self.list_widget.itemWidget(self.list_widget.item(mod_list_index))
-        if self.search_term.lower() in item_widget.name.lower():
-            self.list_widget.scrollToItem(self.list_widget.item(mod_list_index), hint=QListWidget.PositionAtTop)
-            self.search_index = (mod_list_index + 1) % self.list_widget.count()
-            self.list_widget.setCurrentItem(self.list_widget.item(mod_list_index))
-            self.list_widget.item(mod_list_index).setSelected(True)
-            return True
-        return False
+        self.import_progress_bar.setMaximum(total if total > 0 else 0) #a maximum of 0 shows a busy indicator instead
+        self.import_progress_bar.setValue(min(copied, total))
+        self.import_progress_bar.setFormat(os.path.basename(vpk_name) + " %p%")
 
-    def search_mods(self) -> bool:
+    def _update_import_file_count(self, finished_count: int, total_count: int) -> None:
         '''
-        Scrolls to and selects the next mod in the list (according to self.search_index) that contains the text in self.search_term (case-insensitive). Wraps around.
-        Return True if at least one mod in the mod list matches. Return False otherwise. self.search_term is updated every time the user presses Enter in the search bar.
-        If a mod is found, sets self.search_index to the next index after that mod, so that the next call to search_mods won't bring up this mod again (unless only this mod matches).
-        Sets the self.search_index back to 0 if no mod is found.
+        Shows how many files of the current import have been extracted. Bound to self.ingestion_engine.file_finished.
         '''
-        if self.search_index >= self.list_widget.count():
-            self.search_index = 0
+        self.import_progress_label.setText(f"Importing mods... ({finished_count}/{total_count} files)")
 
-        for mod_list_index in range(self.search_index, self.list_widget.count()):
-            if self._search_mods_helper(mod_list_index):
-                return True
-        for mod_list_index in range(0, self.list_widget.count()): #loop back around to the top of the mod list
-            if self._search_mods_helper(mod_list_index):
-                return True
-        self.search_index = 0
-        return False
+    def _apply_import_results(self, results: list[ImportResult]) -> None:
+        '''
+        Adds every mod extracted by the ingestion engine to the mod list in one batch, in the same order as the files were given to add_mod(), and saves them to the mod library
+        in a single transaction.
+        Duplicates of mods already in the mod list are removed here (see _register_extracted_mod()), and the user is notified once about all of them.
+        Bound to self.ingestion_engine.batch_finished, never call this explicitly.
+        '''
+        duplicate_messages = []
+        added_count = 0
+        with self.mod_library.batch():
+            for result in results:
+                for extracted_mod, mod_name, overwritten in result.mods:
+                    if self._register_extracted_mod(extracted_mod, mod_name, result.job.from_gamebanana, result.job.item_type, result.job.number,
+                                                    overwritten, duplicate_messages):
+                        added_count += 1
 
-    def reset_search_index(self) -> None:
+        if added_count:
+            self.mod_list_view.scrollTo(self.mod_list_model.index(self.mod_list_model.rowCount() - 1), hint=QAbstractItemView.PositionAtTop)
+
+        if any(result.overwrote_mods for result in results):
+            QMessageBox.information(self, "Alert!", "Mod already exists! Overwritten with the new version.")
+        if duplicate_messages:
+            QMessageBox.information(self, "Alert!", "\n".join(duplicate_messages))
+        failed_files = [os.path.basename(result.job.file) for result in results if result.error]
+        if failed_files:
+            QMessageBox.information(self, "Error", "Error with adding mods from: " + ", ".join(failed_files) + ". Check if the file(s) are of a valid format, " \
+                "and if it is a .rar file, check if you have a valid unrar tool.")
+
+    def _register_extracted_mod(self, extracted_mod: ExtractedMod, mod_name: str, from_gamebanana: bool, item_type: str, item_number: int, overwritten: bool,
+                                duplicate_messages: list[str]) -> bool:
         '''
-        Resets the search index and changes self.search_term to the search bar's text. Only to be called when the search bar text is altered.
-        This is to enable the user to search through every mod in the list (according to their query) using the Enter key, 
-        and only change their query when the actual text in the search bar changes.
+        Adds a mod that was just written to disk to the mod list and the mod library, unless the same content is already in the mod list (checked against self.content_index),
+        in which case a message for the user is appended to duplicate_messages and the new file (not the old one) is removed. If overwritten is True, the mod replaced
+        an older version at the same path, which keeps its place in the mod list but has its content hash updated.
+        Returns True if a new entry was added to the mod list, False if not.
         '''
+        mod_file_path = extracted_mod.file_path
+        content_key = make_content_key(extracted_mod.file_size, extracted_mod.content_hash)
+
+        if overwritten: #the overwritten mod keeps its place in the mod list, but its contents may have changed
+            row = self.mod_list_model.find_row(mod_file_path)
+            if row >= 0:
+                self.mod_list_model.set_content_hash(row, extracted_mod.file_size, extracted_mod.content_hash)
+                self.content_index.add(content_key, mod_file_path)
+                return False
+
+        #duplicate protection, the same exact vpk may already exist from another archive or a manual import
+        original_file_path = self.content_index.find(content_key)
+        if original_file_path and not overwritten:
+            print("Found match at " + original_file_path)
+            row = self.mod_list_model.find_row(original_file_path)
+            if row >= 0:
+                original_mod = self.mod_list_model.mod_at(row)
+                duplicate_messages.append("Mod already added: " + original_mod.name + ". Its path is at: " + original_mod.file_path)
+            try:
+                delete_path_and_parent_recursive(mod_file_path)
+            except Exception as e:
+                print("Error, could not remove duplicate .vpk file: " + str(e))
+            return False
+
+        #add the mod to the mod list since its not there
+        if self.mod_list_model.add_mod(mod_name, mod_file_path, from_gamebanana, item_type, item_number, extracted_mod.file_size, extracted_mod.content_hash) < 0:
+            return False
+        self.content_index.add(content_key, mod_file_path)
+        return True
+
+    def filter_mods(self, query: str) -> None:
+        '''
+        Filters the mod list to the mods matching query as the user types, best matches first, with the matching parts of their names highlighted.
+        Shows the full mod list again once the search bar is empty. Bound to the search bar's textChanged signal. See mod_search_index.py.
+        The list changes once the results are ready (see _show_search_results()), until then the previous results stay shown.
+        '''
+        self.mod_search_model.set_query(query)
         self.search_index = 0
-        self.search_term = self.search_bar.text()
 
-    def save_profile(self) -> bool:
+    def _show_search_results(self) -> None:
         '''
-        Saves the mod list information to SETTINGS_FILE_PATH. Overwrites any preexisting mod data in the settings file.
-        Returns True if the mod data was saved successfully, False if not. Call this function after adding, deleting, renaming, toggling or change the load order of mods.
+        Shows the search results in the mod list, or the full mod list if the search bar is empty. Bound to the search model's modelReset signal.
         '''
-        try:
-            settings = {}
-            with open(SETTINGS_FILE_PATH, "r", encoding="utf-8") as settings_file:
-                settings = json.load(settings_file)
-
-            settings["mods"] = []
-            for i in range(self.list_widget.count()):
-                mod = {}
-                item_widget = self.list_widget.itemWidget(self.list_widget.item(i))
-                mod["name"] = item_widget.name
-                mod["file_path"] = item_widget.file_path
-                if item_widget.toggle.isChecked():
-                    mod["toggled_on"] = True
-                else:
-                    mod["toggled_on"] = False
-                mod["from_gamebanana"] = item_widget.from_gamebanana
-                settings["mods"].append(mod)
+        self.mod_list_view.show_search_results(self.mod_search_model if self.mod_search_model.scores_query.strip() else None)
 
-            with open(SETTINGS_FILE_PATH, "w", encoding="utf-8") as settings_file:
-                json.dump(settings, settings_file, indent=JSON_INDENT_AMOUNT)
-            return True
-        except:
+    def search_mods(self) -> bool:
+        '''
+        Scrolls to and selects the next mod in the search results (according to self.search_index), wrapping around. Bound to pressing Enter in the search bar.
+        Return True if at least one mod matches the search, False otherwise.
+        '''
+        self.mod_search_model.finish_search() #pressed right after typing, so the results are for what is in the search bar
+        model = self.mod_list_view.model()
+        if model is not self.mod_search_model or model.rowCount() == 0:
+            self.search_index = 0
             return False
+        if self.search_index >= model.rowCount():
+            self.search_index = 0
+        index = model.index(self.search_index)
+        self.mod_list_view.scrollTo(index, hint=QAbstractItemView.PositionAtTop)
+        self.mod_list_view.setCurrentIndex(index) #this also selects it
+        self.search_index += 1
+        return True
 
     def read_profile(self) -> bool:
         '''
-        Reads the mod list information from SETTINGS_FILE_PATH, and loads it into the mod list.
-        Removes all items from the mod list gui.
+        Reads the mod list from the mod library, and loads it into the content index and the mod list model. Replaces the mods that were in the model before.
+        The mods are added to the model a batch at a time on the event loop, see _load_mod_batch().
+        Mod lists saved in SETTINGS_FILE_PATH by older versions are moved into the library first (see ModLibrary.migrate_mods()),
+        and mods saved before content hashes were stored are hashed once here, with their hashes saved to the library.
         Returns True if the mod data was read successfully, False if not.
         '''
-        while (self.list_widget.count() > 0): #erase the current mod list
-            self.list_widget.takeItem(0)
+        self.content_index.clear()
 
         try:
-            settings = {}
-            with open(SETTINGS_FILE_PATH, "r", encoding="utf-8") as settings_file:
-                settings = json.load(settings_file)
-
-            vpk_index = 1
-            for mod in settings["mods"]:
-                file_path = mod["file_path"]
-                real_name = mod["name"]
-                from_gamebanana = mod["from_gamebanana"]
-
-                item_widget = ModListItem(real_name, file_path, self.list_widget, main_window=self, number=vpk_index, from_gamebanana=from_gamebanana)
-                list_item = QListWidgetItem(self.list_widget)
-
-                if mod["toggled_on"]:
-                    item_widget.toggle.setChecked(True)
-                else:
-                    item_widget.toggle.setChecked(False)
-
-                item_widget.add_to_list(list_item)
-                vpk_index += 1
+            legacy_mods = self.settings_store.get("mods")
+            if legacy_mods is not None and self.mod_library.migrate_mods(legacy_mods) >= 0:
+                print(f"Moved {len(legacy_mods)} mod(s) from the settings file to the mod library")
+                self.settings_store.remove("mods")
+
+            mods = self.mod_library.list_mods()
+            with self.mod_library.batch():
+                for mod in mods:
+                    if not mod.content_hash and os.path.isfile(mod.file_path): #older settings files don't have the hashes yet
+                        try:
+                            mod.file_size, mod.content_hash = compute_content_hash(mod.file_path)
+                            self.mod_library.set_content_hash(mod.mod_id, mod.file_size, mod.content_hash)
+                        except OSError as e:
+                            print("Error, could not hash mod file: " + str(e))
+                    if mod.content_hash:
+                        self.content_index.add(make_content_key(mod.file_size, mod.content_hash), mod.file_path)
+            self.mod_list_model.set_mods([]) #this clears the current mod list
+            self.pending_mods = mods
             return True
         except:
             return False
+        finally:
+            self.mod_batch_timer.start() #this also ends the loading state if the mod list couldn't be read
 
     def save_mods(self) -> bool:
         '''
         Returns True if all enabled mods (with valid file paths) and the gameinfo.gi file were successfully saved to the current_addon_directory without error, False if not.
-        Rewrites the gameinfo.gi file to contain the lines necessary to detect mods in game.
-        Then saves the enabled mods in the mod list (as symbolic links) to the game's addon folder, if detected.
+        Patches the gameinfo.gi file to contain the lines necessary to detect mods in game, see patch_game_info().
+        Then saves the enabled mods in the mod list (as hard links) to the game's addon folder, if detected. Only the links that differ from the ones already
+        in the addon folder are renamed, created or removed, and this is done in a staging folder that replaces the addon folder once it is complete.
+        The previous addon folder is kept as a snapshot, see rollback_mod_deployment() and mod_deployment.py.
 
         Writes the mods in order with the filename format 'pakXX_dir.vpk' where XX is a number for 01-99 zero padded.
         Starts from 1 and counts upward with each mod that is currently checked, does not add mods that are not checked. 
         This means that numbers on the modlist and numbers in the addon folder will differ if some mods are disabled.
         Deletes mods that have invalid file paths, and removes them from the mod list. Stops saving mods to the addon folder after MAXIMUM_MOD_AMOUNT is reached.
 
-        Additionally, we load the mods based on the mod list data, not the settings.json data, though these should be synced.
+        Additionally, we load the mods based on the mod list data, not the mod library data, though these should be synced.
         '''
         if not self.game_files_found:
             QMessageBox.information(self, "Attention!", "If you are seeing this message, the mod manager can't load your mods because it could not find your game folder." \
             " Please select it with the button at the bottom.")
             return False
         try:
-            #first we modify the gameinfo.gi file (just replaces it with the modified version with +3 lines to support modding)
-            game_info_file_path = os.path.join(self.current_game_folder, "game", "citadel", "gameinfo.gi")
-            with open(game_info_file_path, "r") as f:
-                lines = f.readlines()
-            target = "Game_Languagecitadel_*LANGUAGE*" #the edited lines must come after this one
-            edited_lines = {"\t\t\tMod\t\t\t\t\tcitadel\n": False, "\t\t\tWrite\t\t\t\tcitadel\n": False, "\t\t\tGame\t\t\t\tcitadel/addons\n": False}
-
-            current_index = 0
-            edit_index = 0
-            for line in lines:
-                if line.replace("\t", "").replace("\n", "") == target:
-                    edit_index = current_index
-                for edited_line in edited_lines:
-                    if edited_line.replace("\t", "").replace("\n", "") == line.replace("\t", "").replace("\n", ""): #the edited line already exists
-                        edited_lines[edited_line] = True
-                current_index += 1
-            for index, line in enumerate(edited_lines):
-                if edited_lines[line] is False:
-                    lines.insert(edit_index + index + 1, line)
-            with open(game_info_file_path, "w") as f:
-                f.writelines(lines)
-
-            #remove all the currently installed mods
-            shutil.rmtree(self.current_addon_directory)
-            os.mkdir(self.current_addon_directory)
-
-            #now copy the mods over
-            written_mod_count = 0
-            missing_file_paths_alert = False
-            mod_list_index = 0
-            mod_count = self.list_widget.count()
-            while mod_list_index < mod_count:
-                if written_mod_count >= MAXIMUM_MOD_AMOUNT:
-                    QMessageBox.information(self, "Attention!", "Maximum mod limit reached! Only the first 99 enabled mods have been loaded.")
-                    break
-                item_widget = self.list_widget.itemWidget(self.list_widget.item(mod_list_index))
-                if item_widget.toggle.isChecked():
-                    try:
-                        #copy the mod over to the game's addon directory, note the name must be of the form: "pakXX_dir.vpk"
-                        os.link(item_widget.file_path, os.path.join(self.current_addon_directory, "pak" + "0"*(2 - len(str(written_mod_count + 1))) + str(written_mod_count + 1) + "_dir.vpk"))
-                        written_mod_count += 1
-                    except PermissionError:
-                        QMessageBox.information(self, "Attention!", "If you are seeing this message, the mod manager can't load your mods because it needs administrator" \
-                        "privileges to edit the game folder. Please run the application again as administrator.")
-                    except:
-                        #the mod does not exist anymore, delete it from the mod list and remove its file path
-                        missing_file_paths_alert = True
-                        item_widget.delete_self()
-                        mod_count -= 1
-                mod_list_index += 1
-            if missing_file_paths_alert:
+            #first make sure the gameinfo.gi file contains the lines needed to detect mods (this is skipped if it hasn't changed since it was last patched)
+            if not self.patch_game_info():
+                return False
+
+            #the mods that don't exist anymore are deleted from the mod list and have their file paths removed
+            enabled_mods, missing_mods = self._get_enabled_mods()
+            for mod in missing_mods:
+                self.delete_mod(self.mod_list_model.row_of(mod.mod_id))
+            if len(enabled_mods) > MAXIMUM_MOD_AMOUNT:
+                QMessageBox.information(self, "Attention!", "Maximum mod limit reached! Only the first 99 enabled mods have been loaded.")
+                enabled_mods = enabled_mods[:MAXIMUM_MOD_AMOUNT]
+
+            #now link the mods into a staged copy of the addon folder, only changing what differs from the mods that are already there, and swap it in
+            try:
+                plan = deploy_staged(self.current_addon_directory, [mod.file_path for mod in enabled_mods],
+                                     {mod.file_path: mod.content_hash for mod in enabled_mods if mod.content_hash},
+                                     self.deployment_snapshot_count)
+                print(plan.report())
+            except PermissionError:
+                raise
+            except OSError as e:
+                print("Error with deploying mods: " + str(e))
+                QMessageBox.information(self, "Error", "Could not load the mods to the game folder: " + str(e))
+                return False
+
+            if missing_mods:
                 QMessageBox.information(self, "Attention!", "The mod manager couldn't find some of your mod(s) (possibly deleted VPKs or changed filepaths). " \
                 "They have been removed from the mod list, and the new configuration has been saved. All other selected mods have been loaded.")
         except PermissionError:
@@ -648,13 +643,142 @@ class ModManager(QWidget):
             return False
         return True
 
+    def _get_enabled_mods(self) -> tuple[list[ModRecord], list[ModRecord]]:
+        '''
+        Returns a tuple containing every enabled mod in load order whose file exists, and every enabled mod whose file is missing.
+        '''
+        enabled_mods = []
+        missing_mods = []
+        for mod in self.mod_list_model.mods:
+            if mod.enabled:
+                if os.path.isfile(mod.file_path):
+                    enabled_mods.append(mod)
+                else:
+                    missing_mods.append(mod)
+        return enabled_mods, missing_mods
+
+    def confirm_mod_deletion(self, index: QModelIndex) -> None:
+        '''
+        Ask the user to confirm if they wish to delete the mod at index (of the mod list or the search results), and only delete it if the user clicks Yes.
+        Bound to the remove buttons of the mod list.
+        '''
+        msg_box = QMessageBox()
+        path_to_icon = get_resource_path(WINDOW_ICON_PATH_SUFFIX)
+        msg_box.setWindowIcon(QIcon(path_to_icon))
+        msg_box.setWindowTitle("Wait!")
+        msg_box.setText("Delete this mod?")
+        msg_box.setIcon(QMessageBox.Question)
+        msg_box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
+        response = msg_box.exec_()
+        if response != QMessageBox.Yes: #if the user clicked no or closed the message box
+            return
+        else:
+            self.delete_mod(self.mod_list_model.row_of(index.data(MOD_ID_ROLE)))
+
+    def delete_mod(self, row: int) -> bool:
+        '''
+        Removes the mod at row from the mod list and the mod library, and deletes the mod (.vpk file) and folder (if empty) containing it.
+        Returns True if the mod was removed, False if not.
+        '''
+        mod = self.mod_list_model.remove_row(row)
+        if mod is None:
+            return False
+        self.content_index.remove(mod.file_path)
+        delete_path_and_parent_recursive(mod.file_path)
+        return True
+
+    def preview_mod_deployment(self) -> bool:
+        '''
+        Shows the user what loading the current mod configuration would change in the game's addon folder, and how many filesystem operations it would take,
+        without changing anything. Also shows how much space the rollback snapshots keep for mods that were deleted (see mod_deployment.py).
+        Returns False if the game folder has not been found, True otherwise.
+        '''
+        if not self.game_files_found:
+            QMessageBox.information(self, "Attention!", "Could not preview the mod configuration, because the game folder could not be located!")
+            return False
+        enabled_mods, missing_mods = self._get_enabled_mods()
+        plan = plan_deployment(self.current_addon_directory, [mod.file_path for mod in enabled_mods[:MAXIMUM_MOD_AMOUNT]],
+                               {mod.file_path: mod.content_hash for mod in enabled_mods if mod.content_hash})
+        report = plan.report() if not plan.is_empty() else "The game folder already matches the current mod configuration."
+        if missing_mods:
+            report += f"\n{len(missing_mods)} enabled mod(s) could not be found and will be removed from the mod list."
+        snapshot_count = len(list_snapshots(self.current_addon_directory))
+        if snapshot_count:
+            pinned_file_count, pinned_size = snapshot_pinned_size(self.current_addon_directory)
+            report += f"\n\n{snapshot_count} previous configuration(s) are kept for rolling back (up to {self.deployment_snapshot_count})."
+            if pinned_file_count:
+                report += f" They keep {pinned_file_count} deleted mod(s) on your drive, using {pinned_size / 1024 / 1024:.1f} MB, " \
+                    "until they are replaced by newer configurations."
+        QMessageBox.information(self, "Mod Configuration Preview", report)
+        return True
+
+    def rollback_mod_deployment(self) -> bool:
+        '''
+        Restores the game's addon folder to how it was before the last time the mod configuration was loaded, after confirmation from the user.
+        Only the game folder is changed, the mod list stays the same. Returns True if a previous deployment was restored, False if not.
+        '''
+        if not self.game_files_found:
+            QMessageBox.information(self, "Attention!", "Could not roll back the mod configuration, because the game folder could not be located!")
+            return False
+
+        msg_box = QMessageBox()
+        msg_box.setWindowTitle("Wait!")
+        msg_box.setText("Restore the mods that were loaded in the game folder before the last time you loaded your mod configuration? Your mod list will not be changed.")
+        msg_box.setIcon(QMessageBox.Question)
+        msg_box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
+        if msg_box.exec_() != QMessageBox.Yes: #if the user clicked no or closed the message box
+            return False
+
+        try:
+            restored_snapshot = rollback_deployment(self.current_addon_directory)
+        except PermissionError:
+            QMessageBox.information(self, "Attention!", "If you are seeing this message, the mod manager can't roll back your mods because the game is open, " \
+            "Please close the game if it is open.")
+            return False
+        except OSError as e:
+            QMessageBox.information(self, "Error", "Could not roll back the mods in the game folder: " + str(e))
+            return False
+        if not restored_snapshot:
+            QMessageBox.information(self, "Attention!", "There are no previous mod configurations to roll back to.")
+            return False
+        QMessageBox.information(self, "Success!", "The previous mod configuration has been restored to the game folder.")
+        return True
+
+    def patch_game_info(self) -> bool:
+        '''
+        Makes sure the game's gameinfo.gi file contains the search paths needed to load mods from the addon folder, patching it again if a game update reverted it.
+        The file is only read if its size or modification time changed since it was last checked, and only rewritten if the search paths are missing.
+        The state of the file is saved to SETTINGS_FILE_PATH, see gameinfo_patcher.py. Returns True if the file is patched, False if not (after displaying an error message box).
+        Raises PermissionError if the file is in use, so the caller can tell the user to close the game.
+        '''
+        game_info_file_path = os.path.join(self.current_game_folder, GAMEINFO_SUBPATH)
+        previous_state = self.gameinfo_patcher.state
+        try:
+            if self.gameinfo_patcher.ensure_patched(game_info_file_path):
+                print("Patched gameinfo.gi to load mods: " + game_info_file_path)
+        except PermissionError:
+            raise
+        except (OSError, UnicodeDecodeError, KeyValuesSyntaxError) as e:
+            print("Error with patching gameinfo.gi: " + str(e))
+            QMessageBox.information(self, "Error", "Could not edit the game's gameinfo.gi file, so mods may not be loaded in game: " + str(e))
+            return False
+
+        if self.gameinfo_patcher.state != previous_state:
+            self.settings_store.set("gameinfo_patch_state", self.gameinfo_patcher.state)
+        return True
+
     def start_game(self) -> bool:
         '''
         Starts the game if the game folder is detected, otherwise displays an error message box.
+        Before starting, gameinfo.gi is patched again if a game update reverted it (see patch_game_info()), so mods still load after updating.
         Returns True if the game started successfully, False if not.
         This may fail if Steam is not currently running.
         '''
         if self.game_files_found:
+            try:
+                self.patch_game_info()
+            except PermissionError:
+                print("Error, gameinfo.gi is in use and could not be checked before starting the game")
             try:
                 os.startfile(self.current_game_executable_path)
             except:
@@ -679,14 +803,8 @@ class ModManager(QWidget):
             return False
         
         if check_game_folder(folder): #valid game folder, contains addon folder and the actual game
-            try:
-                settings = {}
-                with open(SETTINGS_FILE_PATH, "r", encoding="utf-8") as settings_file:
-                    settings = json.load(settings_file)
-                settings["game_folder_location"] = folder
-                with open(SETTINGS_FILE_PATH, "w", encoding="utf-8") as settings_file:
-                    json.dump(settings, settings_file, indent=JSON_INDENT_AMOUNT)
-            except:
+            self.settings_store.set("game_folder_location", folder)
+            if not self.settings_store.flush(): #written right away, since this is a deliberate one off change
                 QMessageBox.information(self, "Error", "Couldn't save game folder location!")
                 return False
             
@@ -703,7 +821,9 @@ class ModManager(QWidget):
         '''
         Creates and sets a new instance of the mod browser if one does not exist. Displays the old instance if it was running.
         Does not interrupt any ongoing downloads.
+        The mod browser is imported here instead of at startup, since it pulls in cloudscraper, requests and selenium, and most sessions never open it.
         '''
+        import deadlock_mod_browser
         if self.mod_browser:
             self.mod_browser.show()
         else:
@@ -733,20 +853,36 @@ class ModManager(QWidget):
         '''
         Override for closing the window. Ensures the mod browser (and its subwidgets as well) are properly closed and cleaned up.
         '''
-        with self.worker_thread_lock:
-            if self.workers_and_threads:
-                msg_box = QMessageBox()
-                msg_box.setWindowTitle("Warning!")
-                msg_box.setText("You have ongoing downloads! Exiting now might cause unexpected issues. Are you sure you want to quit?")
-                msg_box.setIcon(QMessageBox.Question)
-                msg_box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
-                response = msg_box.exec_()
-                if response != QMessageBox.Yes: #if the user clicked no or closed the message box
-                    event.ignore()
-                    return
+        if self.mod_browser and self.mod_browser.download_scheduler.is_busy():
+            msg_box = QMessageBox()
+            msg_box.setWindowTitle("Warning!")
+            msg_box.setText("You have ongoing or queued downloads! Exiting now will cancel them. Are you sure you want to quit?")
+            msg_box.setIcon(QMessageBox.Question)
+            msg_box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
+            response = msg_box.exec_()
+            if response != QMessageBox.Yes: #if the user clicked no or closed the message box
+                event.ignore()
+                return
+
+        if self.ingestion_engine.is_busy():
+            msg_box = QMessageBox()
+            msg_box.setWindowTitle("Warning!")
+            msg_box.setText("Mods are still being imported! Exiting now will wait for the current files to finish extracting, " \
+                "but they will not be added to the mod list. Are you sure you want to quit?")
+            msg_box.setIcon(QMessageBox.Question)
+            msg_box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
+            response = msg_box.exec_()
+            if response != QMessageBox.Yes: #if the user clicked no or closed the message box
+                event.ignore()
+                return
+            self.ingestion_engine.batch_finished.disconnect(self._apply_import_results)
+            self.ingestion_engine.wait_for_all()
 
         if self.mod_browser:
+            self.mod_browser.catalogue_fetcher.shutdown() #stop waiting on catalogue pages and thumbnails that are still loading
+            self.mod_browser.download_scheduler.shutdown() #cancels the downloads
             self.mod_browser.clear_catalogue()
+            self.mod_browser.thumbnail_loader.shutdown()
             self.mod_browser.close()
             self.mod_browser.deleteLater()
 
@@ -754,177 +890,44 @@ class ModManager(QWidget):
             self.settings_menu.close()
             self.settings_menu.deleteLater()
 
-        event.accept()
-    
-class NumberedModListWidget(QListWidget):
-    '''
-    Custom list widget that enables drag and drop capabilities and automatic renumbering, for altering the load order of mods.
-    '''
-    def __init__(self, main_window: ModManager):
-        '''
-        main_window should be an instance of ModManager. List items cannot be moved outside the list, and multiple items cannot be selected.
-        '''
-        super().__init__()
-        self.setObjectName("modlist")
-        self.setSelectionMode(QListWidget.SingleSelection)
-        self.setDragDropMode(QListWidget.InternalMove)
-        self.main_window = main_window
+        downloader = sys.modules.get("deadlock_mod_downloader") #only imported once something was downloaded
+        if downloader:
+            downloader.WEBDRIVER_POOL.shutdown() #close the browsers kept running for downloads
 
-    def dropEvent(self, event: QDropEvent) -> None:
-        '''
-        Override for when items are drag and dropped. Renumbers the mod list and saves the new load order to the configuration file.
-        '''
-        super().dropEvent(event)
-        self.renumber_items()
-        self.main_window.save_profile()
-
-    def dragMoveEvent(self, event: QDragMoveEvent) -> None:
-        '''
-        Override needed because of a pyqt5 bug with embedded widgets in qlists
-        See explanation and solution here: https://stackoverflow.com/questions/74263946/widget-inside-qlistwidgetitem-disappears-after-internal-move
-        '''
-        target_row = self.row(self.itemAt(event.pos()))
-        current_row = self.currentRow()
-        
-        if (target_row == current_row + 1) or (current_row == self.count() - 1 and target_row == -1):
-            event.ignore()
-        else:
-            super().dragMoveEvent(event)
-
-    def renumber_items(self) -> None:
-        '''
-        Edits the labels of every entry to contain their place in the mod list. 
-        This is called upon mods being reordered via the GUI's drag and drop, or when new mods are added.
-        '''
-        for i in range(self.count()):
-            item = self.item(i)
-            item_widget = self.itemWidget(item)
-            item_widget.number = i + 1
-            item_widget.label.setText(f"{item_widget.number}. {item_widget.name}")
-
-class ModListItem(QWidget):
-    '''
-    Custom list item widget for individual mods that supports holding nicknames, file paths, mod on/off toggle, and a self-removal button.
-    '''
-    def __init__(self, name: str, file_path: str, list_widget: NumberedModListWidget, main_window: ModManager, number: int, from_gamebanana: bool=False) -> None:
-        super().__init__() 
-        self.list_widget = list_widget
-        self.name = name
-        self.file_path = file_path
-        self.main_window = main_window #this should always be the mod manager window
-        self.number = number #position in the mod list, index begins at 1
-        self.from_gamebanana = from_gamebanana
-
-        self.setObjectName("#modlist-item")
-        layout = QHBoxLayout()
-
-        #mod name
-        self.label = QLabel(f"{self.number}. " + name)
-        self.label.setObjectName("mod-name")
-        layout.addWidget(self.label)
-
-        self.line_edit = QLineEdit("")
-        self.line_edit.setPlaceholderText("Mod name...")
-        self.line_edit.setText(name)
-        self.line_edit.returnPressed.connect(self.rename_mod)
-        self.line_edit.setVisible(False)
-        layout.addWidget(self.line_edit)
-
-        if from_gamebanana:
-            self.gamebanana_logo = QLabel("🍌")
-            layout.addWidget(self.gamebanana_logo)
-
-        layout.addStretch() #this puts the buttons on the right
-
-        self.rename_button = QPushButton("✍️")
-        self.rename_button.setObjectName("rename-button")
-        self.rename_button.setFixedSize(20, 20)
-        self.rename_button.clicked.connect(lambda: (self.line_edit.setVisible(True), self.rename_button.setVisible(False), self.label.setVisible(False), self.line_edit.setFocus()))
-        layout.addWidget(self.rename_button)
-
-        #checkbox for marking the mods as enabled/disabled
-        self.toggle = QCheckBox()
-        self.toggle.setChecked(True)
-        self.toggle.stateChanged.connect(lambda: self.main_window.save_profile() if self.main_window.finished_initial_load else None) #only save the config if finished loading
-        
-        layout.addWidget(self.toggle)
-
-        #the remove button for mods
-        self.remove_button = QPushButton("X", self)
-        self.remove_button.setFixedWidth(20)
-        self.remove_button.setFixedHeight(20)
-        self.remove_button.clicked.connect(self.confirm_deletion) #deletes the mod from the list along with the actual file path if possible, after confirmation
-        layout.addWidget(self.remove_button)
-
-        self.setLayout(layout)
-
-    def confirm_deletion(self) -> None:
-        '''
-        Ask the user to confirm if they wish to delete this mod, and only delete it if the user clicks Yes.
-        '''
-        msg_box = QMessageBox()
-        path_to_icon = get_resource_path(WINDOW_ICON_PATH_SUFFIX)
-        msg_box.setWindowIcon(QIcon(path_to_icon))
-        msg_box.setWindowTitle("Wait!")
-        msg_box.setText("Delete this mod?")
-        msg_box.setIcon(QMessageBox.Question)
-        msg_box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
-        response = msg_box.exec_()
-        if response != QMessageBox.Yes: #if the user clicked no or closed the message box
-            return
-        else:
-            self.delete_self()
-
-    def rename_mod(self) -> None:
-        '''
-        Renames the mod according to the mod's line editor's text, if it is non-empty. Makes the label and rename button visible again, and the line edit invisible.
-        '''
-        self.label.setVisible(True)
-        self.line_edit.setVisible(False)
-        self.rename_button.setVisible(True)
-        if self.line_edit.text():
-            self.name = self.line_edit.text()
-            self.label.setText(str(self.number) + ". " + self.line_edit.text())
-            self.line_edit.setText(self.name)
-            self.main_window.save_profile()
-
-    def add_to_list(self, list_item: QListWidget) -> None:
-        '''
-        Binds the item_widget to the QListWidget instead of just the text, then adds it to the list_widget.
-        list_item should be created with the list_widget as a parent, like this: QListWidgetItem(self.list_widget)
-        '''
-        list_item.setSizeHint(self.sizeHint())
-        self.list_widget.addItem(list_item)
-        self.list_widget.setItemWidget(list_item, self)
-
-    def delete_self(self) -> None:
-        '''
-        Deletes list item by indexing itself from its name and taking the item from the parent.
-        Deletes the mod (.vpk file) and folder (if empty) containing the mod at self.file_path.
-        '''
-        if self.list_widget:
-            index = self.number - 1
-            self.list_widget.takeItem(index)
-            self.list_widget.renumber_items()
-            delete_path_and_parent_recursive(self.file_path)
-            self.main_window.save_profile() #save to the configuration file
+        if not self.settings_store.flush(): #write any changes that are still waiting on the write timer
+            QMessageBox.information(self, "Error", f"Could not save your settings! Please ensure that the application folder at: {APPLICATION_DIRECTORY} " \
+                "has sufficient read/write permissions.")
+        self.mod_batch_timer.stop()
+        self.mod_library.close()
 
+        event.accept()
+    
 if __name__ == "__main__":
+    multiprocessing.freeze_support() #the ingestion engine's process pool needs this in the bundled executable
     os.makedirs(APPLICATION_DIRECTORY, exist_ok=True) #create the directory for our application so we don't have to later
     if not os.path.exists(APPLICATION_DIRECTORY):
         raise FileNotFoundError(errno.ENOENT, "Could not create the application directory. Please allow permissions to create folders and write to files.")
     
-    app = QApplication(sys.argv)
-    window = ModManager()
-
-    #load the fonts from the resource folder
-    path_to_fonts = get_resource_path(FONTS_PATH_SUFFIX)
-    for font in os.listdir(path_to_fonts):
-        QFontDatabase.addApplicationFont(os.path.join(path_to_fonts, font))
-    path_to_stylesheet = get_resource_path(STYLE_PATH_SUFFIX)
-    with open(path_to_stylesheet, "r") as f:
-        qss = f.read()
-    app.setStyleSheet(qss)
+    startup_timer = StartupTimer()
+    with startup_timer.phase("create application"):
+        app = QApplication(sys.argv)
+
+    #load the fonts and stylesheet before the window is built, so its widgets are styled once instead of again when the stylesheet is set
+    with startup_timer.phase("read stylesheet"):
+        path_to_stylesheet = get_resource_path(STYLE_PATH_SUFFIX)
+        with open(path_to_stylesheet, "r") as f:
+            qss = f.read()
+    with startup_timer.phase("register fonts"):
+        font_manager = FontManager(get_resource_path(FONTS_PATH_SUFFIX)) #only the fonts used by the stylesheet
+        for family in font_manager.register_stylesheet_fonts(qss):
+            print(f"Font '{family}' is not bundled, a system font will be used instead")
+    for font_file_name, seconds in font_manager.registration_times.items():
+        startup_timer.add("  " + font_file_name, seconds)
+    with startup_timer.phase("apply stylesheet"):
+        app.setStyleSheet(qss)
+
+    with startup_timer.phase("build window"):
+        window = ModManager(startup_timer) #the settings and mod list are loaded after the window is first painted, see ModManager.start_loading()
 
     window.show()
     window.raise_()
@@ -0,0 +1,79 @@
+'''
+Compares extracting every .vpk in an archive one member at a time (how the mod manager used to do it) against the single-pass extraction in mod_extraction.py.
+Usage: python benchmarks/benchmark_archive_extraction.py [path/to/archive.7z|.rar|.zip]
+Without an argument, a solid .7z archive with MEMBER_COUNT generated .vpk files is created and used.
+'''
+import py7zr
+import rarfile
+import zipfile
+import tempfile
+import shutil
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) #the mod manager's modules are in the parent folder
+
+from mod_extraction import (extract_vpk_members, list_vpk_members)
+
+MEMBER_COUNT = 12
+MEMBER_SIZE = 8 * 1024 * 1024
+
+def create_solid_archive(archive_path: str) -> None:
+    '''
+    Writes a solid .7z archive with MEMBER_COUNT alternate .vpk files of MEMBER_SIZE bytes each. The contents are partially random so that LZMA has real work to do.
+    '''
+    with py7zr.SevenZipFile(archive_path, mode='w') as archive:
+        for i in range(MEMBER_COUNT):
+            data = (os.urandom(1024) + bytes(3072)) * (MEMBER_SIZE // 4096)
+            archive.writestr(data, f"alternate_{i}/pak01_dir.vpk")
+
+def extract_individually(archive_path: str, destination: str) -> None:
+    '''
+    The old extraction path, one extraction (and for .7z, one decompression of the solid stream) per member.
+    '''
+    member_names = list_vpk_members(archive_path)
+    _, file_extension = os.path.splitext(archive_path)
+    match file_extension.lower():
+        case ".7z":
+            with py7zr.SevenZipFile(archive_path, mode='r') as archive:
+                for name in member_names:
+                    archive.extract(targets=[name], path=destination)
+                    archive.reset()
+        case ".rar":
+            with rarfile.RarFile(archive_path) as archive:
+                for name in member_names:
+                    archive.extract(name, path=destination)
+        case ".zip":
+            with zipfile.ZipFile(archive_path, 'r') as zip_file:
+                for name in member_names:
+                    with zip_file.open(name) as source_file:
+                        os.makedirs(os.path.join(destination, os.path.dirname(name)), exist_ok=True)
+                        with open(os.path.join(destination, name), 'wb') as target_file:
+                            target_file.write(source_file.read())
+
+def time_function(function, *args) -> float:
+    start_time = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start_time
+
+if __name__ == "__main__":
+    working_directory = tempfile.mkdtemp()
+    try:
+        if len(sys.argv) > 1:
+            archive_path = sys.argv[1]
+        else:
+            archive_path = os.path.join(working_directory, "benchmark.7z")
+            create_solid_archive(archive_path)
+
+        member_count = len(list_vpk_members(archive_path))
+        individual_time = time_function(extract_individually, archive_path, os.path.join(working_directory, "individual"))
+        batched_time = time_function(extract_vpk_members, archive_path, os.path.join(working_directory, "batched"))
+
+        print(f"Archive: {archive_path} ({member_count} .vpk files)")
+        print(f"Per-member extraction: {individual_time:.2f} seconds")
+        print(f"Single-pass extraction (includes hashing): {batched_time:.2f} seconds")
+        if batched_time > 0:
+            print(f"Speedup: {individual_time / batched_time:.1f}x")
+    finally:
+        shutil.rmtree(working_directory, ignore_errors=True)
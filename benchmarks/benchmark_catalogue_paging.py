@@ -0,0 +1,119 @@
+'''
+Measures how long the mod browser takes to show a new page of the catalogue once the page has been fetched (ModBrowserWidget.update_catalogue()),
+and how much memory and how many widgets each page flip churns through. No requests are made: the pages are generated, their thumbnails are put in the
+thumbnail loader's memory cache beforehand, and the catalogue is pointed at an unreachable address so the browser's first search fails right away.
+Usage: python benchmarks/benchmark_catalogue_paging.py [--flips 200]
+'''
+import tracemalloc
+import statistics
+import argparse
+import time
+import sys
+import os
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen") #no window is needed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) #the mod manager's modules are in the parent folder
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import (QPixmap, QColor)
+from PyQt5.QtCore import QEvent
+
+DEFAULT_FLIP_COUNT = 200
+WARMUP_FLIP_COUNT = 10
+UNREACHABLE_URL = "http://127.0.0.1:9" #nothing listens on the discard port, so requests fail right away
+SOUND_EVERY = 4 #every fourth record is a sound, the others are mods with an image preview
+
+def generate_page(page: int, items_per_page: int) -> dict:
+    '''
+    Returns a Subfeed response for page, with records like the ones GameBanana sends.
+    '''
+    records = []
+    for i in range(items_per_page):
+        number = page * items_per_page + i
+        record = {
+            "_idRow": number, "_sName": f"Generated mod {number}", "_sProfileUrl": f"{UNREACHABLE_URL}/mods/{number}",
+            "_bIsObsolete": False, "_sInitialVisibility": "show", "_bWasFeatured": i == 0,
+            "_aSubmitter": {"_sName": f"Submitter {i}", "_sProfileUrl": f"{UNREACHABLE_URL}/members/{i}"},
+            "_nLikeCount": number, "_nViewCount": number * 10, "_nPostCount": i,
+        }
+        if i % SOUND_EVERY == SOUND_EVERY - 1:
+            record["_sModelName"] = "Sound"
+            record["_aPreviewMedia"] = {"_aMetadata": {"_sAudioUrl": f"{UNREACHABLE_URL}/sounds/{number}.mp3"}}
+        else:
+            record["_sModelName"] = "Mod"
+            record["_aPreviewMedia"] = {"_aImages": [{"_sBaseUrl": f"{UNREACHABLE_URL}/img", "_sFile220": f"{number}.jpg"}]}
+        records.append(record)
+    return {"_aRecords": records}
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measures how long showing a page of the mod browser's catalogue takes.")
+    parser.add_argument("--flips", type=int, default=DEFAULT_FLIP_COUNT, help="how many pages to flip through")
+    arguments = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    app.setQuitOnLastWindowClosed(False)
+
+    import deadlock_mod_catalogue
+    deadlock_mod_catalogue.GAMEBANANA_SUBFEED_URL = UNREACHABLE_URL
+    from deadlock_mod_catalogue import ITEMS_PER_PAGE
+    from deadlock_mod_browser import (ModBrowserWidget, record_thumbnail_url)
+    browser = ModBrowserWidget(None)
+    browser.show()
+
+    #every thumbnail is already in memory, like when flipping back to a page that was seen before
+    pages = [generate_page(page, ITEMS_PER_PAGE) for page in range(WARMUP_FLIP_COUNT + arguments.flips)]
+    thumbnail = QPixmap(200, 100)
+    thumbnail.fill(QColor("gray"))
+    for page in pages:
+        for record in page["_aRecords"]:
+            if record["_sModelName"] == "Mod":
+                browser.thumbnail_loader.memory_cache[record_thumbnail_url(record)] = thumbnail
+
+    def flip(page: dict) -> float:
+        start_time = time.perf_counter()
+        browser.update_catalogue(page)
+        app.processEvents() #lays out and paints the page
+        app.sendPostedEvents(None, QEvent.DeferredDelete) #processEvents() outside of the event loop leaves whatever was deleted with deleteLater() alive
+        return time.perf_counter() - start_time
+
+    def count_new_widgets() -> int:
+        '''
+        Returns how many widgets were created since the last call, by marking every widget that is alive with a property.
+        '''
+        new_widgets = 0
+        for widget in app.allWidgets():
+            if not widget.property("benchmark_seen"):
+                widget.setProperty("benchmark_seen", True)
+                new_widgets += 1
+        return new_widgets
+
+    for page in pages[:WARMUP_FLIP_COUNT]:
+        flip(page)
+    count_new_widgets()
+
+    widgets_before = len(app.allWidgets())
+    tracemalloc.start()
+    flip_times = []
+    widgets_created = 0
+    for page in pages[WARMUP_FLIP_COUNT:]:
+        flip_times.append(flip(page))
+        widgets_created += count_new_widgets()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    widgets_after = len(app.allWidgets())
+
+    flip_times.sort()
+    print(f"Page flips: {arguments.flips} of {ITEMS_PER_PAGE} items")
+    print(f"Time per flip: median {statistics.median(flip_times) * 1000:.2f} ms, 95th percentile {flip_times[int(len(flip_times) * 0.95)] * 1000:.2f} ms, "
+          f"max {flip_times[-1] * 1000:.2f} ms")
+    print(f"Peak Python memory allocated while flipping: {peak_memory / 1024:.0f} KiB")
+    print(f"Widgets created per flip: {widgets_created / arguments.flips:.1f}")
+    print(f"Live widgets: {widgets_before} before flipping, {widgets_after} after")
+
+    browser.catalogue_fetcher.shutdown()
+    browser.clear_catalogue()
+    browser.thumbnail_loader.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+'''
+Compares downloading a file in a single streamed request of 8 KB chunks (how the mod downloader used to do it) against the download engine in deadlock_mod_transfer.py,
+which splits large files into parallel ranged requests, adapts its chunk size and resumes dropped connections.
+Usage: python benchmarks/benchmark_download.py
+The files are served by a local server that supports Range requests, in three scenarios: unthrottled, limited to CONNECTION_RATE bytes per second per connection
+(like a file host that throttles each connection), and dropping every file's first connection halfway through.
+'''
+from http.server import (ThreadingHTTPServer, BaseHTTPRequestHandler)
+import threading
+import tempfile
+import time
+import sys
+import os
+import re
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) #the mod manager's modules are in the parent folder
+
+import deadlock_mod_transfer
+from deadlock_mod_transfer import download_file
+
+FILE_SIZE = 64 * 1024 * 1024
+THROTTLED_FILE_SIZE = 24 * 1024 * 1024
+CONNECTION_RATE = 8 * 1024 * 1024 #bytes per second per connection in the throttled scenario
+SEND_BLOCK_SIZE = 64 * 1024
+OLD_CHUNK_SIZE = 8192
+RANGE_PATTERN = re.compile(r"bytes=(\d+)-(\d*)")
+
+class BenchmarkServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), FileHandler)
+        self.files: dict[str, bytes] = {}
+        self.rate = 0 #bytes per second per connection, 0 for unthrottled
+        self.drop_first_connection = False
+        self.dropped_paths: set[str] = set()
+
+class FileHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        data = self.server.files.get(self.path)
+        if data is None:
+            self.send_error(404)
+            return
+        start, end = 0, len(data) - 1
+        range_match = RANGE_PATTERN.match(self.headers.get("Range", ""))
+        if range_match:
+            start = int(range_match.group(1))
+            end = min(int(range_match.group(2)), end) if range_match.group(2) else end
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+
+        drop_at = None
+        if self.server.drop_first_connection and self.path not in self.server.dropped_paths and end - start > SEND_BLOCK_SIZE:
+            self.server.dropped_paths.add(self.path)
+            drop_at = start + (end - start) // 2
+        start_time = time.perf_counter()
+        sent = 0
+        position = start
+        try:
+            while position <= end:
+                if drop_at is not None and position >= drop_at:
+                    self.close_connection = True
+                    self.connection.shutdown(2) #drop the connection without finishing the response
+                    return
+                block = data[position:min(position + SEND_BLOCK_SIZE, end + 1)]
+                self.wfile.write(block)
+                position += len(block)
+                sent += len(block)
+                if self.server.rate:
+                    ahead = sent / self.server.rate - (time.perf_counter() - start_time)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except (ConnectionError, OSError):
+            pass
+
+def download_single_stream(session: requests.Session, url: str, file_path: str) -> bool:
+    '''
+    The old download path: one request, written in OLD_CHUNK_SIZE chunks, no retry.
+    '''
+    try:
+        response = session.get(url, stream=True, allow_redirects=True, timeout=5)
+        response.raise_for_status()
+        with open(file_path, "wb") as file:
+            for chunk in response.iter_content(chunk_size=OLD_CHUNK_SIZE):
+                file.write(chunk)
+        return True
+    except Exception as e:
+        print("    single stream failed: " + str(e))
+        return False
+
+def run_scenario(name: str, server: BenchmarkServer, path: str, directory: str) -> None:
+    url = f"http://127.0.0.1:{server.server_port}{path}"
+    expected_data = server.files[path]
+    print(name)
+    for label, download in (("single stream, 8 KB chunks", download_single_stream), ("download engine", download_file)):
+        server.dropped_paths.clear()
+        file_path = os.path.join(directory, label.replace(" ", "_").replace(",", ""))
+        with requests.Session() as session:
+            start_time = time.perf_counter()
+            result = download(session, url, file_path)
+            elapsed = time.perf_counter() - start_time
+        complete = bool(result) and os.path.exists(file_path) and os.path.getsize(file_path) == len(expected_data)
+        if complete:
+            with open(file_path, "rb") as file:
+                complete = file.read() == expected_data
+        status = f"{len(expected_data) / 1024 / 1024 / elapsed:7.1f} MB/s" if complete else "  failed / incomplete"
+        print(f"  {label:<28} {elapsed:6.2f} s {status}")
+        if isinstance(result, deadlock_mod_transfer.DownloadStats):
+            print(f"    {result}")
+        for leftover_path in (file_path, file_path + deadlock_mod_transfer.DOWNLOAD_PART_SUFFIX):
+            if os.path.exists(leftover_path):
+                os.remove(leftover_path)
+
+if __name__ == "__main__":
+    deadlock_mod_transfer.DOWNLOAD_RETRY_DELAY = 0.1 #the dropped connections are on purpose, there's nothing to wait out
+    server = BenchmarkServer()
+    server.files["/large.zip"] = os.urandom(FILE_SIZE)
+    server.files["/throttled.zip"] = os.urandom(THROTTLED_FILE_SIZE)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    with tempfile.TemporaryDirectory() as directory:
+        run_scenario(f"Unthrottled, {FILE_SIZE // 1024 // 1024} MB:", server, "/large.zip", directory)
+        server.rate = CONNECTION_RATE
+        run_scenario(f"Throttled to {CONNECTION_RATE // 1024 // 1024} MB/s per connection, {THROTTLED_FILE_SIZE // 1024 // 1024} MB:", server, "/throttled.zip", directory)
+        server.drop_first_connection = True
+        run_scenario("Throttled, first connection dropped halfway:", server, "/throttled.zip", directory)
+    server.shutdown()
@@ -0,0 +1,116 @@
+'''
+Measures how long importing the mod manager takes at startup with python -X importtime, and checks that the modules that are only needed once the mod browser
+is opened (or a download starts) stay off the startup path.
+Usage: python benchmarks/benchmark_import_time.py [--save-baseline path/to/baseline.json] [--baseline path/to/baseline.json]
+With --save-baseline, the results are saved to compare later changes against. With --baseline, the script fails (exit code 1) if importing the mod manager
+got more than BASELINE_TOLERANCE slower than the saved results. It always fails if one of LAZY_MODULES is imported at startup.
+'''
+import subprocess
+import statistics
+import argparse
+import json
+import sys
+import os
+
+MAIN_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) #the mod manager's modules are in the parent folder
+
+REPEAT_COUNT = 5
+SLOWEST_IMPORT_COUNT = 10
+BASELINE_TOLERANCE = 0.25 #fraction of the baseline's import time that it may get slower by
+
+#the modules that should only be imported once they are used
+LAZY_MODULES = ["deadlock_mod_browser", "deadlock_mod_browser_features", "deadlock_mod_downloader", "cloudscraper", "requests", "selenium",
+                "webdriver_manager", "PyQt5.QtMultimedia", "py7zr"]
+
+STARTUP_IMPORT = "import EZDeadlockModManager"
+BROWSER_IMPORT = "import EZDeadlockModManager, deadlock_mod_browser, deadlock_mod_downloader, py7zr" #everything imported at startup before lazy imports
+
+def measure_imports(statement: str) -> tuple[float, dict[str, float]]:
+    '''
+    Runs statement in a new interpreter with -X importtime. Returns the total time of the imports in statement in milliseconds (without the interpreter's own startup),
+    and the cumulative time of every module that was imported, in milliseconds.
+    Raises RuntimeError if statement fails.
+    '''
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], cwd=MAIN_DIRECTORY, capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1])
+
+    module_times = {}
+    total = 0.0
+    top_level_modules = [name.strip() for name in statement.removeprefix("import ").split(",")]
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line: #skip the header
+            continue
+        _, cumulative, module_name = line.removeprefix("import time:").split("|")
+        cumulative_time = int(cumulative) / 1000
+        if module_name.strip() == "site": #the interpreter's own startup, everything before it isn't imported by statement
+            module_times.clear()
+            continue
+        module_times[module_name.strip()] = cumulative_time
+        if module_name.strip() in top_level_modules and not module_name.startswith("  "): #not imported by something else
+            total += cumulative_time
+    return total, module_times
+
+def find_imported_lazy_modules() -> list[str]:
+    '''
+    Returns the modules in LAZY_MODULES that are imported by importing the mod manager.
+    '''
+    process = subprocess.run([sys.executable, "-c", f"{STARTUP_IMPORT}; import sys; print('\\n'.join(sys.modules))"],
+                             cwd=MAIN_DIRECTORY, capture_output=True, text=True, check=True)
+    imported_modules = set(process.stdout.split())
+    return [module for module in LAZY_MODULES if module in imported_modules]
+
+def median_import_time(statement: str) -> tuple[float, dict[str, float]]:
+    '''
+    Measures statement REPEAT_COUNT times (the first run warms up the file system cache and .pyc files and is left out), returns the median total and the last module times.
+    '''
+    measure_imports(statement)
+    totals = []
+    module_times = {}
+    for _ in range(REPEAT_COUNT):
+        total, module_times = measure_imports(statement)
+        totals.append(total)
+    return statistics.median(totals), module_times
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measures the import time of the mod manager at startup.")
+    parser.add_argument("--save-baseline", help="save the results to this file")
+    parser.add_argument("--baseline", help="fail if importing got slower than the results saved in this file")
+    arguments = parser.parse_args()
+    passed = True
+
+    startup_time, module_times = median_import_time(STARTUP_IMPORT)
+    print(f"Importing the mod manager: {startup_time:.1f} ms (median of {REPEAT_COUNT})")
+    print("Slowest imports (cumulative):")
+    for module_name, module_time in sorted(module_times.items(), key=lambda item: item[1], reverse=True)[:SLOWEST_IMPORT_COUNT]:
+        print(f"  {module_name:<40} {module_time:8.1f} ms")
+
+    try:
+        browser_time, _ = median_import_time(BROWSER_IMPORT)
+        print(f"Importing the mod manager along with the mod browser and downloader: {browser_time:.1f} ms, {browser_time - startup_time:.1f} ms of which is now deferred")
+    except RuntimeError as e:
+        print("Could not import the mod browser and downloader to compare: " + str(e))
+
+    imported_lazy_modules = find_imported_lazy_modules()
+    if imported_lazy_modules:
+        print("FAIL: these modules are imported at startup but should only be imported when used: " + ", ".join(imported_lazy_modules))
+        passed = False
+
+    if arguments.baseline:
+        with open(arguments.baseline, "r", encoding="utf-8") as baseline_file:
+            baseline_time = json.load(baseline_file)["startup_import_ms"]
+        change = (startup_time - baseline_time) / baseline_time
+        print(f"Baseline: {baseline_time:.1f} ms ({change:+.0%})")
+        if change > BASELINE_TOLERANCE:
+            print(f"FAIL: importing the mod manager is more than {BASELINE_TOLERANCE:.0%} slower than the baseline")
+            passed = False
+
+    if arguments.save_baseline:
+        with open(arguments.save_baseline, "w", encoding="utf-8") as baseline_file:
+            json.dump({"startup_import_ms": startup_time, "python": sys.version}, baseline_file, indent=4)
+        print("Saved baseline to " + arguments.save_baseline)
+
+    return 0 if passed else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
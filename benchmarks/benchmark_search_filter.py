@@ -0,0 +1,112 @@
+'''
+Measures filter-as-you-type on a large generated mod library: how long the gui thread is blocked by each keystroke in the search bar, and how long it takes
+until the results are shown. Searches are scored SEARCH_TIME_BUDGET seconds at a time (see ModSearchModel in mod_search_index.py), which is compared against
+scoring every keystroke in one go. No files are created: the mods only exist in an in-memory mod library.
+Usage: python benchmarks/benchmark_search_filter.py [--mods 20000] [--rounds 5]
+'''
+import statistics
+import argparse
+import random
+import time
+import sys
+import os
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen") #no window is needed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) #the mod manager's modules are in the parent folder
+
+from PyQt5.QtWidgets import QApplication
+
+DEFAULT_MOD_COUNT = 20000
+DEFAULT_ROUND_COUNT = 5
+FRAME_TIME = 1 / 60 #seconds, a keystroke that blocks for longer than this drops a frame
+NAME_WORDS = ["abrams", "bebop", "dynamo", "grey talon", "haze", "infernus", "ivy", "kelvin", "lady geist", "lash", "mcginnis", "mo & krill", "paradox", "pocket",
+              "seven", "vindicta", "viscous", "warden", "wraith", "yamato", "hud", "crosshair", "icon", "skin", "model", "voice", "music", "ambient", "minimap", "font",
+              "dark", "light", "blue", "red", "gold", "retro", "anime", "clean", "classic", "remake"]
+#typed one character at a time, then deleted one character at a time, like a user searching for a few mods
+TYPED_QUERIES = ["dark skin", "a", "vindicta voice", "12", "hud"]
+
+def generate_mods(mod_count: int) -> list:
+    '''
+    Returns mod_count ModRecords with names made of a few random words, in folders like the ones mods are imported into.
+    '''
+    from constants import MOD_DIRECTORY
+    from mod_library import ModRecord
+    random.seed(mod_count)
+    mods = []
+    for mod_id in range(1, mod_count + 1):
+        name = " ".join(random.sample(NAME_WORDS, 3)) + f" v{mod_id % 9}"
+        file_path = os.path.join(MOD_DIRECTORY, str(mod_id), name.replace(" ", "_"), "pak01_dir.vpk")
+        mods.append(ModRecord(mod_id, name, file_path, True, "Mod", mod_id, 0, "", mod_id, True, 0, 0))
+    return mods
+
+def keystrokes(query: str) -> list[str]:
+    '''
+    Returns what the search bar contains after every keystroke of typing query and deleting it again.
+    '''
+    typed = [query[:length] for length in range(1, len(query) + 1)]
+    return typed + typed[-2::-1] + [""]
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measures how long filtering the mod list takes per keystroke on a large library.")
+    parser.add_argument("--mods", type=int, default=DEFAULT_MOD_COUNT, help="how many mods the library has")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUND_COUNT, help="how many times every query is typed")
+    arguments = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    from mod_library import ModLibrary
+    from mod_list_model import (ModListModel, ModListView)
+    from mod_search_index import (ModSearchModel, SEARCH_TIME_BUDGET)
+
+    mods = generate_mods(arguments.mods)
+    mod_list_model = ModListModel(ModLibrary(":memory:"))
+    mod_list_model.set_mods(mods)
+    start_time = time.perf_counter()
+    search_model = ModSearchModel(mod_list_model)
+    index_time = time.perf_counter() - start_time
+    view = ModListView(mod_list_model)
+    view.resize(600, 800)
+    view.show()
+    #switches the view like the mod manager does, see ModManager.filter_mods()
+    search_model.modelReset.connect(lambda: view.show_search_results(search_model if search_model.scores_query.strip() else None))
+    app.processEvents()
+
+    def type_key(text: str, in_one_go: bool) -> tuple[float, float]:
+        '''
+        Puts text in the search bar and waits for the results. Returns the longest time the gui thread was blocked, and the time until the results were shown.
+        '''
+        start_time = time.perf_counter()
+        search_model.set_query(text)
+        if in_one_go:
+            search_model.finish_search()
+        longest_block = time.perf_counter() - start_time
+        while search_model.is_searching():
+            block_start_time = time.perf_counter()
+            app.processEvents()
+            longest_block = max(longest_block, time.perf_counter() - block_start_time)
+        block_start_time = time.perf_counter()
+        app.processEvents() #lays out and paints the results
+        longest_block = max(longest_block, time.perf_counter() - block_start_time)
+        return longest_block, time.perf_counter() - start_time
+
+    print(f"Mods: {arguments.mods}, indexed in {index_time * 1000:.0f} ms")
+    print(f"Keystrokes: {sum(len(keystrokes(query)) for query in TYPED_QUERIES) * arguments.rounds} per mode, time budget {SEARCH_TIME_BUDGET * 1000:.0f} ms")
+    for mode, in_one_go in (("Time budget", False), ("In one go", True)):
+        blocks, result_times = [], []
+        for _ in range(arguments.rounds):
+            for query in TYPED_QUERIES:
+                for text in keystrokes(query):
+                    longest_block, result_time = type_key(text, in_one_go)
+                    blocks.append(longest_block)
+                    result_times.append(result_time)
+        blocks.sort()
+        result_times.sort()
+        dropped_frames = sum(block > FRAME_TIME for block in blocks)
+        print(f"{mode}:")
+        print(f"  Longest block per keystroke: median {statistics.median(blocks) * 1000:.2f} ms, 95th percentile {blocks[int(len(blocks) * 0.95)] * 1000:.2f} ms, " \
+              f"max {blocks[-1] * 1000:.2f} ms, {dropped_frames} keystroke(s) over {FRAME_TIME * 1000:.1f} ms")
+        print(f"  Time until the results are shown: median {statistics.median(result_times) * 1000:.2f} ms, " \
+              f"95th percentile {result_times[int(len(result_times) * 0.95)] * 1000:.2f} ms, max {result_times[-1] * 1000:.2f} ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,8 +10,19 @@ FONTS_PATH_SUFFIX = os.path.join("resources", "fonts")
 
 APPLICATION_DIRECTORY = appdirs.user_data_dir("EZDeadlockModManager", "")
 SETTINGS_FILE_PATH = os.path.join(APPLICATION_DIRECTORY, "settings.json")
+MOD_LIBRARY_PATH = os.path.join(APPLICATION_DIRECTORY, "mod_library.sqlite3")
 DOWNLOAD_FOLDER = os.path.join(APPLICATION_DIRECTORY, "Downloads")
 TEMPORARY_FOLDER_PREFIX = "EZDeadlockDownload_"
+PARTIAL_DOWNLOAD_FOLDER = os.path.join(DOWNLOAD_FOLDER, "Partial Downloads") #files are downloaded here first, and failed downloads are kept here to be resumed, see deadlock_mod_transfer.py
+
+#extracted mods are stored in the paths here
+GAMEBANANA_DIRECTORY = os.path.join(APPLICATION_DIRECTORY, "GameBanana")
+MOD_DIRECTORY = os.path.join(GAMEBANANA_DIRECTORY, "Mods")
+SOUND_DIRECTORY = os.path.join(GAMEBANANA_DIRECTORY, "Sounds")
+VPK_DIRECTORY = os.path.join(APPLICATION_DIRECTORY, "VPK Files")
+
+#thumbnails of the mod browser's catalogue are cached here, see deadlock_mod_thumbnails.py
+THUMBNAIL_CACHE_DIRECTORY = os.path.join(APPLICATION_DIRECTORY, "Thumbnail Cache")
 
 RESPONSE_WAIT_TIME = 5
 JSON_INDENT_AMOUNT = 2
@@ -1,19 +1,17 @@
-from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QPushButton, QLineEdit, QLabel, QHBoxLayout, QGridLayout)
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QPushButton, QLineEdit, QLabel, QHBoxLayout, QGridLayout, QMessageBox)
 from PyQt5.QtGui import (QIcon, QCloseEvent)
 
-import cloudscraper
+from functools import partial
 
 from constants import *
 from EZDeadlockModManager import ModManager
-from deadlock_mod_browser_features import (Paginate, SearchResultItemWidget)
+from deadlock_mod_browser_features import (Paginate, SearchResultItemWidget, handle_downloaded_mods)
+from deadlock_mod_catalogue import (CatalogueFetcher, ITEMS_PER_PAGE, SORT_NEW)
+from deadlock_mod_thumbnails import ThumbnailLoader
+from deadlock_mod_scheduler import (DownloadScheduler, DOWNLOAD_PRIORITY_PAGE)
 
 MOD_BROWSER_DIMENSIONS = [150, 150, 800, 500]
-ITEMS_PER_PAGE = 15
 COLUMNS = 5
-GAMEBANANA_BASE_GAME_URL = "https://gamebanana.com/apiv11/Game/20948/Subfeed?&_csvModelInclusions=Mod,Sound&_nPerpage=15&_nPage=" #must append a page number immediately after, also requires '_sSort' to be set in the url as well
-SORT_NEW_PARAMETER = "&_sSort=new"
-SORT_DEFAULT_PARAMETER = "&_sSort=default"
-SORT_UPDATED_PARAMETER = "&_sSort=updated"
 
 '''
 Check the postman documentation for the api here: https://www.postman.com/s0nought/gb-api-v11/request/ufm61ja/advanced-search?tab=overview
@@ -24,6 +22,13 @@ Note: Filtering mods in the browser by character category does not seem to be po
 (the API does return a category, but its a general category like "Skins" or "Model Replacement", not the character's category).
 '''
 
+def record_thumbnail_url(item: dict) -> str:
+    '''
+    Returns the url of the image preview of a Subfeed record of a mod (its first image). Raises KeyError or IndexError if the record doesn't have one.
+    '''
+    image = item['_aPreviewMedia']['_aImages'][0]
+    return image['_sBaseUrl'] + '/' + image['_sFile220']
+
 class ModBrowserWidget(QWidget):
     '''
     The mod browser window. Contains a search bar and a grid layout capable of displaying SearchResultItemWidgets.
@@ -32,7 +37,11 @@ class ModBrowserWidget(QWidget):
         super().__init__()
         
         self.main_window = main_window
-        self.current_page = 1 #used for cataloguing the search items, page indexes starts at 1
+        self.current_page = 1 #the page shown in the catalogue, page indexes starts at 1
+        self.requested_page = 1 #the page being fetched, pages are counted from this when paging again before it arrives
+        self.requested_pagination = Paginate.DO_NOT_PAGINATE
+        self.requested_query = ""
+        self.catalogue_items: list[SearchResultItemWidget] = [] #the items in the grid, reused for every page, see update_catalogue()
 
         layout = QVBoxLayout(self)
         self.setGeometry(*MOD_BROWSER_DIMENSIONS)
@@ -65,13 +74,28 @@ class ModBrowserWidget(QWidget):
         button_layout.addWidget(self.prev_button)
         button_layout.addStretch()
         button_layout.addWidget(self.page_label)
+        self.download_page_button = QPushButton("Download page  ↓") #queues every mod and sound on the page, see download_page()
+        self.download_page_button.clicked.connect(self.download_page)
+        button_layout.addWidget(self.download_page_button)
         button_layout.addStretch()
         button_layout.addWidget(self.next_button)
 
         layout.addLayout(button_layout)
 
-        self.scraper = cloudscraper.create_scraper()
-        self.download_scraper = cloudscraper.create_scraper() #this one is for multithreading
+        #downloads are queued and run on a few worker threads, each with its own session, see deadlock_mod_scheduler.py
+        self.download_scheduler = DownloadScheduler(self)
+        self.download_scheduler.state_changed.connect(self._show_download_state)
+        if main_window is not None: #only None when the browser is used on its own, e.x. in benchmarks/
+            self.download_scheduler.download_finished.connect(partial(handle_downloaded_mods, main_window)) #adds the mods to the mod list and deletes the temporary files/folders
+            self.download_scheduler.busy_changed.connect(main_window.download_warning_widget.setVisible) #lets the user know there are mods currently downloading
+
+        #pages of the catalogue are fetched off the gui thread, see deadlock_mod_catalogue.py
+        self.catalogue_fetcher = CatalogueFetcher(self)
+        self.catalogue_fetcher.page_loaded.connect(self._show_page)
+        self.catalogue_fetcher.page_failed.connect(self._show_page_error)
+        self.catalogue_fetcher.page_prefetched.connect(self._prefetch_thumbnails)
+
+        self.thumbnail_loader = ThumbnailLoader(self) #the tiles' image previews are loaded in the background, see deadlock_mod_thumbnails.py
 
         self.search(Paginate.DO_NOT_PAGINATE) #display the newest mods
 
@@ -79,7 +103,9 @@ class ModBrowserWidget(QWidget):
         '''
         Search and display mods similar to the query in the search bar. Does not display mods for queries that are 1-2 characters long.
         If the search bar is empty (0 character query), displays the newest mods for the game without a name restriction.
-        Returns True if the request was successful and the catalogue was populated, False if either fails.
+        The page is fetched in the background and shown once it arrives, see _show_page(). A search or page change made before then replaces this one,
+        and paging again while a page is loading pages from the one being loaded. Pages that were recently shown or prefetched are shown right away.
+        Returns True if the page was requested, False if not.
         Currently only sorts by newest entries first.
         Executed upon pressing Enter when interacting with the search bar.
         '''
@@ -87,44 +113,65 @@ class ModBrowserWidget(QWidget):
         if len(query) > 0 and len(query) < 3:
             return False
 
+        base_page = self.requested_page if self.catalogue_fetcher.is_loading() else self.current_page
         match pagination:
             case Paginate.DO_NOT_PAGINATE:
-                self.current_page = 1
+                page = 1
 
             case Paginate.PREVIOUS_PAGE:
-                if self.current_page > 1:
-                    self.current_page -= 1
+                if base_page > 1:
+                    page = base_page - 1
                 else:
                     return False
                 
             case Paginate.NEXT_PAGE:
-                self.current_page += 1
+                page = base_page + 1
 
-        if len(query) >= 3: #show the newest mods with the keyword
-            url = GAMEBANANA_BASE_GAME_URL + str(self.current_page) + SORT_NEW_PARAMETER + "&_sName=" + query
-        else: #show all the newest mods
-            url = GAMEBANANA_BASE_GAME_URL + str(self.current_page) + SORT_NEW_PARAMETER       
-    
-        response = self.scraper.get(url)
-        try:
-            response_data = response.json()
-        except ValueError:
-            # TODO: maybe close the mod browser object
-            response_data = {}
-            return self.update_catalogue(response_data)
+        self.requested_page = page
+        self.requested_pagination = pagination
+        self.requested_query = query if len(query) >= 3 else ""
+        self.page_label.setText(f"Loading page {page}...") #set before fetching, a cached page is shown before fetch() returns
+        self.catalogue_fetcher.fetch(page, self.requested_query, SORT_NEW) #show the newest mods, with the keyword if there is one
+        return True
 
+    def _show_page(self, request_id: int, response_data: dict) -> None:
+        '''
+        Shows the page fetched by the newest search in the catalogue. Bound to the catalogue fetcher, which only emits for the newest search.
+        '''
         #this just makes sure we don't mess up our current page and catalogue if there isn't a next page to load
-        if pagination == Paginate.NEXT_PAGE and not response_data['_aRecords']:
-            self.current_page -= 1
-            return False
-        
+        if self.requested_pagination == Paginate.NEXT_PAGE and not response_data.get('_aRecords'):
+            self.page_label.setText(f"Page {self.current_page} (no more results)")
+            return
+
         #update the catalogue based on the new page that was fetched
-        return self.update_catalogue(response_data)
+        if self.update_catalogue(response_data):
+            self.current_page = self.requested_page
+            if len(response_data['_aRecords']) >= ITEMS_PER_PAGE: #a full page, so there is probably a next one
+                self.catalogue_fetcher.prefetch(self.current_page + 1, self.requested_query, SORT_NEW)
+        self.page_label.setText(f"Page {self.current_page}")
+
+    def _prefetch_thumbnails(self, response_data: dict) -> None:
+        '''
+        Starts loading the image previews of a prefetched page, so they are there when the user flips to it. Bound to the catalogue fetcher.
+        '''
+        for item in response_data.get('_aRecords', []):
+            try:
+                if item['_sModelName'] == "Mod" and not item['_bIsObsolete']:
+                    self.thumbnail_loader.prefetch(record_thumbnail_url(item))
+            except (KeyError, IndexError, TypeError):
+                continue
+
+    def _show_page_error(self, request_id: int, reason: str) -> None:
+        '''
+        Keeps the current catalogue and shows why the newest search failed. Bound to the catalogue fetcher.
+        '''
+        print(reason)
+        self.page_label.setText(f"Page {self.current_page} ({reason})")
     
     def clear_catalogue(self) -> None:
         '''
         Deletes all previously loaded items, starting with the end of the catalogue first.
-        Call this before propagating the catalogue with new entries, or when deleting the search item container or mod browser.
+        Call this when deleting the search item container or mod browser, the items are otherwise reused by update_catalogue().
         '''
         for i in reversed(range(self.grid_layout.count())):
             item_widget = self.grid_layout.itemAt(i).widget()
@@ -132,11 +179,47 @@ class ModBrowserWidget(QWidget):
                 item_widget.setParent(None)
                 item_widget.close()
                 item_widget.deleteLater()
+        self.catalogue_items.clear()
+
+    def _catalogue_item(self, idx: int) -> SearchResultItemWidget:
+        '''
+        Returns the item at position idx in the catalogue, creating the items up to it if the catalogue doesn't have that many yet.
+        '''
+        while len(self.catalogue_items) <= idx:
+            #propagate the catalogue left to right first
+            row = len(self.catalogue_items) // COLUMNS
+            col = len(self.catalogue_items) % COLUMNS
+            item_widget = SearchResultItemWidget(self.main_window, thumbnail_loader=self.thumbnail_loader, download_scheduler=self.download_scheduler)
+            self.grid_layout.addWidget(item_widget, row, col)
+            self.catalogue_items.append(item_widget)
+        return self.catalogue_items[idx]
+
+    def download_page(self) -> None:
+        '''
+        Queues every mod and sound shown in the catalogue for downloading, after the user confirms. They are queued behind the downloads the user started one by one,
+        which stay first in line. Mods that are already queued are skipped.
+        '''
+        widgets = [widget for widget in self.catalogue_items if widget.isVisibleTo(self) and (widget.item_type == "Mod" or widget.item_type == "Sound")]
+        if not widgets:
+            return
+        response = QMessageBox.question(self, "Download page", f"Download all {len(widgets)} mods on this page?", QMessageBox.Yes | QMessageBox.No)
+        if response != QMessageBox.Yes:
+            return
+        for widget in widgets:
+            self.download_scheduler.enqueue(widget.link, widget.mod_name, widget.item_type, widget.number, DOWNLOAD_PRIORITY_PAGE)
+
+    def _show_download_state(self, number: int, item_type: str, state: str) -> None:
+        '''
+        Shows the new state of a download on the item showing that mod, if it is in the catalogue. Bound to the download scheduler.
+        '''
+        for widget in self.catalogue_items:
+            if widget.number == number and widget.item_type == item_type:
+                widget.set_download_state(state)
 
     def update_catalogue(self, response_data: dict) -> bool:
         '''
         Updates the results in the catalogue based on the entries retrieved from the response data.
-        Deletes all other items that were previously loaded.
+        The items already in the catalogue are rebound to the new entries rather than rebuilt, and hidden if there are more items than entries.
         Does not alter anything if the response data is incorrect (does not contain records). Does not display obsolete mods.
         Returns True unless the response_data is incorrect, which in that case returns False.
         '''
@@ -145,33 +228,29 @@ class ModBrowserWidget(QWidget):
         if '_aRecords' not in response_data: #just in case something was wrong about the query
             return False
 
-        self.clear_catalogue()
-
-        for idx, item in enumerate(response_data['_aRecords']):
-            #propagate the catalogue left to right first
-            row = idx // COLUMNS
-            col = idx % COLUMNS
+        records = response_data['_aRecords']
+        for idx, item in enumerate(records):
+            widget = self._catalogue_item(idx)
             try:
                 if item['_bIsObsolete']: #don't let the user see or download obselete mods, they don't work anyways
+                    widget.release()
+                    widget.hide()
                     continue
 
-                match item['_sModelName']: #create and add a new item to the catalogue, with custom parameters according to the item type
+                match item['_sModelName']: #show the entry in the item, with custom parameters according to the item type
                     case "Mod":
-                        widget = SearchResultItemWidget(self.main_window,
-                            item['_sName'], item['_sModelName'], item['_idRow'], item['_sProfileUrl'],
-                            item['_aPreviewMedia']['_aImages'][0]['_sBaseUrl'] + '/' + item['_aPreviewMedia']['_aImages'][0]['_sFile220']) #the first image is the media
+                        widget.bind(item['_sName'], item['_sModelName'], item['_idRow'], item['_sProfileUrl'],
+                            record_thumbnail_url(item)) #the first image is the media
 
                     case "Sound":
-                        widget = SearchResultItemWidget(self.main_window,
-                            item['_sName'], item['_sModelName'], item['_idRow'], item['_sProfileUrl'], 
+                        widget.bind(item['_sName'], item['_sModelName'], item['_idRow'], item['_sProfileUrl'], 
                             item['_aPreviewMedia']['_aMetadata']['_sAudioUrl']) #the sound preview is the media
 
                     case _:
                         '''
                         Concepts/Threads/Questions/Requests/Scripts/Sprays/Tools/Tutorials/WiPs
                         '''
-                        widget = SearchResultItemWidget(self.main_window,
-                             item['_sName'], item['_sModelName'], item['_idRow'], item['_sProfileUrl']) #note: no media is passed
+                        widget.bind(item['_sName'], item['_sModelName'], item['_idRow'], item['_sProfileUrl']) #note: no media is passed
                         
                 widget.set_submitter(item['_aSubmitter']['_sName'], item['_aSubmitter']['_sProfileUrl'])
                 if item['_sInitialVisibility'] == "show":
@@ -193,9 +272,15 @@ class ModBrowserWidget(QWidget):
                     widget.set_posts(0)
                 widget.set_featured_status(item['_bWasFeatured'])
 
-                self.grid_layout.addWidget(widget, row, col)
+                widget.show()
             except: #just in case the response has missing information
+                widget.release()
+                widget.hide()
                 continue
+
+        for widget in self.catalogue_items[len(records):]: #the last page can be shorter
+            widget.release()
+            widget.hide()
         return True
 
     def closeEvent(self, event: QCloseEvent) -> None:
@@ -1,7 +1,6 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QMessageBox)
-from PyQt5.QtGui import (QPixmap, QIcon, QColor, QCloseEvent)
-from PyQt5.QtCore import (Qt, QObject, QThread, pyqtSignal, QUrl)
-from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent
+from PyQt5.QtGui import (QPixmap, QColor, QCloseEvent)
+from PyQt5.QtCore import (Qt, QUrl)
 
 import requests
 
@@ -11,14 +10,23 @@ import tempfile
 
 from constants import *
 from EZDeadlockModManager import ModManager
-from deadlock_mod_downloader import download_mods
+from mod_ingestion import remove_downloaded_files
+from deadlock_mod_thumbnails import (ThumbnailLoader, placeholder_pixmap)
+from deadlock_mod_scheduler import (DownloadScheduler, DOWNLOAD_STATE_NONE, DOWNLOAD_STATE_QUEUED, DOWNLOAD_STATE_DOWNLOADING, DOWNLOAD_STATE_RETRYING)
 
 RESULT_ITEM_DIMENSIONS = [240, 225]
 FEATURED_BORDER = "2px solid green"
 IMAGE_WIDTH = 200
 IMAGE_HEIGHT = 100
 TRANSPARENT_IMAGE_COLOUR = QColor(0, 0, 0, 0)
-MAX_ONGOING_DOWNLOADS = 5
+
+#the download button's text for each state of a download, see SearchResultItemWidget.set_download_state()
+DOWNLOAD_BUTTON_TEXTS = {
+    DOWNLOAD_STATE_NONE: "Download  ↓",
+    DOWNLOAD_STATE_QUEUED: "Queued  ✕",
+    DOWNLOAD_STATE_DOWNLOADING: "Downloading...  ✕",
+    DOWNLOAD_STATE_RETRYING: "Retrying...  ✕",
+}
 
 def load_image_from_url(url: str) -> QPixmap:
     '''
@@ -46,11 +54,12 @@ class SoundPreviewWidget(QWidget):
     '''
     Custom sound preview widget for mods that alter game sound effects.
     Fetches the sound clip at the url only when first played, and toggles the playing state when clicked.
+    The media player (and QtMultimedia with it) is only created when the sound is first played, since most previews never are.
     Note: needs the actual file's path, not the mod page.
     '''
     def __init__(self, url:str) -> None:
         '''
-        The preview widget only consists of the toggle button and the underlying media player, 
+        The preview widget only consists of the toggle button and the underlying media player (created on first play, see _load_sound_file()),
         along with the class attributes needed for it to fetch and store the sound effects.
         '''
         super().__init__()
@@ -69,7 +78,13 @@ class SoundPreviewWidget(QWidget):
 
         self.setLayout(layout)
 
-        #media player
+        self.player = None
+
+    def _create_player(self) -> None:
+        '''
+        Creates the media player, importing QtMultimedia the first time any preview is played.
+        '''
+        from PyQt5.QtMultimedia import QMediaPlayer
         self.player = QMediaPlayer(parent=self)
         self.player.setVolume(20)
         self.player.stateChanged.connect(self._update_button) #update the button's text when the sound is toggled
@@ -95,6 +110,9 @@ class SoundPreviewWidget(QWidget):
             self.sound_file.close()
 
             #finally load the sound file from its temporary path
+            from PyQt5.QtMultimedia import QMediaContent
+            if not self.player:
+                self._create_player()
             file_path = QUrl.fromLocalFile(self.sound_file.name)
             self.player.setMedia(QMediaContent(file_path))
             self.sound_file_loaded = True
@@ -112,172 +130,103 @@ class SoundPreviewWidget(QWidget):
             if not self._load_sound_file():
                 return False
 
-        if self.player.state() == QMediaPlayer.PlayingState:
+        if self._is_playing():
             self.player.pause()
         else:
             self.player.play()
         return True
 
-    def _update_button(self, state: QMediaPlayer.State) -> None:
+    def _is_playing(self) -> bool:
+        if self.player is None: #never played, so QtMultimedia doesn't need to be imported
+            return False
+        from PyQt5.QtMultimedia import QMediaPlayer
+        return self.player.state() == QMediaPlayer.PlayingState
+
+    def _update_button(self, state: int) -> None:
         '''
-        Update's the toggle button's text based on the media player's current playing state.
+        Update's the toggle button's text based on the media player's current playing state (a QMediaPlayer.State).
         '''
+        from PyQt5.QtMultimedia import QMediaPlayer
         if state == QMediaPlayer.PlayingState:
             self.play_pause_button.setText("Pause ⏸")
         else:
             self.play_pause_button.setText("Preview Sound ♪")
 
-    def closeEvent(self, event: QCloseEvent) -> None:
+    def set_url(self, url: str) -> None:
         '''
-        Override for when the widget is closed. Note that since this widget is never opened as a window, .close() must be called on the widget for this to trigger.
-        Pauses the player if it is currently playing, and then removes the temporary sound file.
+        Switches the preview to the sound clip at url, which is fetched when it is first played. Stops the current sound and removes its temporary file,
+        but keeps the media player. Used when the item showing this preview is reused for another sound, see SearchResultItemWidget.bind().
         '''
-        if self.player.state() == QMediaPlayer.PlayingState:
-            self.player.pause()
+        if url == self.url:
+            return
+        self.stop()
+        self._remove_sound_file()
+        self.url = url
+
+    def stop(self) -> None:
+        '''
+        Stops the sound if it is playing, and unloads it from the media player so its temporary file can be removed.
+        '''
+        if self.player is None:
+            return
+        from PyQt5.QtMultimedia import QMediaContent
+        self.player.stop()
+        self.player.setMedia(QMediaContent())
+        self.sound_file_loaded = False
 
+    def _remove_sound_file(self) -> None:
         if self.sound_file:
             try:
                 os.remove(self.sound_file.name)
             except Exception as e:
                 print("Failed to delete temporary sound file: " + str(e))
-        event.accept()
-
-class DownloadWorker(QObject):
-    '''
-    Worker object to support concurrency when downloading mods. Instantiate this and a QThread object and bind them together,
-    and don't forget to set the start and end behaviour for both the worker and the thread, see _start_download_thread() below.
-    link should be the actual mod page, like: "https://gamebanana.com/sounds/79236". These are fetched when the mod browser searches, and are stored in the SearchResultItemWidget.
-    mod_name is simply the name of the mod as it appears on the mod page.
-    '''
-    finished = pyqtSignal(list, ModManager, str, str, int, bool) #see _handle_downloaded_mods()
-
-    def __init__(self, main_window: ModManager, link: str, mod_name: str, item_type: str, number: int) -> None:
-        super().__init__()
-        self.main_window = main_window
-        self.link = link
-        self.mod_name = mod_name
-        self.item_type = item_type
-        self.number = number
+            self.sound_file = None
+        self.sound_file_loaded = False
 
-    def run(self):
+    def closeEvent(self, event: QCloseEvent) -> None:
         '''
-        This is what should occur when the thread is started (assuming it is bound to the worker). See download_mods() in the mod_downloader module.
+        Override for when the widget is closed. Note that since this widget is never opened as a window, .close() must be called on the widget for this to trigger.
+        Stops the player, and then removes the temporary sound file.
         '''
-        file_paths, mods_downloaded_successfully = download_mods(self.link, self.main_window.mod_browser.download_scraper)
-        #note: mod name cannot have commas due to how information is stored in the modpack file
-        self.finished.emit(file_paths, self.main_window, self.mod_name.replace(",", ""), self.item_type, self.number, mods_downloaded_successfully) #this triggers _handle_downloaded_mods()
-
-def _start_download_thread(main_window: ModManager, mod_page_link: str, mod_name: str, item_type: str, number: int) -> None:
-    '''
-    Called when clicking the download button for a mod in the mod browser. Creates and starts a QThread that downloads the mod at the link's mod page.
-    Handles adding to the mod manager's mod list in a concurrent manner, setting the mods to be added only after being given the signal when the worker is finished.
-    Requires main_window.worker_thread_lock to eventually become available to start executing the thread.
-    '''
-    with main_window.worker_thread_lock:
-        main_window.download_warning_widget.setVisible(True) #lets the user know there are mods currently downloading
-
-        if (number, item_type) in main_window.workers_and_threads:
-            msg_box = QMessageBox()
-            msg_box.setWindowTitle("Alert!")
-            path_to_icon = get_resource_path(WINDOW_ICON_PATH_SUFFIX)
-            msg_box.setWindowIcon(QIcon(path_to_icon))
-            msg_box.setText("You are already downloading this mod!")
-            msg_box.exec_()
-            return
-
-        if len(main_window.workers_and_threads) >= MAX_ONGOING_DOWNLOADS:
-            msg_box = QMessageBox()
-            msg_box.setWindowTitle("Alert!")
-            path_to_icon = get_resource_path(WINDOW_ICON_PATH_SUFFIX)
-            msg_box.setWindowIcon(QIcon(path_to_icon))
-            msg_box.setText("Too many ongoing downloads (5)!")
-            msg_box.exec_()
-            return
-
-        #now create the thread and worker function, and set their references
-        thread = QThread()
-        worker = DownloadWorker(main_window, mod_page_link, mod_name, item_type, number)
-        worker.moveToThread(thread) #bind the worker to the thread
-        main_window.workers_and_threads[(number, item_type)] = (worker, thread) #this is crucial as to not lose the memory addresses of the threads, otherwise we will crash
-
-    thread.started.connect(worker.run) #this actually downloads the mods, see DownloadWorker.run()
-    worker.finished.connect(_handle_downloaded_mods) #adds the mods to our mod list in the mod manager and deletes the temporary files/folders
-    thread.finished.connect(lambda: _cleanup_download_thread(main_window, number, item_type)) #this will delete the references in memory to the thread
-    worker.finished.connect(thread.quit)
-
-    worker.finished.connect(worker.deleteLater)
-    thread.finished.connect(thread.deleteLater)
-
-    thread.start()
+        self.stop()
+        self._remove_sound_file()
+        event.accept()
 
-def _handle_downloaded_mods(file_paths: list[str], main_window: ModManager, 
-                            mod_name: str, item_type: str, number: int, mods_downloaded_successfully: bool) -> None:
+def handle_downloaded_mods(main_window: ModManager, file_paths: list[str], mod_name: str, item_type: str, number: int, mods_downloaded_successfully: bool) -> None:
     '''
-    Adds the mods concurrently (if downloaded successfully). Removes them from the paths they were originally downloaded to, and deletes their temporary parent directory.
-    This function is to be bound to the worker when it is finished, and never to be called explicitly.
+    Adds the mods concurrently (if downloaded successfully). The mod manager's ingestion engine removes them from the paths they were originally downloaded to once they are extracted,
+    and deletes their temporary parent directory.
+    This function is to be bound to the download scheduler's download_finished signal (with main_window bound first), and never to be called explicitly.
     '''
     if not mods_downloaded_successfully:
         QMessageBox.information(main_window, "Error", "Failed to download one or more mods.")
-    if file_paths:
-        main_window.add_mod(file_paths, mod_name, item_type, number)
-
-    for file in file_paths:
-        try:
-            os.remove(file)
-        except:
-            print("Error, could not delete temporary file.")
-    if file_paths:
-        parent_directory = os.path.dirname(file_paths[0]) #all downloaded files in a thread have the same parent directory, so this is fine
-        if not os.listdir(parent_directory): #empty so now we clean up the folder
-            try:
-                os.rmdir(parent_directory)
-            except:
-                print("Error, could not delete: Directory is not empty or invalid permissions.")
-            
-def _cleanup_download_thread(main_window: ModManager, download_num: int, item_type: str) -> None:
-    '''
-    Concurrently deletes the references to the worker and thread that correspond with the download number.
-    Also removes the download warning if this happens to be the only download thread remaining.
-    Requires main_window.worker_thread_lock to execute.
-    This function is to be bound to the thread upon finishing, and never to be called explicitly.
-    '''
-    with main_window.worker_thread_lock:
-        del main_window.workers_and_threads[(download_num, item_type)]
-        print((download_num, item_type))
-        if not main_window.workers_and_threads:
-            main_window.download_warning_widget.setVisible(False)
+    if file_paths and not main_window.add_mod(file_paths, mod_name, item_type, number, remove_source_files=True):
+        remove_downloaded_files(file_paths) #nothing was submitted for importing, so the files need to be cleaned up here
 
 class SearchResultItemWidget(QWidget):
     '''
     Widget for items that appear in the catalogue when the mod browser's search is triggered. Currently features
     a title label, a details button that links straight to the mod page in a web browser, a download button, and
     media preview based on a link to a file (image previews for mods and a sound preview for sound effects).
+    Image previews are loaded by thumbnail_loader in the background, with a placeholder shown until they arrive (without a loader, they are loaded right away).
+    The download button queues the mod in download_scheduler, and cancels it while it is queued or downloading (without a scheduler, it does nothing).
+    Items are reused from page to page of the catalogue: bind() shows another entry in the item without rebuilding it.
     '''
-    def __init__(self, main_window: ModManager, mod_name: str, item_type: str, number: int, link: str, media: str=""):
+    def __init__(self, main_window: ModManager, mod_name: str="", item_type: str="", number: int=0, link: str="", media: str="",
+                 thumbnail_loader: ThumbnailLoader | None=None, download_scheduler: DownloadScheduler | None=None):
         super().__init__()
         self.main_window = main_window
-        self.mod_name = mod_name
-        self.item_type = item_type #"Mod" or "Sound" are supported currently for downloading, "Request" or others should not be downloaded
-        self.number = number #mod or sound number
-        self.link = link #this goes to the mod page
-        self.media = media #first image for mod or sound preview for sound effects
-
-        '''
-        These attributes are purely cosmetic (not used for downloading, and they do not affect other parts of the program).
-        Set them using the appropriate setter functions after instantiation.
-        '''
-        self.submitter = ""
-        self.submitter_url = ""
-        self.visible_preview = False
-        self.likes = 0
-        self.views = 0
+        self.thumbnail_loader = thumbnail_loader
+        self.download_scheduler = download_scheduler
+        self.thumbnail_ticket = None #set while the image preview is loading
+        self.sound_preview = None #created the first time the item shows a sound, and kept (hidden) when it shows a mod afterwards
         self.featured = False
 
         layout = QVBoxLayout()
         self.setContentsMargins(5, 10, 5, 10)
 
         #mod title
-        self.name_label = QLabel(mod_name)
+        self.name_label = QLabel()
         self.name_label.setObjectName("mod-title")
         self.name_label.setAlignment(Qt.AlignCenter)
         self.name_label.setWordWrap(True)
@@ -285,22 +234,21 @@ class SearchResultItemWidget(QWidget):
 
         layout.addStretch()
 
-        #add either a sound or image preview
-        _, media_file_extension = os.path.splitext(media)
-        if media_file_extension == ".mp3" or media_file_extension == ".wav" or media_file_extension == ".ogg":
-            layout.addWidget(SoundPreviewWidget(media))
-        else:
-            label = QLabel()
-            label.setObjectName("thumbnail")
-            label.setPixmap(load_image_from_url(media)) #this loads a transparent image if no media link is given
-            label.setScaledContents(True)
-            layout.addWidget(label)
+        #either a sound or image preview is shown here
+        self.media_layout = QVBoxLayout()
+        self.media_layout.setContentsMargins(0, 0, 0, 0)
+        self.thumbnail_label = QLabel()
+        self.thumbnail_label.setObjectName("thumbnail")
+        self.thumbnail_label.setScaledContents(True)
+        self.media_layout.addWidget(self.thumbnail_label)
+        layout.addLayout(self.media_layout)
 
         layout.addStretch()
 
         #submitter/author
         self.submitter_link = QPushButton("By :")
         self.submitter_link.setObjectName("submitter-link")
+        self.submitter_link.clicked.connect(lambda: webbrowser.open_new_tab(self.submitter_url))
         layout.addWidget(self.submitter_link)
 
         info_layout = QHBoxLayout()
@@ -328,16 +276,113 @@ class SearchResultItemWidget(QWidget):
 
         layout.addLayout(info_layout)
 
-        #download button
-        if item_type == "Mod" or item_type == "Sound": #don't add the download button for requests/concepts/threads or any other item types
-            self.download_button = QPushButton("Download  ↓")
-            self.download_button.setObjectName("download-button")
-            self.download_button.clicked.connect(lambda: _start_download_thread(main_window, link, mod_name, item_type, number))
-            layout.addWidget(self.download_button)
+        #download button, only shown for mods and sounds (see bind())
+        self.download_button = QPushButton(DOWNLOAD_BUTTON_TEXTS[DOWNLOAD_STATE_NONE])
+        self.download_button.setObjectName("download-button")
+        self.download_button.clicked.connect(self._toggle_download)
+        layout.addWidget(self.download_button)
 
         self.setFixedSize(*RESULT_ITEM_DIMENSIONS)
         self.setLayout(layout)
 
+        self.bind(mod_name, item_type, number, link, media)
+
+    def bind(self, mod_name: str, item_type: str, number: int, link: str, media: str="") -> None:
+        '''
+        Shows the entry with these attributes in the item, replacing the one it showed before (see ModBrowserWidget.update_catalogue()).
+        The cosmetic attributes are reset, set them with the appropriate setter functions afterwards.
+        '''
+        self.release()
+        self.mod_name = mod_name
+        self.item_type = item_type #"Mod" or "Sound" are supported currently for downloading, "Request" or others should not be downloaded
+        self.number = number #mod or sound number
+        self.link = link #this goes to the mod page
+        self.media = media #first image for mod or sound preview for sound effects
+
+        '''
+        These attributes are purely cosmetic (not used for downloading, and they do not affect other parts of the program).
+        Set them using the appropriate setter functions after binding.
+        '''
+        self.set_submitter("")
+        self.set_preview_visibility(False)
+        self.set_likes(0)
+        self.set_views(0)
+        self.set_posts(0)
+        self.set_featured_status(False)
+
+        self.name_label.setText(mod_name)
+
+        #show either a sound or image preview
+        _, media_file_extension = os.path.splitext(media)
+        if media_file_extension == ".mp3" or media_file_extension == ".wav" or media_file_extension == ".ogg":
+            if self.sound_preview is None:
+                self.sound_preview = SoundPreviewWidget(media)
+                self.media_layout.addWidget(self.sound_preview)
+            else:
+                self.sound_preview.set_url(media)
+            self.thumbnail_label.hide()
+            self.sound_preview.show()
+        else:
+            if self.sound_preview is not None:
+                self.sound_preview.hide()
+            if media and self.thumbnail_loader:
+                self.thumbnail_label.setPixmap(placeholder_pixmap(IMAGE_WIDTH, IMAGE_HEIGHT))
+                self.thumbnail_ticket = self.thumbnail_loader.load(media, self._set_thumbnail)
+            else:
+                self.thumbnail_label.setPixmap(load_image_from_url(media)) #this loads a transparent image if no media link is given
+            self.thumbnail_label.show()
+
+        #don't show the download button for requests/concepts/threads or any other item types
+        self.download_button.setVisible(item_type == "Mod" or item_type == "Sound")
+        self.set_download_state(self.download_scheduler.state(number, item_type) if self.download_scheduler else DOWNLOAD_STATE_NONE)
+
+    def release(self) -> None:
+        '''
+        Cancels loading the image preview if it hasn't arrived yet, and stops the sound preview. Call this when the item is hidden, bind() calls it as well.
+        '''
+        if self.thumbnail_ticket is not None:
+            self.thumbnail_loader.cancel(self.thumbnail_ticket)
+            self.thumbnail_ticket = None
+        if self.sound_preview is not None:
+            self.sound_preview.stop()
+
+    def _toggle_download(self) -> None:
+        '''
+        Queues the mod for downloading, or cancels its download if it is already queued. Bound to the download button.
+        '''
+        if self.download_scheduler is None:
+            return
+        if self.download_scheduler.state(self.number, self.item_type) == DOWNLOAD_STATE_NONE:
+            self.download_scheduler.enqueue(self.link, self.mod_name, self.item_type, self.number)
+        else:
+            self.download_scheduler.cancel(self.number, self.item_type)
+
+    def set_download_state(self, state: str) -> None:
+        '''
+        Shows the state of the mod's download (one of the DOWNLOAD_STATE_ constants) on the download button. See ModBrowserWidget._show_download_state().
+        '''
+        self.download_button.setText(DOWNLOAD_BUTTON_TEXTS[state])
+        self.download_button.setToolTip("" if state == DOWNLOAD_STATE_NONE else "Click to cancel the download")
+
+    def _set_thumbnail(self, pixmap: QPixmap | None) -> None:
+        '''
+        Replaces the placeholder with the loaded image preview, or a transparent image if it couldn't be loaded. Called by the thumbnail loader.
+        '''
+        self.thumbnail_ticket = None
+        if pixmap is None:
+            pixmap = load_image_from_url("")
+        self.thumbnail_label.setPixmap(pixmap)
+
+    def closeEvent(self, event: QCloseEvent) -> None:
+        '''
+        Override for when the item is closed (see ModBrowserWidget.clear_catalogue()). Cancels loading the image preview if it hasn't arrived yet,
+        and closes the sound preview, which removes its temporary file.
+        '''
+        self.release()
+        if self.sound_preview is not None:
+            self.sound_preview.close()
+        event.accept()
+
     def set_media(self, media_url: str):
         self.media = media_url
     
@@ -345,7 +390,6 @@ class SearchResultItemWidget(QWidget):
         self.submitter = submitter
         self.submitter_url = submitter_url
         self.submitter_link.setText("By : " + submitter)
-        self.submitter_link.clicked.connect(lambda: webbrowser.open_new_tab(submitter_url))
 
     def set_preview_visibility(self, visibility: bool):
         self.visible_preview = visibility
@@ -363,6 +407,10 @@ class SearchResultItemWidget(QWidget):
         self.post_count_label.setText("🗨 " + str(post_count))
 
     def set_featured_status(self, featured: bool):
+        if featured == self.featured: #restyling the label is slow, and most items aren't featured
+            return
         self.featured = featured
         if featured:
-            self.name_label.setStyleSheet(f"border: {FEATURED_BORDER};")
\ No newline at end of file
+            self.name_label.setStyleSheet(f"border: {FEATURED_BORDER};")
+        else:
+            self.name_label.setStyleSheet("")
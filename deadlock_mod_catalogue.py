@@ -0,0 +1,279 @@
+from PyQt5.QtCore import (QObject, QTimer, pyqtSignal)
+
+from concurrent.futures import (Future, ThreadPoolExecutor)
+from collections import OrderedDict
+from urllib.parse import quote
+from typing import Callable
+import threading
+import json
+import time
+
+import cloudscraper
+import requests
+
+from constants import *
+
+GAMEBANANA_SUBFEED_URL = "https://gamebanana.com/apiv11/Game/20948/Subfeed"
+SUBFEED_MODEL_INCLUSIONS = "Mod,Sound"
+ITEMS_PER_PAGE = 15
+SORT_NEW = "new" #allowed values of the _sSort parameter: new, default, updated
+SORT_DEFAULT = "default"
+SORT_UPDATED = "updated"
+
+CATALOGUE_FETCH_THREADS = 3 #a superseded request and a prefetch can still be waiting on the network while the newest one is sent
+CATALOGUE_CONNECT_TIMEOUT = RESPONSE_WAIT_TIME #seconds
+CATALOGUE_READ_TIMEOUT = 10 #seconds without receiving any data
+CATALOGUE_READ_CHUNK_SIZE = 16 * 1024 #bytes read at a time, a superseded request stops reading between chunks
+CATALOGUE_REQUEST_TIMEOUT = 20000 #milliseconds for the whole request, after which it is given up on even if data is still trickling in
+CATALOGUE_CACHE_SIZE = 30 #pages kept in memory, the least recently used ones are dropped past this
+CATALOGUE_CACHE_TTL = 300 #seconds a page is shown from memory before it is fetched again, so new mods still show up
+
+'''
+Fetches pages of the GameBanana Subfeed (the mods shown in the mod browser) off the gui thread.
+GameBanana sits behind Cloudflare, so the requests go through cloudscraper sessions rather than QNetworkAccessManager, on a small thread pool.
+
+Every fetch gets a request id, and only the newest request counts: when a search or page change supersedes a request, the older request is dropped
+if it hasn't started yet. If it has, it is abandoned as soon as its thread gets back control: the response is streamed in chunks of CATALOGUE_READ_CHUNK_SIZE,
+and the connection is closed once the request is superseded, between chunks or right after the headers arrive (waiting on the connection or the headers can't be
+interrupted, but it can't hold up the newer request either, since there's more than one thread). Requests time out after CATALOGUE_REQUEST_TIMEOUT milliseconds, on top of the connect and read timeouts of each request.
+
+Fetched pages are kept in a CataloguePageCache for CATALOGUE_CACHE_TTL seconds, so flipping back to a page doesn't fetch it again. The page after the one being shown
+can be prefetched in the background (see CatalogueFetcher.prefetch()), so flipping forward is usually instant as well: a page that is still being prefetched
+when it is asked for is waited on instead of being fetched a second time.
+'''
+
+def build_subfeed_url(page: int, query: str="", sort: str=SORT_NEW) -> str:
+    '''
+    Returns the Subfeed url for page (starting from 1) of the mods matching query (every mod if query is empty), sorted by sort.
+    '''
+    url = f"{GAMEBANANA_SUBFEED_URL}?_csvModelInclusions={SUBFEED_MODEL_INCLUSIONS}&_nPerpage={ITEMS_PER_PAGE}&_nPage={page}&_sSort={sort}"
+    if query:
+        url += "&_sName=" + quote(query)
+    return url
+
+class CataloguePageCache:
+    '''
+    Subfeed responses keyed by (query, page, sort). Pages expire ttl seconds after they were fetched, and the least recently used pages are dropped past size pages.
+    '''
+    def __init__(self, size: int=CATALOGUE_CACHE_SIZE, ttl: float=CATALOGUE_CACHE_TTL) -> None:
+        self.size = size
+        self.ttl = ttl
+        self.pages: OrderedDict[tuple[str, int, str], tuple[float, dict]] = OrderedDict() #key -> (when it was fetched, response data), least recently used first
+
+    def __contains__(self, key: tuple[str, int, str]) -> bool:
+        return self.get(key) is not None
+
+    def get(self, key: tuple[str, int, str]) -> dict | None:
+        '''
+        Returns the cached response for key, or None if it isn't cached or has expired.
+        '''
+        entry = self.pages.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > self.ttl:
+            del self.pages[key]
+            return None
+        self.pages.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: tuple[str, int, str], response_data: dict) -> None:
+        self.pages[key] = (time.monotonic(), response_data)
+        self.pages.move_to_end(key)
+        while len(self.pages) > self.size:
+            self.pages.popitem(last=False)
+
+    def clear(self) -> None:
+        self.pages.clear()
+
+class RequestSupersededError(Exception):
+    '''
+    Raised by a catalogue request that stopped reading its response, because a newer request replaced it or the fetcher shut down.
+    '''
+
+class CatalogueFetcher(QObject):
+    '''
+    Fetches Subfeed pages on a thread pool. page_loaded and page_failed are emitted on the gui thread, and only for the newest request.
+    page_prefetched is emitted when a prefetched page arrives before it is asked for. Call shutdown() before the fetcher is deleted.
+    '''
+    page_loaded = pyqtSignal(int, dict) #request id, response data
+    page_failed = pyqtSignal(int, str) #request id, reason
+    page_prefetched = pyqtSignal(dict) #response data
+    _fetch_finished = pyqtSignal(int, object, dict) #emitted from the thread pool with the request's cache key, see _fetch()
+    _fetch_failed = pyqtSignal(int, str)
+    _prefetch_finished = pyqtSignal(object, dict) #cache key, response data, see _prefetch()
+    _prefetch_failed = pyqtSignal(object, str)
+
+    def __init__(self, parent: QObject | None=None) -> None:
+        super().__init__(parent)
+        self.executor = ThreadPoolExecutor(max_workers=CATALOGUE_FETCH_THREADS, thread_name_prefix="catalogue")
+        self.thread_data = threading.local() #each thread has its own scraper, since a session isn't safe to share between threads
+        self.current_request = 0
+        self.is_shut_down = False
+        self.pending_future: Future | None = None
+        self.page_cache = CataloguePageCache()
+        self.prefetches: dict[tuple[str, int, str], Future] = {} #cache key -> prefetch in progress
+        self.awaited_prefetch: tuple[str, int, str] | None = None #the prefetch that the newest request is waiting on, instead of fetching the page itself
+
+        self.timeout_timer = QTimer(self)
+        self.timeout_timer.setSingleShot(True)
+        self.timeout_timer.setInterval(CATALOGUE_REQUEST_TIMEOUT)
+        self.timeout_timer.timeout.connect(self._request_timed_out)
+
+        #results are sent back to the gui thread through these, so they are only handled if they belong to the newest request
+        self._fetch_finished.connect(self._finish_request)
+        self._fetch_failed.connect(self._fail_request)
+        self._prefetch_finished.connect(self._finish_prefetch)
+        self._prefetch_failed.connect(self._fail_prefetch)
+
+    def fetch(self, page: int, query: str="", sort: str=SORT_NEW) -> int:
+        '''
+        Starts fetching page of the mods matching query, superseding any request that is still going. Returns the id of the new request.
+        If the page is cached, page_loaded is emitted before this returns.
+        '''
+        self.cancel()
+        request_id = self.current_request
+        key = (query, page, sort)
+        response_data = self.page_cache.get(key)
+        if response_data is not None:
+            self.page_loaded.emit(request_id, response_data)
+            return request_id
+
+        if key in self.prefetches: #the page is already on its way
+            self.awaited_prefetch = key
+        else:
+            self.pending_future = self.executor.submit(self._fetch, request_id, key)
+        self.timeout_timer.start()
+        return request_id
+
+    def prefetch(self, page: int, query: str="", sort: str=SORT_NEW) -> None:
+        '''
+        Starts fetching page of the mods matching query into the cache, without superseding the current request. Does nothing if the page is cached or already being prefetched.
+        '''
+        key = (query, page, sort)
+        if key in self.prefetches or key in self.page_cache:
+            return
+        self.prefetches[key] = self.executor.submit(self._prefetch, key)
+
+    def cancel(self) -> None:
+        '''
+        Supersedes the current request, if there is one: it is dropped if it hasn't started, stops reading its response if it has, and nothing is emitted for it either way.
+        '''
+        self.current_request += 1
+        self.timeout_timer.stop()
+        self.awaited_prefetch = None
+        if self.pending_future:
+            self.pending_future.cancel()
+            self.pending_future = None
+
+    def is_loading(self) -> bool:
+        return self.timeout_timer.isActive()
+
+    def shutdown(self) -> None:
+        '''
+        Cancels the current request and the prefetches, and stops the thread pool without waiting for requests that are still going (they stop at their next chunk).
+        '''
+        self.is_shut_down = True
+        self.cancel()
+        for future in self.prefetches.values():
+            future.cancel()
+        self.prefetches.clear()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _scraper(self) -> cloudscraper.CloudScraper:
+        if not hasattr(self.thread_data, "scraper"):
+            self.thread_data.scraper = cloudscraper.create_scraper()
+        return self.thread_data.scraper
+
+    def _get_page(self, key: tuple[str, int, str], is_superseded: Callable[[], bool]) -> dict:
+        '''
+        Runs on the thread pool. Returns the response data for the page with the cache key, raises ValueError with the reason if it couldn't be fetched,
+        or RequestSupersededError once is_superseded() returns True (checked after the headers arrive and between chunks of the response).
+        '''
+        query, page, sort = key
+        try:
+            with self._scraper().get(build_subfeed_url(page, query, sort), timeout=(CATALOGUE_CONNECT_TIMEOUT, CATALOGUE_READ_TIMEOUT), stream=True) as response:
+                response.raise_for_status()
+                chunks = []
+                for chunk in response.iter_content(CATALOGUE_READ_CHUNK_SIZE):
+                    if is_superseded(): #leaving the with block closes the connection instead of reading the rest of the response
+                        raise RequestSupersededError()
+                    chunks.append(chunk)
+                if is_superseded():
+                    raise RequestSupersededError()
+            response_data = json.loads(b"".join(chunks))
+            if not isinstance(response_data, dict):
+                raise ValueError("unexpected response")
+        except requests.Timeout:
+            raise ValueError("GameBanana took too long to respond.")
+        except (requests.RequestException, ValueError) as e:
+            raise ValueError("Could not load mods from GameBanana: " + str(e))
+        return response_data
+
+    def _fetch(self, request_id: int, key: tuple[str, int, str]) -> None:
+        '''
+        Runs on the thread pool. Skips the request if it was superseded while waiting for a thread.
+        '''
+        if request_id != self.current_request:
+            return
+        try:
+            response_data = self._get_page(key, lambda: request_id != self.current_request)
+        except RequestSupersededError:
+            return
+        except ValueError as e:
+            self._emit_safely(self._fetch_failed, request_id, str(e))
+            return
+        self._emit_safely(self._fetch_finished, request_id, key, response_data)
+
+    def _prefetch(self, key: tuple[str, int, str]) -> None:
+        '''
+        Runs on the thread pool. Prefetches aren't superseded by newer requests, only stopped by shutdown().
+        '''
+        try:
+            response_data = self._get_page(key, lambda: self.is_shut_down)
+        except RequestSupersededError:
+            return
+        except ValueError as e:
+            self._emit_safely(self._prefetch_failed, key, str(e))
+            return
+        self._emit_safely(self._prefetch_finished, key, response_data)
+
+    def _emit_safely(self, signal: pyqtSignal, *arguments) -> None:
+        try:
+            signal.emit(*arguments)
+        except RuntimeError: #the fetcher was deleted while the request was going
+            pass
+
+    def _finish_request(self, request_id: int, key: tuple[str, int, str], response_data: dict) -> None:
+        self.page_cache.put(key, response_data) #a superseded response is still worth keeping, in case the user flips back to it
+        if request_id == self.current_request:
+            self.timeout_timer.stop()
+            self.pending_future = None
+            self.page_loaded.emit(request_id, response_data)
+
+    def _fail_request(self, request_id: int, reason: str) -> None:
+        if request_id == self.current_request:
+            self.timeout_timer.stop()
+            self.pending_future = None
+            self.page_failed.emit(request_id, reason)
+
+    def _finish_prefetch(self, key: tuple[str, int, str], response_data: dict) -> None:
+        self.prefetches.pop(key, None)
+        self.page_cache.put(key, response_data)
+        if key == self.awaited_prefetch:
+            self.timeout_timer.stop()
+            self.awaited_prefetch = None
+            self.page_loaded.emit(self.current_request, response_data)
+        else:
+            self.page_prefetched.emit(response_data)
+
+    def _fail_prefetch(self, key: tuple[str, int, str], reason: str) -> None:
+        self.prefetches.pop(key, None)
+        if key == self.awaited_prefetch:
+            self.timeout_timer.stop()
+            self.awaited_prefetch = None
+            self.page_failed.emit(self.current_request, reason)
+
+    def _request_timed_out(self) -> None:
+        request_id = self.current_request
+        self.cancel() #a response that still arrives for it is ignored
+        self.page_failed.emit(request_id, "GameBanana took too long to respond.")
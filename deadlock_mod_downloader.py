@@ -17,7 +17,9 @@ from selenium.webdriver.edge.options import Options as EdgeOptions
 
 import cloudscraper
 
+from functools import lru_cache
 from typing import Protocol
+import threading
 import shutil
 import os
 import tempfile
@@ -30,9 +32,14 @@ except ImportError: #this is thrown when executed on any os that isn't windows
     WINREG_IMPORTED = False
 
 from constants import *
+from deadlock_mod_files import (ModFile, file_checksum, resolve_mod_page_files)
+from deadlock_mod_transfer import download_file
 
 PAGE_LOADING_WAIT_TIME = 5 #time spent waiting for webdriver pages to load, in seconds
-DOWNLOAD_CHUNK_SIZE = 8192
+WEBDRIVER_POOL_SIZE = 2 #headless browsers kept running for the downloads that need a webdriver, other downloads wait for one of them
+WEBDRIVER_SESSION_MAX_USES = 25 #mod pages a browser loads before it is restarted, since browsers use more memory the longer they run
+WEBDRIVER_IDLE_TIMEOUT = 300 #seconds an unused browser is kept running before it is closed
+WEBDRIVER_ACQUIRE_TIMEOUT = 120 #seconds a download waits for a browser before giving up
 DOWNLOAD_LINK_CSS_SELECTOR = "a.DownloadLink.GreenColor"
 NSFW_CONTENT_BUTTON_CSS_SELECTOR = "button.ShowNsfwContentButton"
 UP_TO_DATE_MOD_LIST_CSS_SELECTOR = "ul.Flow"
@@ -57,8 +64,13 @@ BROWSER_PATHS =  {
         }
 
 '''
-Note: This code only works for users with Chrome, Firefox, and/or Edge installed. Downloading mods will fail otherwise. Prioritizes using Chrome > Firefox > Edge.
-Note: Explicit mods that require signing in cannot be downloaded.
+The files of a mod page are found with GameBanana's api (see deadlock_mod_files.py), and the page is only loaded in a webdriver to scrape them if that fails
+(e.x. for item types the api resolver doesn't support).
+Note: The webdriver only works for users with Chrome, Firefox, and/or Edge installed. Prioritizes using Chrome > Firefox > Edge.
+Note: Explicit mods that require signing in cannot be downloaded through the webdriver.
+
+Starting a browser takes seconds, so the webdrivers are kept running in a WebdriverPool and shared by the downloads: a download borrows a browser that is already
+running (started on first use), and hands it back for the next one. The browser and its driver are only looked up once (see _find_browser() and _find_driver()).
 
 Additionally, we write mod files to folders within the current working directory, but the mod manager handles moving/deleting files and folders because we supply it with the file paths.
 Though unlikely, if GameBanana ever significantly revamps the way they display mods on their page (namely the html class names of the download buttons or the urls of the mod pages), this code will likely need an update.
@@ -82,12 +94,14 @@ class DisplayedElementInListLocated(Protocol):
             except:
                 continue
         return False
-    
+
+@lru_cache(maxsize=None)
 def _find_browser() -> str:
     '''
     Attempts to locate edge, firefox, or chrome on the system, in that order.
     Returns the first browser name found.
     Returns an empty string if nothing could be found.
+    The result is cached, restart the mod manager after installing a browser.
     '''
     if WINREG_IMPORTED: #method for windows
         for name, path_list in WINDOWS_BROWSER_REGISTRY_PATHS.items():
@@ -104,41 +118,26 @@ def _find_browser() -> str:
                 return name
     return ""
 
-def _download_mod_from_page(file_url_link: str, mod_name: str, downloaded_file_paths: list[str], target_directory: str, cs: cloudscraper.CloudScraper) -> bool:
+@lru_cache(maxsize=None)
+def _find_driver(browser_name: str) -> str | None:
     '''
-    Downloads the file at href via a GET request, and writes it to /target_directory/mod_name.
-    Only use this when you have the exact address of the hosted file. Use download_mods() if you only have the mod page.
-    Appends the newly downloaded file's path to downloaded_file_paths.
-    Returns True if the request and download were successful, False if not.
+    Returns the path to the driver of browser_name ("chrome" or "firefox"), which webdriver_manager checks for updates online and downloads if needed.
+    Returns None for browsers that selenium finds the driver for itself (edge). The path is cached, raises the webdriver_manager's exception if the driver couldn't be found.
     '''
-    try:
-        response = cs.get(file_url_link, stream=True, allow_redirects=True, timeout=RESPONSE_WAIT_TIME)
-        file_path = os.path.join(target_directory, mod_name)
-        with open(file_path, "wb") as file:
-            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
-                file.write(chunk)
-        downloaded_file_paths.append(os.path.abspath(file_path))
-        return True
-    except Exception as e:
-        print("Error with downloading mod: " + str(e))
-        return False
+    match browser_name:
+        case "chrome":
+            return ChromeDriverManager().install()
+        case "firefox":
+            return GeckoDriverManager().install()
+        case _:
+            return None
 
-def download_mods(mod_page_url: str, cs: cloudscraper.CloudScraper, mod_index: int=-1) -> tuple[list[str], bool]:
+def _create_webdriver(browser_name: str) -> tuple[webdriver.Remote, str | None] | None:
     '''
-    mod_page_url should be the actual mod's page, like "https://gamebanana.com/sounds/79236".
-    Opens a webdriver and downloads all the mods (if no index is given/mod_index is -1) or a singular mod for mods with alternate versions (if an index is given) from the page.
-    Does not allow downloading archived (outdated) mods. Cannot download mods with adult content that requires signing in, but does allow downloading mild nsfw warning mods.
-    The webdriver can only execute chrome, firefox, or edge. Anything else on the system will not download anything. Does not download anything if mod_index >= the amount of non-archived mods on the page.
-    Downloads the mod(s) to /DOWNLOAD_FOLDER/TEMPORARY_FOLDER_PREFIX[Download Number] (moving/removing them is taken care of elsewhere by the mod manager).
-    Returns a tuple, containing a list of absolute paths on the local device to all mods successfully downloaded, 
-    and a bool corresponding to if all requested mods were downloaded successfully (returns False if at least one failed to download, or if an error prevented downloading altogether).
+    Starts a headless webdriver for browser_name ("chrome", "firefox" or "edge").
+    Returns the driver and the temporary user data directory it uses (None if it doesn't use one), or None if browser_name isn't supported.
     '''
-    downloaded_file_paths = [] #this will be returned later, propagated with file paths on the local device
- 
-    #first we need to check the browsers on the system to see if any are usable for downloading mods
-    browser_name = _find_browser()
     user_data_dir = None
-    print("Using browser: " + browser_name)
     match browser_name:
         #IMPORTANT: options.set_capability("pageLoadStrategy", "eager") is the most important to set by far, reduces the total duration of this function to seconds instead of minutes
         # setting the user agent is also important
@@ -159,7 +158,7 @@ def download_mods(mod_page_url: str, cs: cloudscraper.CloudScraper, mod_index: i
             options.set_capability("pageLoadStrategy", "eager")
             user_data_dir = tempfile.mkdtemp() #this should fix the user data directory already in use bug
             options.add_argument(f'--user-data-dir={user_data_dir}')
-            driver = webdriver.Chrome(service=ChromeService(ChromeDriverManager().install()), options=options)
+            driver = webdriver.Chrome(service=ChromeService(_find_driver(browser_name)), options=options)
 
         case "firefox":
             #firefox opens up dialog when downloading by default, which gives us errors unless we create a profile with custom settings
@@ -176,7 +175,7 @@ def download_mods(mod_page_url: str, cs: cloudscraper.CloudScraper, mod_index: i
             options.add_argument("--headless")
             options.set_capability("pageLoadStrategy", "eager")
 
-            service = FirefoxService(GeckoDriverManager().install()) 
+            service = FirefoxService(_find_driver(browser_name))
             driver = webdriver.Firefox(service=service, options=options)
 
         case "edge":
@@ -193,13 +192,205 @@ def download_mods(mod_page_url: str, cs: cloudscraper.CloudScraper, mod_index: i
             driver = webdriver.Edge(service=EdgeService(), options=options)
 
         case _:
-            return [], False
+            return None
+    return driver, user_data_dir
 
-    mods_downloaded_successfully = True #set this to False when a mod fails to download
+def _quit_webdriver(driver: webdriver.Remote, user_data_dir: str | None) -> None:
+    driver.quit()
+    try:
+        if user_data_dir:
+            shutil.rmtree(user_data_dir)
+    except:
+        print("Could not remove temporary profile folder.")
+
+class WebdriverSession:
+    '''
+    A browser in the WebdriverPool, with the temporary user data directory it uses (None if it doesn't use one).
+    '''
+    def __init__(self, driver: webdriver.Remote, user_data_dir: str | None) -> None:
+        self.driver = driver
+        self.user_data_dir = user_data_dir
+        self.uses = 0 #mod pages loaded
+        self.last_used = time.monotonic()
+
+    def is_healthy(self) -> bool:
+        '''
+        Returns True if the browser still responds, False if it crashed or was closed.
+        '''
+        try:
+            self.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def quit(self) -> None:
+        try:
+            _quit_webdriver(self.driver, self.user_data_dir)
+        except Exception as e:
+            print("Error with closing webdriver: " + str(e))
+
+class WebdriverPool:
+    '''
+    Keeps up to size headless browsers running, for the downloads that need a webdriver (see _resolve_files_with_webdriver()). Safe to use from several threads.
+    acquire() lends a running browser, or starts one if fewer than size are running, or waits for one to be released otherwise. Browsers are checked before they are lent,
+    and replaced if they stopped responding or have loaded WEBDRIVER_SESSION_MAX_USES pages. Browsers that aren't used for WEBDRIVER_IDLE_TIMEOUT seconds are closed.
+    Call shutdown() when the mod manager closes.
+    '''
+    def __init__(self, size: int=WEBDRIVER_POOL_SIZE) -> None:
+        self.size = size
+        self.condition = threading.Condition()
+        self.sessions: list[WebdriverSession] = [] #every running browser, lent or not
+        self.idle_sessions: list[WebdriverSession] = [] #the browsers that aren't lent, the most recently used last
+        self.starting = 0 #browsers being started, which count towards size
+        self.closed = False
+        self.idle_timer: threading.Timer | None = None #runs close_idle_sessions() once the oldest idle browser expires, there is only ever one
+
+    def acquire(self, timeout: float=WEBDRIVER_ACQUIRE_TIMEOUT) -> WebdriverSession | None:
+        '''
+        Returns a browser to load pages with, waiting up to timeout seconds for one to be available. Hand it back with release() once done.
+        Returns None if no browser could be started, the wait timed out, or the pool was shut down.
+        '''
+        deadline = time.monotonic() + timeout
+        while True:
+            session = None
+            with self.condition:
+                while not self.closed:
+                    if self.idle_sessions:
+                        session = self.idle_sessions.pop()
+                        break
+                    if len(self.sessions) + self.starting < self.size:
+                        self.starting += 1
+                        break
+                    remaining_time = deadline - time.monotonic()
+                    if remaining_time <= 0:
+                        print("Error, timed out waiting for a webdriver.")
+                        return None
+                    self.condition.wait(remaining_time)
+                if self.closed:
+                    return None
+
+            if session is None: #start a new browser, outside of the lock since it takes a while
+                return self._start_session()
+            if session.is_healthy():
+                return session
+            print("Webdriver stopped responding, replacing it.")
+            self._discard(session)
+
+    def release(self, session: WebdriverSession) -> None:
+        '''
+        Hands a browser from acquire() back to the pool, or closes it if it should be replaced.
+        '''
+        session.uses += 1
+        session.last_used = time.monotonic()
+        recycle = session.uses >= WEBDRIVER_SESSION_MAX_USES
+        if not recycle:
+            try:
+                session.driver.get("about:blank") #frees the mod page while the browser waits for the next download
+            except Exception:
+                recycle = True
+        if recycle:
+            self._discard(session)
+            return
+
+        with self.condition:
+            if self.closed or session not in self.sessions: #shut down while it was lent
+                closed = True
+            else:
+                closed = False
+                self.idle_sessions.append(session)
+                self.condition.notify()
+                if self.idle_timer is None:
+                    self._schedule_idle_timer(WEBDRIVER_IDLE_TIMEOUT + 1)
+        if closed:
+            session.quit()
+
+    def close_idle_sessions(self) -> None:
+        '''
+        Closes the browsers that haven't been used for WEBDRIVER_IDLE_TIMEOUT seconds. Run by the idle timer, which is scheduled again for the oldest browser left idle.
+        '''
+        with self.condition:
+            self.idle_timer = None
+            now = time.monotonic()
+            expired_sessions = [session for session in self.idle_sessions if now - session.last_used >= WEBDRIVER_IDLE_TIMEOUT]
+            for session in expired_sessions:
+                self.idle_sessions.remove(session)
+                self.sessions.remove(session)
+            if self.idle_sessions and not self.closed:
+                oldest_last_used = min(session.last_used for session in self.idle_sessions)
+                self._schedule_idle_timer(oldest_last_used + WEBDRIVER_IDLE_TIMEOUT - now + 1)
+        for session in expired_sessions:
+            session.quit()
+
+    def _schedule_idle_timer(self, delay: float) -> None:
+        '''
+        Starts the idle timer, to run close_idle_sessions() in delay seconds. Requires self.condition.
+        '''
+        self.idle_timer = threading.Timer(delay, self.close_idle_sessions)
+        self.idle_timer.daemon = True
+        self.idle_timer.start()
+
+    def shutdown(self) -> None:
+        '''
+        Closes every browser, including the ones that are lent (their downloads fail), and stops lending browsers.
+        '''
+        with self.condition:
+            self.closed = True
+            sessions = self.sessions
+            self.sessions = []
+            self.idle_sessions = []
+            if self.idle_timer is not None:
+                self.idle_timer.cancel()
+                self.idle_timer = None
+            self.condition.notify_all()
+        for session in sessions:
+            session.quit()
+
+    def _start_session(self) -> WebdriverSession | None:
+        session = None
+        try:
+            browser_name = _find_browser()
+            print("Using browser: " + browser_name)
+            webdriver_and_profile = _create_webdriver(browser_name)
+            if webdriver_and_profile:
+                session = WebdriverSession(*webdriver_and_profile)
+        except Exception as e:
+            print("Error with starting webdriver: " + str(e))
+        with self.condition:
+            self.starting -= 1
+            if session and not self.closed:
+                self.sessions.append(session)
+            self.condition.notify()
+            closed = self.closed
+        if session and closed:
+            session.quit()
+            return None
+        return session
+
+    def _discard(self, session: WebdriverSession) -> None:
+        with self.condition:
+            if session in self.sessions:
+                self.sessions.remove(session)
+            if session in self.idle_sessions:
+                self.idle_sessions.remove(session)
+            self.condition.notify()
+        session.quit()
+
+WEBDRIVER_POOL = WebdriverPool()
+
+def _resolve_files_with_webdriver(mod_page_url: str) -> list[ModFile] | None:
+    '''
+    Finds the files (that aren't archived) on the mod page at mod_page_url by loading it in a webdriver, for when the api can't be used (see deadlock_mod_files.py).
+    Allows mods with a mild nsfw warning, but not adult content that requires signing in.
+    Returns the files in the order of the page's download section, or None if no browser could be used or the download links couldn't be found.
+    The browser is borrowed from WEBDRIVER_POOL.
+    '''
+    session = WEBDRIVER_POOL.acquire() #a browser that is already running, if there is one
+    if session is None:
+        return None
+    driver = session.driver
 
     try:
         #first retrieve the actual mod's page, then find the (not fake) download buttons
-        start_time = time.time()
         driver.get(mod_page_url)
         print("Loaded page: " + mod_page_url)
         required_element = None #download or proceed button
@@ -208,21 +399,10 @@ def download_mods(mod_page_url: str, cs: cloudscraper.CloudScraper, mod_index: i
             required_element = WebDriverWait(driver, PAGE_LOADING_WAIT_TIME).until(DisplayedElementInListLocated([(By.CSS_SELECTOR, DOWNLOAD_LINK_CSS_SELECTOR),(By.CSS_SELECTOR, NSFW_CONTENT_BUTTON_CSS_SELECTOR)]))
         except TimeoutException as e:
             print("Error, could not find a download link: " + str(e))
-            driver.quit()
-            try:
-                if user_data_dir:
-                    shutil.rmtree(user_data_dir)
-            except:
-                print("Could not remove temporary profile folder.")
-            return [], False
+            return None
         
         if not required_element: #no download button or proceed button on the page
-            try:
-                if user_data_dir:
-                    shutil.rmtree(user_data_dir)
-            except:
-                print("Could not remove temporary profile folder.")
-            return [], False
+            return None
         
         if required_element.tag_name.lower() == "button": #if there is mild nsfw content then we will have a 'Proceed' button (explicit nsfw content will never be downloaded, however)
             #we need an additional step here to click on the button, and then wait again until we find a download link
@@ -234,13 +414,7 @@ def download_mods(mod_page_url: str, cs: cloudscraper.CloudScraper, mod_index: i
                 WebDriverWait(driver, PAGE_LOADING_WAIT_TIME).until(expected_conditions.presence_of_element_located((By.CSS_SELECTOR, DOWNLOAD_LINK_CSS_SELECTOR)))
             except TimeoutException as e:
                 print("Error, could not find a download link: " + str(e))
-                driver.quit()
-                try:
-                    if user_data_dir:
-                        shutil.rmtree(user_data_dir)
-                except:
-                    print("Could not remove temporary profile folder.")
-                return [], False
+                return None
         
         download_page_link = driver.find_element(By.CSS_SELECTOR, DOWNLOAD_LINK_CSS_SELECTOR) #all of the real downloads (because of ads) have this selector, but it redirects to different (but similar) page
         actual_download_page_url = download_page_link.get_attribute("href")
@@ -248,89 +422,127 @@ def download_mods(mod_page_url: str, cs: cloudscraper.CloudScraper, mod_index: i
         We need to do this because from the main mod page we will get redirected to something like 'https://gamebanana.com/sounds/download/79236#FileInfo_1403876' after clicking a download button.
         This sends us to a page with all the actual download links, it is due to multiple downloads/version of the same mod existing. The first link contains the downloads for the other mod versions, so this is fine.
         '''
-        if actual_download_page_url: #we found at least one download link
-            driver.get(actual_download_page_url)
+        if not actual_download_page_url: #we didn't find any download links
+            return []
+        driver.get(actual_download_page_url)
 
-            #need the download buttons to load first
-            try:
-                WebDriverWait(driver, PAGE_LOADING_WAIT_TIME).until(expected_conditions.presence_of_all_elements_located((By.CSS_SELECTOR, DOWNLOAD_LINK_CSS_SELECTOR))) #wait a download link to load before requesting
-            except TimeoutException as e:
-                print("Error, could not locate download buttons: " + str(e))
-                driver.quit()
-                try:
-                    if user_data_dir:
-                        shutil.rmtree(user_data_dir)
-                except:
-                    print("Could not remove temporary profile folder.")
-                return [], False
-                
-            css_file_list = driver.find_element(By.CSS_SELECTOR, UP_TO_DATE_MOD_LIST_CSS_SELECTOR) #these are all the non-outdated files
-            mod_download_links = css_file_list.find_elements(By.CSS_SELECTOR, DOWNLOAD_PAGE_MOD_LINKS_CSS_SELECTOR)
-            mod_names = css_file_list.find_elements(By.CSS_SELECTOR, DOWNLOAD_PAGE_MOD_NAMES_CSS_SELECTOR)
-
-            #only do this because the tempfile module wasn't playing nice with multithreading, the mod browser handles file and folder deletion
-            directory_number = 0
-            while (os.path.exists(os.path.join(DOWNLOAD_FOLDER, TEMPORARY_FOLDER_PREFIX + str(directory_number)))):
-                directory_number += 1
-            temp_directory = os.path.join(DOWNLOAD_FOLDER, TEMPORARY_FOLDER_PREFIX + str(directory_number))
-            try:
-                os.makedirs(temp_directory, exist_ok=True)
-            except OSError as e:
-                print("Error, could not create temporary directory: " + str(e))
-                driver.quit()
-                try:
-                    if user_data_dir:
-                        shutil.rmtree(user_data_dir)
-                except:
-                    print("Could not remove temporary profile folder.")
-                return [], False
-
-            if mod_index >= 0: #download a singular mod (if the index exists)
-                if mod_index >= len(mod_download_links): #mod index not found
-                    shutil.rmtree(temp_directory)
-                    print("Error, mod index does not exist on page")
-                    driver.quit()
-                    try:
-                        if user_data_dir:
-                            shutil.rmtree(user_data_dir)
-                    except:
-                        print("Could not remove temporary profile folder.")
-                    return [], True
-                
-                file_url = mod_download_links[mod_index].get_attribute("href")
-                mod_name = mod_names[mod_index].text
-                if _download_mod_from_page(file_url, mod_name, downloaded_file_paths, temp_directory, cs):
-                    print("Downloaded mod successfully: " + mod_name)
-                else:
-                    mods_downloaded_successfully = False
-                    print("Failed to download mod: " + mod_name)
-
-            else: #download every mod on the page
-                for i in range(len(mod_download_links)):
-                    file_url = mod_download_links[i].get_attribute("href")
-                    mod_name = mod_names[i].text
-                    if _download_mod_from_page(file_url, mod_name, downloaded_file_paths, temp_directory, cs):
-                        print("Downloaded mod successfully: " + mod_name)
-                    else:
-                        mods_downloaded_successfully = False
-                        print("Failed to download mod: " + mod_name)
-
-        for file_path in downloaded_file_paths:
-            print("Downloaded mod file path at: " + file_path)
+        #need the download buttons to load first
+        try:
+            WebDriverWait(driver, PAGE_LOADING_WAIT_TIME).until(expected_conditions.presence_of_all_elements_located((By.CSS_SELECTOR, DOWNLOAD_LINK_CSS_SELECTOR))) #wait a download link to load before requesting
+        except TimeoutException as e:
+            print("Error, could not locate download buttons: " + str(e))
+            return None
+            
+        css_file_list = driver.find_element(By.CSS_SELECTOR, UP_TO_DATE_MOD_LIST_CSS_SELECTOR) #these are all the non-outdated files
+        mod_download_links = css_file_list.find_elements(By.CSS_SELECTOR, DOWNLOAD_PAGE_MOD_LINKS_CSS_SELECTOR)
+        mod_names = css_file_list.find_elements(By.CSS_SELECTOR, DOWNLOAD_PAGE_MOD_NAMES_CSS_SELECTOR)
+        return [ModFile(link.get_attribute("href"), name.text) for link, name in zip(mod_download_links, mod_names)]
 
     except Exception as e:
         print("Error with downloading from webdriver: " + str(e))
+        return None
 
     finally:
-        end_time = time.time()
-        print(f"Total elapsed time: {end_time - start_time} seconds")
-        driver.quit()
+        WEBDRIVER_POOL.release(session)
+
+def _create_download_directory() -> str | None:
+    '''
+    Creates and returns a new directory /DOWNLOAD_FOLDER/TEMPORARY_FOLDER_PREFIX[Download Number] to download a mod page's files to, or None if it couldn't be created.
+    '''
+    #only do this because the tempfile module wasn't playing nice with multithreading, the mod browser handles file and folder deletion
+    directory_number = 0
+    while (os.path.exists(os.path.join(DOWNLOAD_FOLDER, TEMPORARY_FOLDER_PREFIX + str(directory_number)))):
+        directory_number += 1
+    temp_directory = os.path.join(DOWNLOAD_FOLDER, TEMPORARY_FOLDER_PREFIX + str(directory_number))
+    try:
+        os.makedirs(temp_directory, exist_ok=True)
+    except OSError as e:
+        print("Error, could not create temporary directory: " + str(e))
+        return None
+    return temp_directory
+
+def _download_mod_from_page(file_url_link: str, mod_name: str, downloaded_file_paths: list[str], target_directory: str, cs: cloudscraper.CloudScraper,
+                            checksum: str="", size: int=0, cancel_event: threading.Event | None=None) -> bool:
+    '''
+    Downloads the file at href, and writes it to /target_directory/mod_name. Dropped connections are resumed, and large files are downloaded over several connections,
+    see deadlock_mod_transfer.py.
+    Only use this when you have the exact address of the hosted file. Use download_mods() if you only have the mod page.
+    If checksum (an md5 hex digest) or size (in bytes) is given, the downloaded file is deleted if it doesn't match. Setting cancel_event stops the download.
+    Appends the newly downloaded file's path to downloaded_file_paths.
+    Returns True if the request and download were successful, False if not.
+    '''
+    file_path = os.path.join(target_directory, mod_name)
+    stats = download_file(cs, file_url_link, file_path, cancel_event)
+    if stats is None:
+        return False
+    print(f"Downloaded {mod_name}: {stats}")
+
+    try:
+        if (size and os.path.getsize(file_path) != size) or (checksum and file_checksum(file_path).lower() != checksum.lower()):
+            print("Error, the downloaded file does not match its size or checksum: " + mod_name)
+            os.remove(file_path)
+            return False
+    except OSError as e:
+        print("Error with checking the downloaded file: " + str(e))
+        return False
+    downloaded_file_paths.append(os.path.abspath(file_path))
+    return True
+
+def download_mods(mod_page_url: str, cs: cloudscraper.CloudScraper, mod_index: int=-1, cancel_event: threading.Event | None=None) -> tuple[list[str], bool]:
+    '''
+    mod_page_url should be the actual mod's page, like "https://gamebanana.com/sounds/79236".
+    Downloads all the mods (if no index is given/mod_index is -1) or a singular mod for mods with alternate versions (if an index is given) from the page.
+    The files are found with GameBanana's api, or with a webdriver if that fails (see _resolve_files_with_webdriver()).
+    Does not allow downloading archived (outdated) mods. Does not download anything if mod_index >= the amount of non-archived mods on the page.
+    Downloads the mod(s) to /DOWNLOAD_FOLDER/TEMPORARY_FOLDER_PREFIX[Download Number] (moving/removing them is taken care of elsewhere by the mod manager).
+    Setting cancel_event from another thread stops the download at the next chunk, and the remaining files aren't downloaded (the ones already downloaded are still returned).
+    Returns a tuple, containing a list of absolute paths on the local device to all mods successfully downloaded, 
+    and a bool corresponding to if all requested mods were downloaded successfully (returns False if at least one failed to download, or if an error prevented downloading altogether).
+    '''
+    downloaded_file_paths = [] #this will be returned later, propagated with file paths on the local device
+    start_time = time.time()
+
+    mod_files = resolve_mod_page_files(mod_page_url, cs)
+    if mod_files is None:
+        print("Could not get the file list from the api, using a webdriver instead.")
+        mod_files = _resolve_files_with_webdriver(mod_page_url)
+        if mod_files is None:
+            return [], False
+    print(f"Found {len(mod_files)} file(s) in {time.time() - start_time} seconds")
+
+    if mod_index >= 0: #download a singular mod (if the index exists)
+        if mod_index >= len(mod_files): #mod index not found
+            print("Error, mod index does not exist on page")
+            return [], True
+        mod_files = [mod_files[mod_index]]
+    if not mod_files:
+        return [], True
+
+    temp_directory = _create_download_directory()
+    if temp_directory is None:
+        return [], False
+
+    mods_downloaded_successfully = True #set this to False when a mod fails to download
+    for mod_file in mod_files:
+        if cancel_event and cancel_event.is_set():
+            mods_downloaded_successfully = False
+            break
+        if _download_mod_from_page(mod_file.url, mod_file.file_name, downloaded_file_paths, temp_directory, cs, mod_file.checksum, mod_file.size, cancel_event):
+            print("Downloaded mod successfully: " + mod_file.file_name)
+        else:
+            mods_downloaded_successfully = False
+            print("Failed to download mod: " + mod_file.file_name)
+
+    if not downloaded_file_paths: #nothing to hand to the mod manager, so the directory is cleaned up here
         try:
-            if user_data_dir:
-                shutil.rmtree(user_data_dir)
-        except:
-            print("Could not remove temporary profile folder.")
-        return downloaded_file_paths, mods_downloaded_successfully
+            os.rmdir(temp_directory)
+        except OSError:
+            pass
+
+    for file_path in downloaded_file_paths:
+        print("Downloaded mod file path at: " + file_path)
+    print(f"Total elapsed time: {time.time() - start_time} seconds")
+    return downloaded_file_paths, mods_downloaded_successfully
 
 #run as standalone for testing
 if __name__ == "__main__":
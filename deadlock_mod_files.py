@@ -0,0 +1,160 @@
+from urllib.parse import urlparse
+import hashlib
+
+import cloudscraper
+import requests
+
+from constants import *
+
+GAMEBANANA_API_URL = "https://gamebanana.com/apiv11" #change this to point the resolver at another server, e.x. a local stand-in for testing
+FILE_LIST_PROPERTIES = "_aFiles" #only the files that aren't archived, the archived (outdated) ones are in _aArchivedFiles
+
+#the item type in a mod page's url (e.x. "https://gamebanana.com/sounds/79236") -> the item type in the api's urls
+MOD_PAGE_ITEM_TYPES = {
+    "mods": "Mod",
+    "sounds": "Sound",
+}
+
+'''
+Resolves the files that can be downloaded from a mod page with GameBanana's api (apiv11), which returns the same files that the page's download section lists,
+without having to load the page in a browser. See deadlock_mod_downloader.py, which falls back to scraping the page with a webdriver when this doesn't work.
+
+The file list is requested from {GAMEBANANA_API_URL}/{item type}/{item id}?_csvProperties=_aFiles, which returns something like:
+{"_aFiles": [{"_idRow": 1403876, "_sFile": "mod.zip", "_nFilesize": 123456, "_sDownloadUrl": "https://gamebanana.com/dl/1403876", "_sMd5Checksum": "..."}, ...]}
+Run this module on its own to test the resolver and downloader against a local stand-in for the api.
+'''
+
+class ModFile:
+    '''
+    A file that can be downloaded from a mod page. size is in bytes and checksum is the file's md5 hex digest, they are 0 and "" if they aren't known
+    (the webdriver can only find the url and name of the file).
+    '''
+    def __init__(self, url: str, file_name: str, size: int=0, checksum: str="") -> None:
+        self.url = url
+        self.file_name = file_name
+        self.size = size
+        self.checksum = checksum
+
+    def __repr__(self) -> str:
+        return f"ModFile({self.file_name!r}, {self.url!r}, {self.size} bytes)"
+
+def parse_mod_page_url(mod_page_url: str) -> tuple[str, int] | None:
+    '''
+    Returns the api's item type and the item id of a mod page's url (e.x. ("Sound", 79236) for "https://gamebanana.com/sounds/79236"),
+    or None if the url isn't the page of an item type the api resolver supports.
+    '''
+    path_parts = [part for part in urlparse(mod_page_url).path.split("/") if part]
+    if len(path_parts) < 2 or path_parts[-2] not in MOD_PAGE_ITEM_TYPES or not path_parts[-1].isdigit():
+        return None
+    return MOD_PAGE_ITEM_TYPES[path_parts[-2]], int(path_parts[-1])
+
+def file_checksum(file_path: str) -> str:
+    '''
+    Returns the md5 hex digest of the file at file_path, the same kind of checksum the api gives for each file.
+    '''
+    md5 = hashlib.md5()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+def resolve_mod_files(item_type: str, item_id: int, cs: cloudscraper.CloudScraper | requests.Session, api_url: str | None=None) -> list[ModFile] | None:
+    '''
+    Requests the list of files (that aren't archived) of the item with item_id and item_type (e.x. "Mod" or "Sound") from the api at api_url (GAMEBANANA_API_URL by default).
+    Returns the files in the order the api lists them, which is the order of the download section on the mod page.
+    Returns None if the list couldn't be retrieved, in which case the files should be found another way. An empty list means the item has no files.
+    '''
+    url = f"{api_url or GAMEBANANA_API_URL}/{item_type}/{item_id}?_csvProperties={FILE_LIST_PROPERTIES}"
+    try:
+        response = cs.get(url, timeout=RESPONSE_WAIT_TIME)
+        response.raise_for_status()
+        response_data = response.json()
+    except (requests.RequestException, ValueError) as e:
+        print("Error with requesting the file list from GameBanana: " + str(e))
+        return None
+    if not isinstance(response_data, dict) or not isinstance(response_data.get("_aFiles"), list):
+        print("Error, GameBanana did not return a file list for: " + url)
+        return None
+
+    mod_files = []
+    for file_data in response_data["_aFiles"]:
+        try:
+            if file_data.get("_bIsArchived"): #just in case, the archived files should only be in _aArchivedFiles
+                continue
+            mod_files.append(ModFile(file_data["_sDownloadUrl"], file_data["_sFile"], int(file_data.get("_nFilesize") or 0), file_data.get("_sMd5Checksum") or ""))
+        except (KeyError, TypeError, ValueError, AttributeError): #just in case the response has missing information
+            print("Error, skipping a file with missing information in the file list of: " + url)
+            continue
+    return mod_files
+
+def resolve_mod_page_files(mod_page_url: str, cs: cloudscraper.CloudScraper | requests.Session, api_url: str | None=None) -> list[ModFile] | None:
+    '''
+    Same as resolve_mod_files(), but for the item whose page is at mod_page_url. Returns None if the url isn't a page the api resolver supports.
+    '''
+    item = parse_mod_page_url(mod_page_url)
+    if item is None:
+        return None
+    return resolve_mod_files(*item, cs, api_url)
+
+#run as standalone to test the resolver and downloader against a local stand-in for the api
+if __name__ == "__main__":
+    from http.server import (ThreadingHTTPServer, BaseHTTPRequestHandler)
+    import threading
+    import json
+
+    test_files = {"first.zip": b"first mod" * 1000, "second.7z": b"second mod" * 1000}
+
+    class StandInApiHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args) -> None:
+            pass
+
+        def do_GET(self) -> None:
+            path = urlparse(self.path).path
+            if path == "/apiv11/Sound/79236":
+                body = json.dumps({"_aFiles": [{"_idRow": i, "_sFile": file_name, "_nFilesize": len(data), "_sMd5Checksum": hashlib.md5(data).hexdigest(),
+                                                "_sDownloadUrl": f"http://127.0.0.1:{server.server_port}/dl/{file_name}"} for i, (file_name, data) in enumerate(test_files.items())]}).encode()
+            elif path == "/apiv11/Mod/1": #a file that doesn't match its checksum
+                body = json.dumps({"_aFiles": [{"_idRow": 0, "_sFile": "first.zip", "_nFilesize": 1, "_sMd5Checksum": "0" * 32,
+                                                "_sDownloadUrl": f"http://127.0.0.1:{server.server_port}/dl/first.zip"}]}).encode()
+            elif path.startswith("/dl/") and path.removeprefix("/dl/") in test_files:
+                body = test_files[path.removeprefix("/dl/")]
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInApiHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    GAMEBANANA_API_URL = f"http://127.0.0.1:{server.server_port}/apiv11"
+    session = requests.Session()
+
+    resolved_files = resolve_mod_page_files("https://gamebanana.com/sounds/79236", session)
+    print("Resolved files: " + str(resolved_files))
+    assert [mod_file.file_name for mod_file in resolved_files] == list(test_files)
+    assert resolve_mod_page_files("https://gamebanana.com/sounds/1", session) is None #not found, so the downloader falls back to the webdriver
+    assert resolve_mod_page_files("https://gamebanana.com/wips/1", session) is None #unsupported item type
+
+    import deadlock_mod_files #this file runs as __main__, the downloader uses the module under its own name
+    deadlock_mod_files.GAMEBANANA_API_URL = GAMEBANANA_API_URL
+    from deadlock_mod_downloader import download_mods
+    from mod_ingestion import remove_downloaded_files
+    file_paths, mods_downloaded_successfully = download_mods("https://gamebanana.com/sounds/79236", session)
+    try:
+        assert mods_downloaded_successfully and len(file_paths) == len(test_files)
+        for file_path in file_paths:
+            with open(file_path, "rb") as file:
+                assert file.read() == test_files[os.path.basename(file_path)]
+        print("Downloaded files: " + str(file_paths))
+    finally:
+        remove_downloaded_files(file_paths)
+
+    file_paths, mods_downloaded_successfully = download_mods("https://gamebanana.com/sounds/79236", session, 1)
+    remove_downloaded_files(file_paths)
+    assert mods_downloaded_successfully and [os.path.basename(file_path) for file_path in file_paths] == ["second.7z"]
+    assert download_mods("https://gamebanana.com/sounds/79236", session, 2) == ([], True) #no file at that index
+    assert download_mods("https://gamebanana.com/mods/1", session) == ([], False) #the checksum doesn't match
+    server.shutdown()
+    print("Passed")
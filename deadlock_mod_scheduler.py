@@ -0,0 +1,196 @@
+from PyQt5.QtCore import (QObject, QTimer, pyqtSignal)
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import threading
+import heapq
+
+from mod_ingestion import remove_downloaded_files
+from deadlock_mod_sessions import SessionPool
+
+DOWNLOAD_WORKER_COUNT = 3 #mod pages downloaded at once, across every host
+DOWNLOAD_HOST_LIMIT = DOWNLOAD_WORKER_COUNT #mod pages downloaded at once from the same host, every mod page is on gamebanana.com so a lower limit leaves workers idle
+DOWNLOAD_RETRY_COUNT = 2 #times a download that failed completely is queued again
+DOWNLOAD_RETRY_DELAY = 5000 #milliseconds before the first retry, doubled for every retry after it
+
+#higher priorities are downloaded first, downloads with the same priority in the order they were queued
+DOWNLOAD_PRIORITY_PAGE = 0 #queued with the rest of a catalogue page
+DOWNLOAD_PRIORITY_SINGLE = 1 #queued on its own, so it doesn't wait behind a whole page
+
+#the states of a download, see DownloadScheduler.state_changed
+DOWNLOAD_STATE_NONE = "" #not queued (never was, finished or cancelled)
+DOWNLOAD_STATE_QUEUED = "queued"
+DOWNLOAD_STATE_DOWNLOADING = "downloading"
+DOWNLOAD_STATE_RETRYING = "retrying" #failed, waiting to be queued again
+
+'''
+Queues the mod browser's downloads and runs them on a small fixed pool of worker threads, instead of a thread per download.
+Downloads are started in order of priority (then in the order they were queued), as long as there is a free worker and the mod page's host has fewer than
+DOWNLOAD_HOST_LIMIT downloads going (each download can still open several connections to its file's host, see deadlock_mod_transfer.py).
+A download that fails completely is queued again after a delay that doubles every time, up to DOWNLOAD_RETRY_COUNT times.
+Queued downloads can be cancelled: they are taken off the queue, or if they are already downloading, their transfers stop at the next chunk and whatever was
+downloaded is deleted (a webdriver that is loading the mod page can't be interrupted, but nothing is downloaded after it).
+Each running download borrows its own session from a SessionPool (see deadlock_mod_sessions.py), whose connection counts are kept in session_pool.connection_stats().
+'''
+
+class DownloadJob:
+    '''
+    A queued download of the mods on a mod page. Downloads are identified by their key, (number, item_type), like the catalogue's items.
+    '''
+    def __init__(self, link: str, mod_name: str, item_type: str, number: int, priority: int, sequence: int) -> None:
+        self.link = link
+        self.mod_name = mod_name
+        self.item_type = item_type
+        self.number = number
+        self.priority = priority
+        self.sequence = sequence #the order it was queued in, for downloads with the same priority
+        self.host = urlparse(link).hostname or ""
+        self.attempts = 0
+        self.cancel_event = threading.Event() #set to stop the transfers of a running download
+        self.state = DOWNLOAD_STATE_QUEUED
+
+    def key(self) -> tuple[int, str]:
+        return self.number, self.item_type
+
+    def __lt__(self, other: "DownloadJob") -> bool: #for the queue's heap
+        return (-self.priority, self.sequence) < (-other.priority, other.sequence)
+
+class DownloadScheduler(QObject):
+    '''
+    Owns the download queue and the worker threads. Only interact with this from the gui thread, where its signals are emitted as well.
+    Call shutdown() before the scheduler is deleted.
+    '''
+    state_changed = pyqtSignal(int, str, str) #number, item_type, one of the DOWNLOAD_STATE_ constants
+    download_finished = pyqtSignal(list, str, str, int, bool) #file paths, mod name, item type, number, if every file was downloaded (not emitted for cancelled downloads)
+    busy_changed = pyqtSignal(bool) #True when the first download is queued, False once the last one is done
+    _job_done = pyqtSignal(object, list, bool) #emitted from the worker threads, see _run()
+
+    def __init__(self, parent: QObject | None=None) -> None:
+        super().__init__(parent)
+        self.session_pool = SessionPool()
+        self.executor = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKER_COUNT, thread_name_prefix="download")
+        self.queue: list[DownloadJob] = [] #heap, the next download first
+        self.jobs: dict[tuple[int, str], DownloadJob] = {} #every download that is queued, running or waiting to retry
+        self.running_per_host: dict[str, int] = {}
+        self.running_count = 0
+        self.next_sequence = 0
+
+        self._job_done.connect(self._finish_job)
+
+    def enqueue(self, link: str, mod_name: str, item_type: str, number: int, priority: int=DOWNLOAD_PRIORITY_SINGLE) -> bool:
+        '''
+        Queues the download of the mods on the mod page at link. Returns False if that mod is already queued or downloading.
+        '''
+        if (number, item_type) in self.jobs:
+            return False
+        job = DownloadJob(link, mod_name, item_type, number, priority, self.next_sequence)
+        self.next_sequence += 1
+        was_busy = self.is_busy()
+        self.jobs[job.key()] = job
+        heapq.heappush(self.queue, job)
+        self.state_changed.emit(number, item_type, DOWNLOAD_STATE_QUEUED)
+        if not was_busy:
+            self.busy_changed.emit(True)
+        self._dispatch()
+        return True
+
+    def cancel(self, number: int, item_type: str) -> None:
+        '''
+        Cancels a queued or running download. Nothing happens if it isn't queued.
+        '''
+        job = self.jobs.pop((number, item_type), None)
+        if job is None:
+            return
+        job.cancel_event.set()
+        if job.state == DOWNLOAD_STATE_QUEUED:
+            self.queue.remove(job)
+            heapq.heapify(self.queue)
+        job.state = DOWNLOAD_STATE_NONE #a running download is cleaned up once its worker returns, see _finish_job()
+        self.state_changed.emit(number, item_type, DOWNLOAD_STATE_NONE)
+        self._emit_if_idle()
+
+    def state(self, number: int, item_type: str) -> str:
+        job = self.jobs.get((number, item_type))
+        return job.state if job else DOWNLOAD_STATE_NONE
+
+    def is_busy(self) -> bool:
+        return bool(self.jobs)
+
+    def shutdown(self) -> None:
+        '''
+        Cancels every download, and stops the workers without waiting for them (their transfers stop at the next chunk). Their sessions are closed once they stop.
+        '''
+        for job in self.jobs.values():
+            job.cancel_event.set()
+        self.jobs.clear()
+        self.queue.clear()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.session_pool.close()
+
+    def _dispatch(self) -> None:
+        '''
+        Starts the queued downloads with the highest priority, while there are free workers and their hosts are under the limit.
+        '''
+        waiting_jobs = [] #downloads whose host is at its limit, put back afterwards
+        while self.queue and self.running_count < DOWNLOAD_WORKER_COUNT:
+            job = heapq.heappop(self.queue)
+            if self.running_per_host.get(job.host, 0) >= DOWNLOAD_HOST_LIMIT:
+                waiting_jobs.append(job)
+                continue
+            job.state = DOWNLOAD_STATE_DOWNLOADING
+            job.attempts += 1
+            self.running_count += 1
+            self.running_per_host[job.host] = self.running_per_host.get(job.host, 0) + 1
+            self.state_changed.emit(job.number, job.item_type, DOWNLOAD_STATE_DOWNLOADING)
+            self.executor.submit(self._run, job)
+        for job in waiting_jobs:
+            heapq.heappush(self.queue, job)
+
+    def _run(self, job: DownloadJob) -> None:
+        '''
+        Runs on a worker thread. The downloader is imported here on the first download (off the gui thread), since it pulls in selenium and webdriver_manager.
+        '''
+        file_paths, mods_downloaded_successfully = [], False
+        try:
+            from deadlock_mod_downloader import download_mods
+            with self.session_pool.session() as cs:
+                file_paths, mods_downloaded_successfully = download_mods(job.link, cs, cancel_event=job.cancel_event)
+        except Exception as e:
+            print("Error with downloading mod: " + str(e))
+        try:
+            self._job_done.emit(job, file_paths, mods_downloaded_successfully)
+        except RuntimeError: #the scheduler was deleted while downloading
+            pass
+
+    def _finish_job(self, job: DownloadJob, file_paths: list[str], mods_downloaded_successfully: bool) -> None:
+        self.running_count -= 1
+        self.running_per_host[job.host] -= 1
+
+        if self.jobs.get(job.key()) is not job: #cancelled while downloading (cancel() and shutdown() remove it), so nobody is waiting on the files
+            remove_downloaded_files(file_paths)
+        elif not file_paths and not mods_downloaded_successfully and job.attempts <= DOWNLOAD_RETRY_COUNT:
+            job.cancel_event = threading.Event() #in case something other than cancel() set it, the retry would stop right away otherwise
+            delay = DOWNLOAD_RETRY_DELAY * 2 ** (job.attempts - 1)
+            print(f"Download of {job.mod_name} failed, retrying in {delay / 1000:.0f} seconds.")
+            job.state = DOWNLOAD_STATE_RETRYING
+            self.state_changed.emit(job.number, job.item_type, DOWNLOAD_STATE_RETRYING)
+            QTimer.singleShot(delay, lambda: self._retry(job)) #does nothing if it was cancelled (or the scheduler shut down) in the meantime
+        else:
+            del self.jobs[job.key()]
+            job.state = DOWNLOAD_STATE_NONE
+            self.state_changed.emit(job.number, job.item_type, DOWNLOAD_STATE_NONE)
+            self.download_finished.emit(file_paths, job.mod_name.replace(",", ""), job.item_type, job.number, mods_downloaded_successfully) #mod names cannot have commas due to how information is stored in the modpack file
+            self._emit_if_idle()
+        self._dispatch()
+
+    def _retry(self, job: DownloadJob) -> None:
+        if self.jobs.get(job.key()) is not job: #cancelled while waiting
+            return
+        job.state = DOWNLOAD_STATE_QUEUED
+        heapq.heappush(self.queue, job)
+        self.state_changed.emit(job.number, job.item_type, DOWNLOAD_STATE_QUEUED)
+        self._dispatch()
+
+    def _emit_if_idle(self) -> None:
+        if not self.jobs:
+            self.busy_changed.emit(False)
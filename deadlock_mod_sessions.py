@@ -0,0 +1,177 @@
+from contextlib import contextmanager
+from typing import Iterator
+import threading
+
+import cloudscraper
+from requests.adapters import HTTPAdapter
+from requests.cookies import RequestsCookieJar
+from urllib3 import (PoolManager, HTTPConnectionPool)
+from urllib3.connection import (HTTPConnection, HTTPSConnection)
+
+from deadlock_mod_transfer import DOWNLOAD_SEGMENT_COUNT
+
+SESSION_POOL_HOSTS = 10 #hosts each session keeps connections open to (the api, the download redirects and the file mirrors)
+SESSION_CONNECTIONS_PER_HOST = DOWNLOAD_SEGMENT_COUNT + 1 #connections each session keeps open to a host: one per segment of a download, and one for the first request
+
+'''
+Lends cloudscraper sessions to the download threads (see DownloadScheduler in deadlock_mod_scheduler.py), so that a session is never used by two downloads at once.
+Requests sessions aren't documented as thread-safe, and their connection pools keep 10 connections per host by default, dropping the rest once they are used.
+- Each download borrows a session for as long as it runs. The segments of that download (see deadlock_mod_transfer.py) share it, so its connection pools are sized to
+  SESSION_CONNECTIONS_PER_HOST to keep every segment's connection open for the next file.
+- Every session has the same user agent and TLS cipher suite, and the cookies (e.x. Cloudflare's clearance cookie) are copied to a session when it is borrowed and back when it
+  is returned, so a challenge solved by one session doesn't have to be solved again by the others.
+- The connections opened and reused by every session are counted, see connection_stats(), so connection problems with concurrent downloads can be diagnosed.
+'''
+
+class ConnectionStats:
+    '''
+    Connection counts of the sessions in a SessionPool: sessions created, connections opened (including reconnections of dropped connections),
+    requests sent on a connection that was already open, and connections open right now (idle in the sessions' pools or in use).
+    '''
+    def __init__(self) -> None:
+        self.sessions = 0
+        self.new = 0
+        self.requests = 0
+        self.open = 0
+        self.lock = threading.Lock() #connections are opened and closed on every download thread
+
+    def add_session(self) -> None:
+        with self.lock:
+            self.sessions += 1
+
+    def add_connection(self) -> None:
+        with self.lock:
+            self.new += 1
+            self.open += 1
+
+    def remove_connection(self) -> None:
+        with self.lock:
+            self.open -= 1
+
+    def add_request(self) -> None:
+        with self.lock:
+            self.requests += 1
+
+    def reused(self) -> int:
+        '''
+        Returns how many requests were sent on a connection that was already open.
+        '''
+        with self.lock:
+            return max(0, self.requests - self.new)
+
+    def __str__(self) -> str:
+        return f"{self.sessions} session(s), {self.new} new connection(s), {self.reused()} reused, {self.open} open"
+
+class CountedConnectionMixin:
+    '''
+    Counts a urllib3 connection's connects, requests and closes in stats. Mixed into HTTPConnection and HTTPSConnection by SessionPool, which sets stats.
+    '''
+    stats: ConnectionStats
+
+    def connect(self) -> None:
+        super().connect()
+        self.stats.add_connection()
+
+    def request(self, *args, **kwargs) -> None:
+        self.stats.add_request() #opens the connection first if it isn't open, which is counted by connect()
+        super().request(*args, **kwargs)
+
+    def close(self) -> None:
+        was_open = self.sock is not None
+        super().close()
+        if was_open:
+            self.stats.remove_connection()
+
+class CountingPoolManager(PoolManager):
+    '''
+    A urllib3 pool manager whose connection pools open connections of connection_classes (scheme -> class), see CountedConnectionMixin.
+    '''
+    def __init__(self, connection_classes: dict[str, type], **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.connection_classes = connection_classes
+
+    def _new_pool(self, scheme: str, host: str, port: int, request_context: dict | None=None) -> HTTPConnectionPool:
+        pool = super()._new_pool(scheme, host, port, request_context)
+        pool.ConnectionCls = self.connection_classes[scheme]
+        return pool
+
+class SessionPool:
+    '''
+    Creates and lends out cloudscraper sessions, see the description above. Borrow a session with session(), and call close() once the pool isn't needed anymore.
+    '''
+    def __init__(self) -> None:
+        self.identity = cloudscraper.create_scraper() #never sends requests, every session copies its user agent and cipher suite
+        self.cookies = RequestsCookieJar() #the cookies every session has received, given to each session when it is borrowed
+        self.idle_sessions: list[cloudscraper.CloudScraper] = []
+        self.closed = False
+        self.lock = threading.Lock() #guards everything above, sessions are borrowed and returned by the download threads
+        self.stats = ConnectionStats()
+        self.connection_classes = { #every session's connections are counted in self.stats
+            "http": type("CountedHTTPConnection", (CountedConnectionMixin, HTTPConnection), {"stats": self.stats}),
+            "https": type("CountedHTTPSConnection", (CountedConnectionMixin, HTTPSConnection), {"stats": self.stats}),
+        }
+
+    @contextmanager
+    def session(self) -> Iterator[cloudscraper.CloudScraper]:
+        '''
+        Borrows a session for the duration of the with block.
+        '''
+        cs = self.acquire()
+        try:
+            yield cs
+        finally:
+            self.release(cs)
+
+    def acquire(self) -> cloudscraper.CloudScraper:
+        '''
+        Returns an idle session, or a new one if every session is in use. Give it back with release() once done.
+        '''
+        with self.lock:
+            if self.idle_sessions:
+                cs = self.idle_sessions.pop()
+            else:
+                cs = self._create_session()
+                self.stats.add_session()
+            cs.cookies.update(self.cookies)
+        return cs
+
+    def release(self, cs: cloudscraper.CloudScraper) -> None:
+        '''
+        Takes back a session from acquire(), keeping the cookies it received for the other sessions.
+        '''
+        with self.lock:
+            self.cookies.update(cs.cookies)
+            if not self.closed:
+                self.idle_sessions.append(cs)
+                return
+        cs.close()
+
+    def close(self) -> None:
+        '''
+        Closes the idle sessions and their connections. The sessions that are in use are closed when they are given back.
+        '''
+        with self.lock:
+            self.closed = True
+            idle_sessions, self.idle_sessions = self.idle_sessions, []
+        for cs in idle_sessions:
+            cs.close()
+
+    def connection_stats(self) -> ConnectionStats:
+        '''
+        Returns the connection counts of every session (kept up to date as they change, print it to see them).
+        '''
+        return self.stats
+
+    def _create_session(self) -> cloudscraper.CloudScraper:
+        '''
+        Creates a session with the same identity as the others, whose connections are counted. Requires self.lock.
+        '''
+        cs = cloudscraper.create_scraper(cipherSuite=self.identity.cipherSuite, ecdhCurve=self.identity.ecdhCurve)
+        cs.headers = self.identity.headers.copy() #the clearance cookie only works for the user agent it was given to
+        for adapter in cs.adapters.values():
+            if isinstance(adapter, HTTPAdapter):
+                pool_kwargs = dict(adapter.poolmanager.connection_pool_kw) #keeps the adapter's ssl settings
+                pool_kwargs.update(maxsize=SESSION_CONNECTIONS_PER_HOST, block=False)
+                adapter.poolmanager.clear()
+                adapter.poolmanager = CountingPoolManager(self.connection_classes, num_pools=SESSION_POOL_HOSTS, **pool_kwargs)
+        return cs
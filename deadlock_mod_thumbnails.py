@@ -0,0 +1,360 @@
+from PyQt5.QtGui import (QImage, QPixmap, QPainter, QColor)
+from PyQt5.QtCore import (Qt, QObject, pyqtSignal)
+
+from concurrent.futures import (Future, ThreadPoolExecutor)
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable
+import threading
+import hashlib
+import sqlite3
+import time
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from constants import *
+
+THUMBNAIL_LOADER_THREADS = 6
+THUMBNAIL_CHUNK_SIZE = 16384
+THUMBNAIL_TIMEOUT = (RESPONSE_WAIT_TIME, RESPONSE_WAIT_TIME) #connect and read timeouts, in seconds
+PLACEHOLDER_COLOUR = "#1A1A1A"
+PLACEHOLDER_TEXT_COLOUR = "#EEDFBF"
+
+THUMBNAIL_CACHE_SIZE_LIMIT = 64 * 1024 * 1024 #bytes of thumbnails kept on disk, the least recently used ones are deleted past this
+THUMBNAIL_CACHE_EVICTION_TARGET = 0.9 #fraction of the limit that eviction brings the cache down to, so it doesn't run on every new thumbnail
+THUMBNAIL_CACHE_MAX_AGE = 7 * 24 * 60 * 60 #seconds a cached thumbnail is used without asking the server if it changed
+THUMBNAIL_MEMORY_CACHE_SIZE = 120 #decoded thumbnails kept in memory, about 8 pages of the catalogue
+
+'''
+Loads the thumbnails of the mod browser's catalogue off the gui thread. Every tile asks the ThumbnailLoader for its image and shows a placeholder until it arrives.
+The images are downloaded by a bounded thread pool through one requests session, whose connection pool keeps the connections to the image server alive
+between downloads, so a page of tiles costs a handful of TLS handshakes instead of one per tile.
+
+Thumbnails are cached in two tiers, so that pages the user has already seen render without the network:
+- The last THUMBNAIL_MEMORY_CACHE_SIZE decoded thumbnails are kept in memory as QPixmaps, and are shown right away.
+- Every downloaded thumbnail is kept on disk under THUMBNAIL_CACHE_DIRECTORY (see ThumbnailDiskCache), up to THUMBNAIL_CACHE_SIZE_LIMIT bytes.
+  A cached thumbnail younger than THUMBNAIL_CACHE_MAX_AGE is used as is, an older one is revalidated with its ETag/Last-Modified and only downloaded again if it changed.
+
+Tiles that are discarded before their image arrives (e.x. when the user flips to another page) cancel their request: downloads that haven't started are dropped,
+and downloads that have stop at the next chunk. A url requested by several tiles at once is only downloaded once.
+Images are decoded into QImages on the pool's threads, and only turned into QPixmaps on the gui thread, since pixmaps can only be used there.
+'''
+
+@lru_cache(maxsize=None)
+def placeholder_pixmap(width: int, height: int, text: str="Loading preview...") -> QPixmap:
+    '''
+    Returns a pixmap of the given size showing text, to show in place of a thumbnail that hasn't loaded yet. The same pixmap is returned for the same arguments.
+    '''
+    pixmap = QPixmap(width, height)
+    pixmap.fill(QColor(PLACEHOLDER_COLOUR))
+    painter = QPainter(pixmap)
+    painter.setPen(QColor(PLACEHOLDER_TEXT_COLOUR))
+    painter.drawText(pixmap.rect(), Qt.AlignCenter, text)
+    painter.end()
+    return pixmap
+
+class CachedThumbnail:
+    '''
+    A thumbnail in the disk cache. etag and last_modified are the validators the server sent with it (empty if it didn't), fetched_at is when it was last
+    downloaded or revalidated, in seconds since the epoch.
+    '''
+    def __init__(self, url: str, file_path: str, size: int, etag: str, last_modified: str, fetched_at: float) -> None:
+        self.url = url
+        self.file_path = file_path
+        self.size = size
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+
+    def is_fresh(self) -> bool:
+        return time.time() - self.fetched_at < THUMBNAIL_CACHE_MAX_AGE
+
+class ThumbnailDiskCache:
+    '''
+    Thumbnails on disk, keyed by url. Each thumbnail is a file named after the hash of its url, and an SQLite index in the same directory keeps their validators,
+    sizes and when they were last used, for evicting the least recently used thumbnails once the cache is over size_limit bytes.
+    Safe to use from several threads. Errors are printed and treated as a cache miss, since the thumbnail can always be downloaded again.
+    '''
+    def __init__(self, directory: str=THUMBNAIL_CACHE_DIRECTORY, size_limit: int=THUMBNAIL_CACHE_SIZE_LIMIT) -> None:
+        self.directory = directory
+        self.size_limit = size_limit
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute('''
+                CREATE TABLE IF NOT EXISTS thumbnails (
+                    url TEXT PRIMARY KEY,
+                    file_name TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    etag TEXT NOT NULL DEFAULT '',
+                    last_modified TEXT NOT NULL DEFAULT '',
+                    fetched_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )''')
+            self.connection.execute("CREATE INDEX IF NOT EXISTS thumbnails_by_last_used ON thumbnails (last_used)")
+        self.total_size = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM thumbnails").fetchone()[0]
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+    def lookup(self, url: str) -> CachedThumbnail | None:
+        '''
+        Returns the cached thumbnail for url, or None if it isn't cached.
+        '''
+        try:
+            with self.lock:
+                row = self.connection.execute("SELECT file_name, size, etag, last_modified, fetched_at FROM thumbnails WHERE url = ?", (url,)).fetchone()
+        except sqlite3.Error as e:
+            print("Error with reading the thumbnail cache: " + str(e))
+            return None
+        if not row:
+            return None
+        file_name, size, etag, last_modified, fetched_at = row
+        return CachedThumbnail(url, os.path.join(self.directory, file_name), size, etag, last_modified, fetched_at)
+
+    def read(self, thumbnail: CachedThumbnail) -> bytes | None:
+        '''
+        Returns the contents of a cached thumbnail and marks it as used, or None if its file is gone (in which case it is removed from the cache).
+        '''
+        try:
+            with open(thumbnail.file_path, "rb") as thumbnail_file:
+                data = thumbnail_file.read()
+        except OSError:
+            self.remove(thumbnail.url)
+            return None
+        try:
+            with self.lock, self.connection:
+                self.connection.execute("UPDATE thumbnails SET last_used = ? WHERE url = ?", (time.time(), thumbnail.url))
+        except sqlite3.Error as e:
+            print("Error with updating the thumbnail cache: " + str(e))
+        return data
+
+    def store(self, url: str, data: bytes, etag: str="", last_modified: str="") -> None:
+        '''
+        Saves a downloaded thumbnail with its validators, replacing the cached one for url, then evicts the least recently used thumbnails if the cache is too big.
+        '''
+        file_name = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        file_path = os.path.join(self.directory, file_name)
+        try:
+            temporary_path = file_path + ".tmp"
+            with open(temporary_path, "wb") as thumbnail_file:
+                thumbnail_file.write(data)
+            os.replace(temporary_path, file_path)
+            now = time.time()
+            with self.lock, self.connection:
+                row = self.connection.execute("SELECT size FROM thumbnails WHERE url = ?", (url,)).fetchone()
+                self.connection.execute("INSERT OR REPLACE INTO thumbnails (url, file_name, size, etag, last_modified, fetched_at, last_used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                        (url, file_name, len(data), etag, last_modified, now, now))
+                self.total_size += len(data) - (row[0] if row else 0)
+        except (OSError, sqlite3.Error) as e:
+            print("Error with saving a thumbnail to the cache: " + str(e))
+            return
+        if self.total_size > self.size_limit:
+            self.evict(int(self.size_limit * THUMBNAIL_CACHE_EVICTION_TARGET))
+
+    def refresh(self, url: str) -> None:
+        '''
+        Marks the cached thumbnail for url as fresh again, call this when the server says it hasn't changed.
+        '''
+        try:
+            with self.lock, self.connection:
+                self.connection.execute("UPDATE thumbnails SET fetched_at = ? WHERE url = ?", (time.time(), url))
+        except sqlite3.Error as e:
+            print("Error with updating the thumbnail cache: " + str(e))
+
+    def remove(self, url: str) -> None:
+        try:
+            with self.lock, self.connection:
+                row = self.connection.execute("SELECT file_name, size FROM thumbnails WHERE url = ?", (url,)).fetchone()
+                if not row:
+                    return
+                self.connection.execute("DELETE FROM thumbnails WHERE url = ?", (url,))
+                self.total_size -= row[1]
+            os.remove(os.path.join(self.directory, row[0]))
+        except FileNotFoundError:
+            pass
+        except (OSError, sqlite3.Error) as e:
+            print("Error with removing a thumbnail from the cache: " + str(e))
+
+    def evict(self, target_size: int) -> None:
+        '''
+        Deletes the least recently used thumbnails until the cache holds at most target_size bytes.
+        '''
+        try:
+            with self.lock, self.connection:
+                evicted = []
+                for url, file_name, size in self.connection.execute("SELECT url, file_name, size FROM thumbnails ORDER BY last_used"):
+                    if self.total_size <= target_size:
+                        break
+                    evicted.append((url, file_name))
+                    self.total_size -= size
+                self.connection.executemany("DELETE FROM thumbnails WHERE url = ?", [(url,) for url, _ in evicted])
+        except sqlite3.Error as e:
+            print("Error with evicting thumbnails from the cache: " + str(e))
+            return
+        for _, file_name in evicted:
+            try:
+                os.remove(os.path.join(self.directory, file_name))
+            except OSError:
+                pass
+
+class ThumbnailLoader(QObject):
+    '''
+    Loads thumbnails from memory, the disk cache or the network, and hands them to the callbacks given to load() on the gui thread.
+    Runs without the disk cache if it can't be opened. Call shutdown() before the loader is deleted.
+    '''
+    _download_finished = pyqtSignal(str, QImage) #emitted from the thread pool with a null image if the download failed, see _download()
+
+    def __init__(self, parent: QObject | None=None, cache_directory: str=THUMBNAIL_CACHE_DIRECTORY) -> None:
+        super().__init__(parent)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=THUMBNAIL_LOADER_THREADS, pool_maxsize=THUMBNAIL_LOADER_THREADS) #one kept-alive connection per thread and host
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=THUMBNAIL_LOADER_THREADS, thread_name_prefix="thumbnails")
+
+        try:
+            self.disk_cache = ThumbnailDiskCache(cache_directory)
+        except (OSError, sqlite3.Error) as e:
+            print("Error with opening the thumbnail cache, thumbnails will not be cached on disk: " + str(e))
+            self.disk_cache = None
+        self.memory_cache: OrderedDict[str, QPixmap] = OrderedDict() #url -> pixmap, least recently used first, only used on the gui thread
+
+        self.lock = threading.Lock() #guards downloads, which the pool's threads check to see if they were cancelled
+        self.downloads: dict[str, Future] = {} #url -> download in progress
+        self.callbacks: dict[int, tuple[str, Callable[[QPixmap | None], None]]] = {} #ticket -> (url, callback), only used on the gui thread
+        self.next_ticket = 0
+
+        self._download_finished.connect(self._deliver)
+
+    def load(self, url: str, callback: Callable[[QPixmap | None], None]) -> int | None:
+        '''
+        Starts loading the image at url. callback is called on the gui thread with the image, or None if it couldn't be loaded, unless the request is cancelled first.
+        Returns a ticket for cancel(), or None if the image was in memory, in which case callback has already been called.
+        '''
+        pixmap = self.memory_cache.get(url)
+        if pixmap is not None:
+            self.memory_cache.move_to_end(url)
+            callback(pixmap)
+            return None
+
+        ticket = self.next_ticket
+        self.next_ticket += 1
+        self.callbacks[ticket] = (url, callback)
+        with self.lock:
+            if url not in self.downloads:
+                self.downloads[url] = self.executor.submit(self._download, url)
+        return ticket
+
+    def prefetch(self, url: str) -> None:
+        '''
+        Starts loading the image at url into the caches, so that a tile asking for it later gets it right away (or joins the download if it's still going).
+        '''
+        self.load(url, lambda pixmap: None)
+
+    def cancel(self, ticket: int) -> None:
+        '''
+        Cancels the request with ticket, its callback won't be called. The download itself is stopped if no other request is waiting for the same url.
+        '''
+        entry = self.callbacks.pop(ticket, None)
+        if entry is None: #already delivered or cancelled
+            return
+        url = entry[0]
+        if any(other_url == url for other_url, _ in self.callbacks.values()):
+            return
+        with self.lock:
+            future = self.downloads.pop(url, None)
+        if future:
+            future.cancel()
+
+    def shutdown(self) -> None:
+        '''
+        Cancels every request and stops the thread pool without waiting for the downloads that are still going (they stop at their next chunk).
+        '''
+        self.callbacks.clear()
+        with self.lock:
+            for future in self.downloads.values():
+                future.cancel()
+            self.downloads.clear()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.disk_cache:
+            self.disk_cache.close()
+
+    def _is_wanted(self, url: str) -> bool:
+        with self.lock:
+            return url in self.downloads
+
+    def _load_data(self, url: str) -> bytes | None:
+        '''
+        Runs on the thread pool. Returns the image at url from the disk cache if it is fresh (or the server says it hasn't changed), otherwise downloads it
+        and saves it to the disk cache. Returns None if every request for url was cancelled during the download.
+        Raises requests.RequestException if it couldn't be downloaded.
+        '''
+        cached_thumbnail = self.disk_cache.lookup(url) if self.disk_cache else None
+        if cached_thumbnail and cached_thumbnail.is_fresh():
+            data = self.disk_cache.read(cached_thumbnail)
+            if data is not None:
+                return data
+            cached_thumbnail = None
+
+        headers = {}
+        if cached_thumbnail: #ask the server to only send the thumbnail again if it changed
+            if cached_thumbnail.etag:
+                headers["If-None-Match"] = cached_thumbnail.etag
+            if cached_thumbnail.last_modified:
+                headers["If-Modified-Since"] = cached_thumbnail.last_modified
+
+        with self.session.get(url, headers=headers, timeout=THUMBNAIL_TIMEOUT, stream=True) as response:
+            if response.status_code == 304 and cached_thumbnail:
+                self.disk_cache.refresh(url)
+                data = self.disk_cache.read(cached_thumbnail)
+                if data is not None:
+                    return data
+                return self._load_data(url) #the cached file disappeared in the meantime, download it again
+            response.raise_for_status()
+            data = bytearray()
+            for chunk in response.iter_content(THUMBNAIL_CHUNK_SIZE):
+                if not self._is_wanted(url):
+                    return None
+                data += chunk
+            if self.disk_cache and not QImage.fromData(bytes(data)).isNull(): #don't cache error pages
+                self.disk_cache.store(url, bytes(data), response.headers.get("ETag", ""), response.headers.get("Last-Modified", ""))
+            return bytes(data)
+
+    def _download(self, url: str) -> None:
+        '''
+        Runs on the thread pool. Loads and decodes the image at url, and sends it to the gui thread unless every request for it was cancelled.
+        '''
+        image = QImage()
+        try:
+            data = self._load_data(url)
+            if data is None:
+                return
+            image.loadFromData(data)
+        except requests.RequestException as e:
+            print("Failed to load thumbnail: " + str(e))
+        try:
+            self._download_finished.emit(url, image)
+        except RuntimeError: #the loader was deleted while downloading
+            pass
+
+    def _deliver(self, url: str, image: QImage) -> None:
+        with self.lock:
+            self.downloads.pop(url, None)
+        pixmap = None
+        if not image.isNull():
+            pixmap = QPixmap.fromImage(image)
+            self.memory_cache[url] = pixmap
+            self.memory_cache.move_to_end(url)
+            while len(self.memory_cache) > THUMBNAIL_MEMORY_CACHE_SIZE:
+                self.memory_cache.popitem(last=False)
+        for ticket, (ticket_url, callback) in list(self.callbacks.items()):
+            if ticket_url == url:
+                del self.callbacks[ticket]
+                callback(pixmap)
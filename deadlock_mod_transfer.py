@@ -0,0 +1,346 @@
+from concurrent.futures import (ThreadPoolExecutor, as_completed)
+import threading
+import hashlib
+import json
+import time
+import re
+import os
+
+import cloudscraper
+import requests
+import urllib3
+
+from constants import *
+
+DOWNLOAD_PART_SUFFIX = ".part" #files are downloaded to a file in PARTIAL_DOWNLOAD_FOLDER ending in this, and moved to their path once they are complete
+DOWNLOAD_STATE_SUFFIX = ".json" #the missing ranges of a failed download are saved to its .part file's path + this, see PartialDownload
+PART_FILE_MAX_AGE = 24 * 60 * 60 #seconds a failed download is kept to be resumed, after which it is deleted
+DOWNLOAD_CONNECT_TIMEOUT = RESPONSE_WAIT_TIME #seconds
+DOWNLOAD_READ_TIMEOUT = 15 #seconds without receiving any data, after which the connection is treated as dropped
+DOWNLOAD_ATTEMPTS = 5 #per segment, every attempt after the first resumes from where the last one stopped
+DOWNLOAD_RETRY_DELAY = 1 #seconds before the first retry, doubled for every retry after it
+DOWNLOAD_SEGMENT_COUNT = 4 #connections a large file is split over, if the server supports ranged requests
+DOWNLOAD_SEGMENT_MIN_SIZE = 4 * 1024 * 1024 #bytes, files are only split into segments at least this big
+MIN_CHUNK_SIZE = 8192 #bytes read from the connection at once, adapted between these two according to how fast the data arrives
+MAX_CHUNK_SIZE = 1024 * 1024
+STOP_POLL_INTERVAL = 0.1 #seconds between checks of the stop events while a segment waits to retry, see EitherEvent
+CHUNK_TARGET_TIME = 0.05 #seconds a read should take, the chunk size doubles when reads are faster than half this and halves when they are slower than twice this
+
+CONTENT_RANGE_PATTERN = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+)")
+
+'''
+Downloads files over HTTP for the mod downloader (see _download_mod_from_page() in deadlock_mod_downloader.py), without leaving a broken file behind when the connection drops.
+- Files are written to a .part file in PARTIAL_DOWNLOAD_FOLDER (named after the url and the file name), and only moved to the final path once complete.
+- When a download in ranges fails, its .part file is kept along with the ranges that are still missing and the file's size and ETag (or Last-Modified date).
+  The next download of the same url to a file of the same name (e.x. the mod browser retrying it) only downloads the missing ranges, as long as the server still sends
+  a file of the same size and ETag, otherwise it starts over. A cancelled download, or one whose server doesn't support ranges, deletes its .part file,
+  and kept .part files are deleted after PART_FILE_MAX_AGE seconds.
+- A dropped connection is retried with an HTTP Range request from the last byte that arrived, up to DOWNLOAD_ATTEMPTS times with a growing delay.
+- The first request asks for the first byte only, to find out if the server supports ranges and how big the file is. If it does, files of at least two segments
+  are split into up to DOWNLOAD_SEGMENT_COUNT ranges downloaded in parallel, into the same (preallocated) .part file. Otherwise, the answer to the first request is the whole file.
+  A server that answers with a range but doesn't say how big the file is gets asked for the whole file instead, and one that can't send a first byte (416) means the file is empty.
+- Reads start at MIN_CHUNK_SIZE bytes and grow on fast connections, so a fast download isn't a loop of tiny writes, and a slow one still notices a cancellation quickly.
+Every download returns DownloadStats, with the measured throughput.
+'''
+
+class DownloadCancelledError(Exception):
+    '''
+    Raised by the segments of a download that was cancelled, see download_file().
+    '''
+
+class DownloadStats:
+    '''
+    What a download took: bytes received, seconds, connections used in parallel and how many times a connection was resumed.
+    '''
+    def __init__(self) -> None:
+        self.bytes_downloaded = 0
+        self.elapsed = 0.0
+        self.segments = 1
+        self.resumes = 0
+        self.lock = threading.Lock() #the segments of a download add to these from their own threads
+
+    def add_bytes(self, byte_count: int) -> None:
+        with self.lock:
+            self.bytes_downloaded += byte_count
+
+    def add_resume(self) -> None:
+        with self.lock:
+            self.resumes += 1
+
+    def throughput(self) -> float:
+        '''
+        Returns the average download speed in bytes per second.
+        '''
+        return self.bytes_downloaded / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self) -> str:
+        return f"{self.bytes_downloaded / 1024 / 1024:.1f} MB in {self.elapsed:.1f} s ({self.throughput() / 1024 / 1024:.1f} MB/s, " \
+            f"{self.segments} connection(s), {self.resumes} resume(s))"
+
+class EitherEvent:
+    '''
+    Set when either of two events is set. Lets the segments of a download stop when the caller cancels it (the caller's event) or when another segment failed
+    (the download's own event), without download_file() ever setting the caller's event.
+    '''
+    def __init__(self, first: threading.Event, second: threading.Event) -> None:
+        self.first = first
+        self.second = second
+
+    def is_set(self) -> bool:
+        return self.first.is_set() or self.second.is_set()
+
+    def wait(self, timeout: float) -> bool:
+        '''
+        Waits up to timeout seconds for either event to be set. Returns True if one was set.
+        '''
+        deadline = time.perf_counter() + timeout
+        while not self.is_set():
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return False
+            self.first.wait(min(remaining, STOP_POLL_INTERVAL))
+        return True
+
+class ChunkSizer:
+    '''
+    Picks how many bytes to read at once, from how long the last read took (see CHUNK_TARGET_TIME).
+    '''
+    def __init__(self) -> None:
+        self.size = MIN_CHUNK_SIZE
+
+    def update(self, read_time: float) -> None:
+        if read_time < CHUNK_TARGET_TIME / 2:
+            self.size = min(self.size * 2, MAX_CHUNK_SIZE)
+        elif read_time > CHUNK_TARGET_TIME * 2:
+            self.size = max(self.size // 2, MIN_CHUNK_SIZE)
+
+class PartialDownload:
+    '''
+    The ranges of a download in ranges that are still missing, as [next byte, last byte] lists that its segments move along as they download.
+    Saved next to the .part file when the download fails (see save()), so that the next attempt only downloads what is missing, see load_partial_download().
+    The file is identified by its size and validator (its ETag, or its Last-Modified date if it doesn't have one).
+    '''
+    def __init__(self, total_size: int, validator: str, segments: list[tuple[int, int]] | list[list[int]]) -> None:
+        self.total_size = total_size
+        self.validator = validator
+        self.segments = [[start, end] for start, end in segments]
+
+    def remaining_segments(self) -> list[list[int]]:
+        return [segment for segment in self.segments if segment[0] <= segment[1]]
+
+    def remaining_bytes(self) -> int:
+        return sum(end - start + 1 for start, end in self.remaining_segments())
+
+    def save(self, part_path: str) -> bool:
+        '''
+        Saves the missing ranges next to the .part file at part_path. Returns False if they weren't saved, because the server didn't give the file a validator
+        (so the next attempt couldn't tell if it is still the same file) or the state file couldn't be written.
+        '''
+        if not self.validator:
+            return False
+        try:
+            with open(part_path + DOWNLOAD_STATE_SUFFIX, "w") as state_file:
+                json.dump({"total_size": self.total_size, "validator": self.validator, "segments": self.remaining_segments()}, state_file)
+        except OSError as e:
+            print("Error, could not save the progress of the download: " + str(e))
+            return False
+        return True
+
+def plan_segments(total_size: int) -> list[tuple[int, int]]:
+    '''
+    Returns the (first byte, last byte) ranges to download a file of total_size bytes in, at most DOWNLOAD_SEGMENT_COUNT of at least DOWNLOAD_SEGMENT_MIN_SIZE bytes each.
+    '''
+    segment_count = max(1, min(DOWNLOAD_SEGMENT_COUNT, total_size // DOWNLOAD_SEGMENT_MIN_SIZE))
+    segment_size = -(-total_size // segment_count) #rounded up
+    return [(start, min(start + segment_size, total_size) - 1) for start in range(0, total_size, segment_size)]
+
+def _request(cs: cloudscraper.CloudScraper | requests.Session, url: str, start: int=0, end: int | None=None) -> requests.Response:
+    '''
+    Sends a streamed GET request for the bytes from start to end (inclusive, or to the end of the file if end is None). Raises requests.RequestException if it fails.
+    '''
+    headers = {"Accept-Encoding": "identity"} #byte ranges are ranges of the file as it is sent, so it can't be compressed on the way
+    if start > 0 or end is not None:
+        headers["Range"] = f"bytes={start}-{'' if end is None else end}"
+    response = cs.get(url, headers=headers, stream=True, allow_redirects=True, timeout=(DOWNLOAD_CONNECT_TIMEOUT, DOWNLOAD_READ_TIMEOUT))
+    response.raise_for_status()
+    return response
+
+def _download_segment(cs: cloudscraper.CloudScraper | requests.Session, url: str, part_path: str, segment: list[int | None], stats: DownloadStats,
+                      cancel_event: threading.Event | EitherEvent, response: requests.Response | None=None) -> None:
+    '''
+    Downloads the bytes of segment, [first byte, last byte] (inclusive, or to the end of the file if the last byte is None), into the same place in the file at part_path,
+    which must exist. The first byte of segment is moved along as the bytes are written, so it is where the segment stopped if this raises.
+    Resumes from the last byte received when the connection drops. If response is given, it is used for the first attempt instead of sending a request.
+    Raises DownloadCancelledError if cancel_event is set, or the last error if every attempt failed.
+    '''
+    end = segment[1]
+    for attempt in range(DOWNLOAD_ATTEMPTS):
+        try:
+            if response is None:
+                response = _request(cs, url, segment[0], end)
+            if segment[0] > 0 and response.status_code != 206: #the server ignored the range and is sending the whole file
+                if end is not None:
+                    raise requests.RequestException("the server stopped supporting ranged requests")
+                segment[0] = 0
+            with response, open(part_path, "r+b") as part_file:
+                if end is None:
+                    part_file.truncate(segment[0])
+                part_file.seek(segment[0])
+                chunk_sizer = ChunkSizer()
+                while end is None or segment[0] <= end:
+                    if cancel_event.is_set():
+                        raise DownloadCancelledError()
+                    read_size = chunk_sizer.size if end is None else min(chunk_sizer.size, end - segment[0] + 1)
+                    read_start_time = time.perf_counter()
+                    chunk = response.raw.read(read_size, decode_content=True)
+                    chunk_sizer.update(time.perf_counter() - read_start_time)
+                    if not chunk:
+                        break
+                    part_file.write(chunk)
+                    segment[0] += len(chunk)
+                    stats.add_bytes(len(chunk))
+            if end is None or segment[0] > end:
+                return
+            raise requests.RequestException(f"the connection closed {end - segment[0] + 1} bytes early")
+        except (requests.RequestException, urllib3.exceptions.HTTPError, ConnectionError) as e:
+            response = None
+            if attempt == DOWNLOAD_ATTEMPTS - 1:
+                raise
+            print(f"Download interrupted at byte {segment[0]} ({e}), resuming.")
+            stats.add_resume()
+            if cancel_event.wait(DOWNLOAD_RETRY_DELAY * 2 ** attempt):
+                raise DownloadCancelledError()
+
+def download_file(cs: cloudscraper.CloudScraper | requests.Session, url: str, file_path: str, cancel_event: threading.Event | None=None) -> DownloadStats | None:
+    '''
+    Downloads the file at url to file_path (through a .part file, see part_file_path()), resuming dropped connections and splitting large files into parallel ranges.
+    A download in ranges that failed earlier carries on from where it stopped, if the server still sends the same file.
+    Setting cancel_event from another thread stops the download.
+    Returns the download's statistics, or None if it failed or was cancelled, in which case nothing is left at file_path. The .part file of a failed download in ranges is kept
+    to be resumed, any other .part file is deleted.
+    '''
+    cancel_event = cancel_event or threading.Event()
+    failed_event = threading.Event() #set when a segment fails, to stop the others
+    part_path = part_file_path(url, file_path)
+    partial_download: PartialDownload | None = None #set once the .part file is being downloaded in ranges, which can be resumed
+    stats = DownloadStats()
+    start_time = time.perf_counter()
+    try:
+        remove_old_part_files()
+        os.makedirs(PARTIAL_DOWNLOAD_FOLDER, exist_ok=True)
+        try:
+            response = _request(cs, url, 0, 0) #just the first byte, if the server supports ranges
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code != 416:
+                raise
+            e.response.close()
+            response = None #the file doesn't have a first byte, so it is empty
+        content_range = CONTENT_RANGE_PATTERN.match(response.headers.get("Content-Range", "")) if response is not None else None
+        if response is not None and response.status_code == 206 and not content_range: #a range of a file whose size the server doesn't say, so get the whole file instead
+            response.close()
+            response = _request(cs, url)
+        if response is None:
+            _remove_file(part_path + DOWNLOAD_STATE_SUFFIX)
+            with open(part_path, "wb"):
+                pass
+        elif response.status_code == 206 and content_range:
+            response.content #reads the one byte, otherwise closing the response closes the connection instead of returning it to the session's pool
+            response.close()
+            total_size = int(content_range.group(3))
+            validator = response.headers.get("ETag") or response.headers.get("Last-Modified") or ""
+            download_url = response.url #after redirects, so that the segments don't go through them again
+            partial_download = load_partial_download(part_path, total_size, validator)
+            if partial_download is None:
+                with open(part_path, "wb") as part_file:
+                    part_file.truncate(total_size) #the segments write into their own part of the file
+                partial_download = PartialDownload(total_size, validator, plan_segments(total_size))
+            else:
+                print(f"Resuming download from an earlier attempt, {partial_download.remaining_bytes()} of {total_size} bytes left: " + url)
+            segments = partial_download.remaining_segments()
+            stats.segments = len(segments)
+            if len(segments) == 1:
+                _download_segment(cs, download_url, part_path, segments[0], stats, cancel_event)
+            elif segments:
+                stop_event = EitherEvent(cancel_event, failed_event)
+                with ThreadPoolExecutor(max_workers=len(segments), thread_name_prefix="download-segment") as executor:
+                    futures = [executor.submit(_download_segment, cs, download_url, part_path, segment, stats, stop_event) for segment in segments]
+                    try:
+                        for future in as_completed(futures): #the first segment to fail stops the others right away
+                            future.result()
+                    except BaseException:
+                        failed_event.set() #stop the other segments, the download failed
+                        raise
+        else: #the server sent the whole file, or nothing at all for an empty file
+            _remove_file(part_path + DOWNLOAD_STATE_SUFFIX)
+            with open(part_path, "wb"):
+                pass
+            _download_segment(cs, url, part_path, [0, None], stats, cancel_event, response)
+        os.replace(part_path, file_path)
+        _remove_file(part_path + DOWNLOAD_STATE_SUFFIX)
+    except DownloadCancelledError:
+        print("Download cancelled: " + url)
+        _remove_file(part_path)
+        _remove_file(part_path + DOWNLOAD_STATE_SUFFIX)
+        return None
+    except (requests.RequestException, urllib3.exceptions.HTTPError, ConnectionError, OSError) as e:
+        print("Error with downloading file: " + str(e))
+        if partial_download is not None and partial_download.save(part_path):
+            print(f"Kept the partially downloaded file, {partial_download.remaining_bytes()} bytes are left to download next time.")
+        else:
+            _remove_file(part_path)
+            _remove_file(part_path + DOWNLOAD_STATE_SUFFIX)
+        return None
+    stats.elapsed = time.perf_counter() - start_time
+    return stats
+
+def part_file_path(url: str, file_path: str) -> str:
+    '''
+    Returns the path of the .part file that url is downloaded to before it is moved to file_path. It is the same for every download of url to a file of the same name,
+    so that a failed download can be resumed by the next one, even into another folder.
+    '''
+    url_hash = hashlib.sha1(url.encode()).hexdigest()[:16]
+    return os.path.join(PARTIAL_DOWNLOAD_FOLDER, f"{url_hash}_{os.path.basename(file_path)}{DOWNLOAD_PART_SUFFIX}")
+
+def load_partial_download(part_path: str, total_size: int, validator: str) -> PartialDownload | None:
+    '''
+    Returns the missing ranges saved for the .part file at part_path, if it is still there and they were saved for a file of total_size bytes with validator.
+    Otherwise returns None, and deletes the saved ranges (the .part file is started over).
+    '''
+    state_path = part_path + DOWNLOAD_STATE_SUFFIX
+    if not os.path.isfile(state_path):
+        return None
+    try:
+        with open(state_path, "r") as state_file:
+            state = json.load(state_file)
+        if state["validator"] and state["validator"] == validator and state["total_size"] == total_size and os.path.getsize(part_path) == total_size:
+            return PartialDownload(total_size, validator, state["segments"])
+        print("The file changed on the server since the last attempt, downloading it again.")
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print("Error, could not read the progress of an earlier download: " + str(e))
+    _remove_file(state_path)
+    return None
+
+def remove_old_part_files() -> None:
+    '''
+    Deletes the .part files (and their saved ranges) in PARTIAL_DOWNLOAD_FOLDER that haven't been written to for PART_FILE_MAX_AGE seconds,
+    which are failed downloads that were never tried again.
+    '''
+    try:
+        entries = list(os.scandir(PARTIAL_DOWNLOAD_FOLDER))
+    except OSError:
+        return
+    now = time.time()
+    for entry in entries:
+        try:
+            if entry.is_file() and now - entry.stat().st_mtime > PART_FILE_MAX_AGE:
+                os.remove(entry.path)
+        except OSError: #another download's, that is being deleted or moved right now
+            pass
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print("Error, could not delete partially downloaded file: " + str(e))
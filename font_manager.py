@@ -0,0 +1,78 @@
+from PyQt5.QtGui import QFontDatabase
+
+import time
+import re
+import os
+
+#the bundled fonts are all styles of one family, named like the files: "Roboto Condensed Medium" is RobotoCondensed-Medium.ttf
+FONT_FAMILY = "Roboto Condensed"
+FONT_FILE_PREFIX = "RobotoCondensed-"
+FONT_FILE_EXTENSION = ".ttf"
+DEFAULT_FONT_STYLE = "Regular"
+
+FONT_FAMILY_PATTERN = re.compile(r"font-family\s*:\s*([^;}]+)")
+
+'''
+Registers the bundled fonts with Qt only when they are needed, instead of every file in the fonts folder at startup.
+At startup, only the fonts that the stylesheet names in its font-family properties are registered (see register_stylesheet_fonts()),
+the others are never loaded. How long each registration took is kept, for the startup timings.
+
+Qt names the fonts differently depending on the platform (on Windows, each style of the family is its own family e.x. "Roboto Condensed Medium",
+elsewhere they are all styles of "Roboto Condensed"), so fonts are looked up by their full name and registered under whatever name Qt gives them.
+'''
+
+def font_file_name(family: str) -> str | None:
+    '''
+    Returns the name of the bundled font file for family (e.x. 'RobotoCondensed-ExtraBold.ttf' for "Roboto Condensed ExtraBold"),
+    or None if family isn't one of the bundled fonts.
+    '''
+    if not family.startswith(FONT_FAMILY):
+        return None
+    style = family.removeprefix(FONT_FAMILY).strip() or DEFAULT_FONT_STYLE
+    return FONT_FILE_PREFIX + style.replace(" ", "") + FONT_FILE_EXTENSION
+
+def stylesheet_font_families(qss: str) -> list[str]:
+    '''
+    Returns every font family named in a font-family property of the stylesheet qss, in the order they first appear.
+    '''
+    families = []
+    for match in FONT_FAMILY_PATTERN.finditer(qss):
+        for family in match.group(1).split(","):
+            family = family.strip().strip("\"'")
+            if family and family not in families:
+                families.append(family)
+    return families
+
+class FontManager:
+    '''
+    Keeps track of which bundled fonts (in fonts_directory) have been registered with Qt. Must be used after the QApplication is created.
+    '''
+    def __init__(self, fonts_directory: str) -> None:
+        self.fonts_directory = fonts_directory
+        self.registered_fonts: dict[str, int] = {} #file name -> Qt's font id, -1 if the font couldn't be registered
+        self.registration_times: dict[str, float] = {} #file name -> seconds
+
+    def _register_font(self, family: str) -> bool:
+        '''
+        Registers the bundled font file for family if it isn't registered yet. Returns True if the font is registered,
+        False if family isn't a bundled font or it couldn't be registered.
+        '''
+        file_name = font_file_name(family)
+        if file_name is None:
+            return False
+        if file_name not in self.registered_fonts:
+            file_path = os.path.join(self.fonts_directory, file_name)
+            start_time = time.perf_counter()
+            font_id = QFontDatabase.addApplicationFont(file_path) if os.path.isfile(file_path) else -1
+            self.registration_times[file_name] = time.perf_counter() - start_time
+            self.registered_fonts[file_name] = font_id
+            if font_id == -1:
+                print("Error, could not load font: " + file_path)
+        return self.registered_fonts[file_name] != -1
+
+    def register_stylesheet_fonts(self, qss: str) -> list[str]:
+        '''
+        Registers the bundled fonts named in the stylesheet qss. Returns the font families in qss that aren't bundled (or couldn't be registered),
+        which Qt replaces with a system font.
+        '''
+        return [family for family in stylesheet_font_families(qss) if not self._register_font(family)]
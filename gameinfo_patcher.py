@@ -0,0 +1,240 @@
+import hashlib
+import shutil
+import os
+
+GAMEINFO_SUBPATH = os.path.join("game", "citadel", "gameinfo.gi")
+GAMEINFO_BACKUP_SUFFIX = ".ezdmm_backup"
+
+#the search paths needed for the game to load mods from the addon folder, in the order they must appear (right after the language paths)
+REQUIRED_SEARCH_PATHS = [("Mod", "citadel"), ("Write", "citadel"), ("Game", "citadel/addons")]
+LANGUAGE_SEARCH_PATH_KEY = "Game_Language"
+
+'''
+gameinfo.gi is a Valve KeyValues file. The game only loads mods if the SearchPaths block (GameInfo > FileSystem > SearchPaths) mounts citadel/addons,
+which Steam reverts every time the game updates. parse_keyvalues() reads the file into nodes that remember their position in the original text, so the patch
+only inserts the missing lines and keeps everything else (comments, formatting, conditionals) as it was.
+
+GameInfoPatcher caches the file's size, modification time and hash together with whether it was patched, so checking the file before every deploy or launch
+is a single os.stat() when nothing has changed, and the file is only rewritten when Steam has reverted it.
+'''
+
+class KeyValuesSyntaxError(ValueError):
+    pass
+
+class KeyValuesNode:
+    '''
+    A key in a KeyValues file, with either a string value or a block of child nodes.
+    line_start is the offset of the start of the line the key is on, and end is the offset right after the value (or the closing brace of a block).
+    '''
+    def __init__(self, key: str, line_start: int) -> None:
+        self.key = key
+        self.value: str | None = None
+        self.children: list[KeyValuesNode] | None = None
+        self.conditional = "" #e.x. '[ $WIN ]', if present
+        self.line_start = line_start
+        self.end = line_start
+
+    def find(self, *keys: str) -> "KeyValuesNode | None":
+        '''
+        Returns the first descendant block following the path of keys (case-insensitive), or None if it doesn't exist.
+        '''
+        return find_node(self.children or [], *keys)
+
+def _tokenize(text: str) -> list[tuple[str, str, int, int]]:
+    '''
+    Splits KeyValues text into (kind, value, start offset, end offset) tokens, where kind is one of 'string', '{', '}' or 'conditional'. Comments are skipped.
+    '''
+    tokens = []
+    index = 0
+    length = len(text)
+    while index < length:
+        character = text[index]
+        if character.isspace():
+            index += 1
+        elif text.startswith("//", index):
+            newline_index = text.find("\n", index)
+            index = length if newline_index == -1 else newline_index
+        elif character in "{}":
+            tokens.append((character, character, index, index + 1))
+            index += 1
+        elif character == '"':
+            end_index = index + 1
+            value = []
+            while end_index < length and text[end_index] != '"':
+                if text[end_index] == "\\" and end_index + 1 < length:
+                    value.append(text[end_index:end_index + 2])
+                    end_index += 2
+                    continue
+                value.append(text[end_index])
+                end_index += 1
+            if end_index >= length:
+                raise KeyValuesSyntaxError(f"Unterminated string at offset {index}")
+            tokens.append(("string", "".join(value), index, end_index + 1))
+            index = end_index + 1
+        elif character == "[":
+            end_index = text.find("]", index)
+            if end_index == -1:
+                raise KeyValuesSyntaxError(f"Unterminated conditional at offset {index}")
+            tokens.append(("conditional", text[index:end_index + 1], index, end_index + 1))
+            index = end_index + 1
+        else:
+            end_index = index
+            while end_index < length and not text[end_index].isspace() and text[end_index] not in '{}"' and not text.startswith("//", end_index):
+                end_index += 1
+            tokens.append(("string", text[index:end_index], index, end_index))
+            index = end_index
+    return tokens
+
+def parse_keyvalues(text: str) -> list[KeyValuesNode]:
+    '''
+    Parses KeyValues text into a list of top level nodes. Raises KeyValuesSyntaxError if the text is malformed (e.x. unbalanced braces).
+    '''
+    tokens = _tokenize(text)
+    position = 0
+
+    def parse_block(closing_brace_expected: bool) -> tuple[list[KeyValuesNode], int]:
+        nonlocal position
+        nodes = []
+        while position < len(tokens):
+            kind, value, start, end = tokens[position]
+            if kind == "}":
+                if not closing_brace_expected:
+                    raise KeyValuesSyntaxError(f"Unexpected '}}' at offset {start}")
+                position += 1
+                return nodes, end
+            if kind != "string":
+                raise KeyValuesSyntaxError(f"Expected a key at offset {start}")
+
+            node = KeyValuesNode(value, text.rfind("\n", 0, start) + 1)
+            position += 1
+            if position >= len(tokens):
+                raise KeyValuesSyntaxError(f"Key '{value}' has no value")
+            kind, value, start, end = tokens[position]
+            if kind == "{":
+                position += 1
+                node.children, node.end = parse_block(True)
+            elif kind == "string":
+                node.value = value
+                node.end = end
+                position += 1
+            else:
+                raise KeyValuesSyntaxError(f"Key '{node.key}' has no value")
+
+            if position < len(tokens) and tokens[position][0] == "conditional":
+                node.conditional = tokens[position][1]
+                node.end = tokens[position][3]
+                position += 1
+            nodes.append(node)
+
+        if closing_brace_expected:
+            raise KeyValuesSyntaxError("Missing '}' at the end of the file")
+        return nodes, len(text)
+
+    nodes, _ = parse_block(False)
+    return nodes
+
+def find_node(nodes: list[KeyValuesNode], *keys: str) -> KeyValuesNode | None:
+    '''
+    Follows the path of keys (case-insensitive) through nested blocks, starting from nodes. Returns the last node in the path, or None if any key is missing.
+    '''
+    node = None
+    for key in keys:
+        node = next((child for child in nodes if child.key.lower() == key.lower() and child.children is not None), None)
+        if node is None:
+            return None
+        nodes = node.children
+    return node
+
+def _value_padding(key: str) -> str:
+    '''
+    Returns the tabs that line up a search path's value with the others in gameinfo.gi (values start at the 6th tab stop, with tabs 4 wide).
+    '''
+    return "\t" * max(1, 5 - len(key) // 4)
+
+def patch_search_paths(text: str) -> str | None:
+    '''
+    Returns text with the REQUIRED_SEARCH_PATHS that are missing inserted into the SearchPaths block, right after the language search path (or at the top of the block).
+    Returns None if every required search path is already present, meaning the file doesn't need to be written.
+    Raises KeyValuesSyntaxError if the file can't be parsed or has no SearchPaths block.
+    '''
+    search_paths = find_node(parse_keyvalues(text), "GameInfo", "FileSystem", "SearchPaths")
+    if search_paths is None:
+        raise KeyValuesSyntaxError("Could not find the SearchPaths block")
+
+    present = {(child.key.lower(), (child.value or "").lower()) for child in search_paths.children}
+    missing = [(key, value) for key, value in REQUIRED_SEARCH_PATHS if (key.lower(), value.lower()) not in present]
+    if not missing:
+        return None
+
+    #each missing path goes right after the required path before it (or the language path), so they keep their order
+    newline = "\r\n" if "\r\n" in text else "\n"
+    insertions: dict[int, str] = {}
+    anchor = next((child for child in search_paths.children if child.key.lower() == LANGUAGE_SEARCH_PATH_KEY.lower()), None)
+    for key, value in REQUIRED_SEARCH_PATHS:
+        existing = next((child for child in search_paths.children if (child.key.lower(), (child.value or "").lower()) == (key.lower(), value.lower())), None)
+        if existing is not None:
+            anchor = existing
+            continue
+        if anchor is not None:
+            insert_offset = text.find("\n", anchor.end)
+            insert_offset = len(text) if insert_offset == -1 else insert_offset + 1
+            anchor_line = text[anchor.line_start:insert_offset]
+            indentation = anchor_line[:len(anchor_line) - len(anchor_line.lstrip(" \t"))]
+        else: #no language path, so insert at the top of the block
+            insert_offset = text.find("\n", text.find("{", text.lower().rfind("searchpaths", 0, search_paths.end))) + 1
+            indentation = "\t\t\t"
+        insertions[insert_offset] = insertions.get(insert_offset, "") + f"{indentation}{key}{_value_padding(key)}{value}{newline}"
+
+    for insert_offset in sorted(insertions, reverse=True):
+        text = text[:insert_offset] + insertions[insert_offset] + text[insert_offset:]
+    return text
+
+class GameInfoPatcher:
+    '''
+    Keeps gameinfo.gi patched for mods, using a cached state so unchanged files are never read or rewritten.
+    state is a plain dict (stored in the settings file by the mod manager) containing the path, size, modification time and hash of the file when it was last checked,
+    and whether it was patched at that time.
+    '''
+    def __init__(self, state: dict | None=None) -> None:
+        self.state = dict(state) if state else {}
+
+    def _is_cached(self, game_info_file_path: str, stat_result: os.stat_result) -> bool:
+        return (self.state.get("patched") is True and self.state.get("path") == game_info_file_path
+                and self.state.get("size") == stat_result.st_size and self.state.get("mtime_ns") == stat_result.st_mtime_ns)
+
+    def _remember(self, game_info_file_path: str, content: bytes) -> None:
+        stat_result = os.stat(game_info_file_path)
+        self.state = {"path": game_info_file_path, "size": stat_result.st_size, "mtime_ns": stat_result.st_mtime_ns,
+                      "sha256": hashlib.sha256(content).hexdigest(), "patched": True}
+
+    def ensure_patched(self, game_info_file_path: str) -> bool:
+        '''
+        Makes sure gameinfo.gi contains the search paths needed for mods. Returns True if the file had to be rewritten (e.x. after Steam reverted it), False if it was already patched.
+        Before rewriting, the unpatched file is backed up next to it (with GAMEINFO_BACKUP_SUFFIX), and the new file is written to a temporary file and renamed into place.
+        Raises OSError if the file can't be read or written, and KeyValuesSyntaxError if it can't be parsed.
+        '''
+        stat_result = os.stat(game_info_file_path)
+        if self._is_cached(game_info_file_path, stat_result): #nothing touched the file since it was last patched
+            return False
+
+        with open(game_info_file_path, "rb") as f:
+            content = f.read()
+        if self.state.get("patched") is True and self.state.get("sha256") == hashlib.sha256(content).hexdigest(): #touched, but not changed
+            self._remember(game_info_file_path, content)
+            return False
+
+        patched_text = patch_search_paths(content.decode("utf-8"))
+        if patched_text is None: #already patched, by us or by hand
+            self._remember(game_info_file_path, content)
+            return False
+
+        shutil.copy2(game_info_file_path, game_info_file_path + GAMEINFO_BACKUP_SUFFIX)
+        patched_content = patched_text.encode("utf-8")
+        temporary_path = game_info_file_path + ".ezdmm_tmp"
+        with open(temporary_path, "wb") as f:
+            f.write(patched_content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_path, game_info_file_path)
+        self._remember(game_info_file_path, patched_content)
+        return True
@@ -0,0 +1,355 @@
+import shutil
+import time
+import os
+
+from mod_store import compute_content_hash
+
+TEMPORARY_RENAME_SUFFIX = ".ezdmm_moving"
+
+#these folders are created next to the game's addon folder, so that they are on the same drive and can be swapped in with a rename
+STAGING_DIRECTORY_SUFFIX = "_ezdmm_staging"
+DISCARDED_DIRECTORY_SUFFIX = "_ezdmm_discarded"
+SNAPSHOT_DIRECTORY_SUFFIX = "_ezdmm_snapshots"
+DEPLOYMENT_SNAPSHOT_COUNT = 3 #the amount of previous deployments kept for rolling back, can be overridden with "deployment_snapshot_count" in the settings
+
+'''
+Deploying mods means making the game's addon folder contain exactly one 'pakXX_dir.vpk' hard link for every enabled mod, numbered in load order.
+Instead of clearing the folder and linking every mod again, plan_deployment() compares the wanted 'pakXX -> source' mapping with what is already in the folder
+and only plans the operations that are actually needed: existing links that already point to the right mod are kept, links to mods that moved in the load order
+are renamed, and only new mods are linked. Files are matched by inode first (a hard link shares the inode of its source), then by size and content hash.
+
+The live addon folder is never edited in place, see deploy_staged(). The plan is applied to a staging folder of hard links next to it, which is swapped in with renames,
+and the folder it replaces is kept as a snapshot, and rolling back is just another rename. Snapshots are only hard links, so they cost nothing while their mods are still
+in the mod manager, but a mod deleted from the mod manager stays on the drive until every snapshot that contains it is pruned (that is what lets a rollback restore it).
+Only the newest DEPLOYMENT_SNAPSHOT_COUNT snapshots are kept, and snapshot_pinned_size() tells how much space is held only by them.
+'''
+
+def addon_file_name(load_order: int) -> str:
+    '''
+    Returns the addon file name for the mod at load_order (starting at 1), e.x. 'pak01_dir.vpk'. The game only loads files named like this.
+    '''
+    return "pak" + str(load_order).zfill(2) + "_dir.vpk"
+
+class DeploymentOperation:
+    '''
+    A single filesystem operation in a DeploymentPlan. kind is one of 'rename', 'link', 'unlink' or 'remove_dir'.
+    source is the file being renamed or linked (unused for 'unlink' and 'remove_dir'), and target is the path in the addon folder that is created or removed.
+    '''
+    def __init__(self, kind: str, target: str, source: str="") -> None:
+        self.kind = kind
+        self.target = target
+        self.source = source
+
+    def describe(self) -> str:
+        match self.kind:
+            case "rename":
+                return f"rename {os.path.basename(self.source)} -> {os.path.basename(self.target)}"
+            case "link":
+                return f"link {self.source} -> {os.path.basename(self.target)}"
+            case _:
+                return f"{self.kind} {os.path.basename(self.target)}"
+
+class DeploymentPlan:
+    '''
+    The result of plan_deployment(). operations are ordered so they can be applied one after another without overwriting a file that is still needed.
+    kept holds the names of addon files that are already correct, and hashed_bytes is how much data had to be read to compare files that didn't share an inode.
+    '''
+    def __init__(self, addon_directory: str) -> None:
+        self.addon_directory = addon_directory
+        self.operations: list[DeploymentOperation] = []
+        self.kept: list[str] = []
+        self.hashed_bytes = 0
+        self.mod_count = 0 #the amount of mods that will be in the addon folder once the plan is applied
+        self.staging_links = 0 #hard links deploy_staged() makes to clone the addon folder before applying the plan, counted in the plan's cost
+
+    def is_empty(self) -> bool:
+        return not self.operations
+
+    def operation_counts(self) -> dict[str, int]:
+        counts = {"rename": 0, "link": 0, "unlink": 0, "remove_dir": 0}
+        for operation in self.operations:
+            counts[operation.kind] += 1
+        return counts
+
+    def report(self) -> str:
+        '''
+        Returns a readable summary of the plan, with its cost in filesystem operations (including cloning the addon folder into the staging folder)
+        compared to clearing the folder and linking every mod again.
+        '''
+        counts = self.operation_counts()
+        lines = [f"{len(self.kept)} mod(s) already in place, {counts['rename']} rename(s), {counts['link']} new link(s), " \
+                 f"{counts['unlink'] + counts['remove_dir']} removal(s).",
+                 f"Total: {self.staging_links + len(self.operations)} filesystem operation(s), {self.staging_links} of them to stage the current addon folder " \
+                 f"(clearing the folder and linking every mod again would take {self.mod_count + 1})."]
+        if self.hashed_bytes:
+            lines.append(f"Compared {self.hashed_bytes / (1024 * 1024):.1f} MB of file contents.")
+        lines.extend(operation.describe() for operation in self.operations)
+        return "\n".join(lines)
+
+def _file_identity(path: str) -> tuple[int, int, int] | None:
+    '''
+    Returns (device, inode, size) for the file at path, or None if it can't be read. Hard links to the same file share the same device and inode.
+    '''
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        return None
+    return stat_result.st_dev, stat_result.st_ino, stat_result.st_size
+
+def plan_deployment(addon_directory: str, source_paths: list[str], content_hashes: dict[str, str] | None=None) -> DeploymentPlan:
+    '''
+    Plans the operations needed for addon_directory to contain addon_file_name(i + 1) linked to source_paths[i] for every source, and nothing else.
+    content_hashes optionally maps source paths to their known sha256 digests (see mod_store.py), so that only the files in the addon folder need to be hashed
+    when a file there has the same size as a source but not the same inode. Every source path must exist.
+    Nothing is changed on disk, so this doubles as a dry run, see DeploymentPlan.report().
+    '''
+    content_hashes = content_hashes or {}
+    plan = DeploymentPlan(addon_directory)
+    plan.mod_count = len(source_paths)
+    desired = {addon_file_name(index + 1): source_path for index, source_path in enumerate(source_paths)}
+    source_identities = {source_path: _file_identity(source_path) for source_path in source_paths}
+
+    existing_files = {}
+    existing_directories = []
+    if os.path.isdir(addon_directory):
+        for name in os.listdir(addon_directory):
+            path = os.path.join(addon_directory, name)
+            if os.path.isdir(path) and not os.path.islink(path):
+                existing_directories.append(name)
+            else:
+                existing_files[name] = _file_identity(path)
+    plan.staging_links = sum(1 for name in existing_files if os.path.isfile(os.path.join(addon_directory, name))) #what _clone_with_hard_links() would link
+
+    existing_hashes = {}
+    def matches(existing_name: str, source_path: str) -> bool:
+        '''
+        Returns True if the existing addon file has the same contents as the source, without reading either file if their inodes or sizes settle it.
+        '''
+        existing_identity = existing_files[existing_name]
+        source_identity = source_identities[source_path]
+        if existing_identity is None or source_identity is None:
+            return False
+        if existing_identity[:2] == source_identity[:2]:
+            return True
+        if existing_identity[2] != source_identity[2]:
+            return False
+        if existing_name not in existing_hashes:
+            _, existing_hashes[existing_name] = compute_content_hash(os.path.join(addon_directory, existing_name))
+            plan.hashed_bytes += existing_identity[2]
+        if source_path not in content_hashes:
+            _, content_hashes[source_path] = compute_content_hash(source_path)
+            plan.hashed_bytes += source_identity[2]
+        return existing_hashes[existing_name] == content_hashes[source_path]
+
+    #first keep everything that is already correct
+    unresolved_targets = []
+    for target_name, source_path in desired.items():
+        if target_name in existing_files and matches(target_name, source_path):
+            plan.kept.append(target_name)
+        else:
+            unresolved_targets.append(target_name)
+    claimed = set(plan.kept)
+
+    #then find existing files that can be renamed into place instead of linking the source again, inode matches are checked before any hashing
+    existing_names_by_inode = {identity[:2]: name for name, identity in existing_files.items() if identity is not None}
+    renames = {} #target name -> existing name
+    links = []
+    for target_name in unresolved_targets:
+        source_path = desired[target_name]
+        match_name = None
+        if source_identities[source_path] is not None:
+            match_name = existing_names_by_inode.get(source_identities[source_path][:2])
+        if match_name in claimed:
+            match_name = None
+        if not match_name:
+            match_name = next((name for name in existing_files if name not in claimed and matches(name, source_path)), None)
+        if match_name:
+            renames[target_name] = match_name
+            claimed.add(match_name)
+        else:
+            links.append(target_name)
+
+    #anything left over is removed, this happens first so that its names are free for the renames and links
+    for name in sorted(existing_files):
+        if name not in claimed:
+            plan.operations.append(DeploymentOperation("unlink", os.path.join(addon_directory, name)))
+    for name in sorted(existing_directories):
+        plan.operations.append(DeploymentOperation("remove_dir", os.path.join(addon_directory, name)))
+
+    #order the renames so that no target is still occupied by a file that hasn't moved yet, breaking cycles (e.x. two mods swapping places) with a temporary name
+    occupied = {name for name in existing_files if name in claimed}
+    pending = dict(renames)
+    while pending:
+        ready = [target_name for target_name, existing_name in pending.items() if target_name not in occupied]
+        if not ready:
+            target_name, existing_name = next(iter(pending.items()))
+            temporary_name = existing_name + TEMPORARY_RENAME_SUFFIX
+            plan.operations.append(DeploymentOperation("rename", os.path.join(addon_directory, temporary_name), os.path.join(addon_directory, existing_name)))
+            occupied.discard(existing_name)
+            occupied.add(temporary_name)
+            pending[target_name] = temporary_name
+            continue
+        for target_name in ready:
+            existing_name = pending.pop(target_name)
+            plan.operations.append(DeploymentOperation("rename", os.path.join(addon_directory, target_name), os.path.join(addon_directory, existing_name)))
+            occupied.discard(existing_name)
+            occupied.add(target_name)
+
+    for target_name in links:
+        plan.operations.append(DeploymentOperation("link", os.path.join(addon_directory, target_name), desired[target_name]))
+    return plan
+
+def apply_deployment(plan: DeploymentPlan) -> None:
+    '''
+    Applies every operation in the plan, in order. Creates the addon folder if it doesn't exist.
+    Raises OSError (PermissionError if the game has the files open or the folder needs administrator privileges) on the first operation that fails.
+    '''
+    os.makedirs(plan.addon_directory, exist_ok=True)
+    for operation in plan.operations:
+        match operation.kind:
+            case "unlink":
+                os.remove(operation.target)
+            case "remove_dir":
+                shutil.rmtree(operation.target)
+            case "rename":
+                os.rename(operation.source, operation.target)
+            case "link":
+                os.link(operation.source, operation.target)
+
+def _sibling_directory(addon_directory: str, suffix: str) -> str:
+    addon_directory = os.path.normpath(addon_directory)
+    return os.path.join(os.path.dirname(addon_directory), os.path.basename(addon_directory) + suffix)
+
+def get_snapshot_directory(addon_directory: str) -> str:
+    return _sibling_directory(addon_directory, SNAPSHOT_DIRECTORY_SUFFIX)
+
+def list_snapshots(addon_directory: str) -> list[str]:
+    '''
+    Returns the paths of every deployment snapshot of addon_directory, newest first.
+    '''
+    snapshot_directory = get_snapshot_directory(addon_directory)
+    if not os.path.isdir(snapshot_directory):
+        return []
+    return [os.path.join(snapshot_directory, name) for name in sorted(os.listdir(snapshot_directory), reverse=True)]
+
+def _new_snapshot_path(addon_directory: str) -> str:
+    '''
+    Returns an unused snapshot path, named after the current time so that sorting the names sorts the snapshots from oldest to newest.
+    '''
+    snapshot_directory = get_snapshot_directory(addon_directory)
+    os.makedirs(snapshot_directory, exist_ok=True)
+    base_name = time.strftime("%Y%m%d-%H%M%S")
+    snapshot_number = 0
+    while os.path.exists(os.path.join(snapshot_directory, f"{base_name}-{snapshot_number:03d}")):
+        snapshot_number += 1
+    return os.path.join(snapshot_directory, f"{base_name}-{snapshot_number:03d}")
+
+def _clone_with_hard_links(source_directory: str, target_directory: str) -> int:
+    '''
+    Creates target_directory with a hard link to every file directly inside source_directory. Subfolders are not cloned, the game doesn't load them anyways.
+    Returns how many links were made.
+    '''
+    os.makedirs(target_directory)
+    if not os.path.isdir(source_directory):
+        return 0
+    link_count = 0
+    for name in os.listdir(source_directory):
+        path = os.path.join(source_directory, name)
+        if os.path.isfile(path):
+            os.link(path, os.path.join(target_directory, name))
+            link_count += 1
+    return link_count
+
+def _remove_directory(path: str) -> None:
+    try:
+        shutil.rmtree(path)
+    except OSError as e:
+        print("Error, could not remove folder " + path + ": " + str(e))
+
+def prune_snapshots(addon_directory: str, snapshot_count: int=DEPLOYMENT_SNAPSHOT_COUNT) -> None:
+    '''
+    Removes every snapshot except the newest snapshot_count ones.
+    '''
+    for snapshot_path in list_snapshots(addon_directory)[max(snapshot_count, 0):]:
+        _remove_directory(snapshot_path)
+
+def snapshot_pinned_size(addon_directory: str) -> tuple[int, int]:
+    '''
+    Returns the amount of files in the snapshots of addon_directory that have no link outside of the snapshots (their mod was deleted from the mod manager),
+    and their total size in bytes, which is the space that would be freed by removing every snapshot.
+    '''
+    links_in_snapshots: dict[tuple[int, int], int] = {} #(device, inode) -> links found in the snapshots
+    file_stats: dict[tuple[int, int], os.stat_result] = {}
+    for snapshot_path in list_snapshots(addon_directory):
+        try:
+            names = os.listdir(snapshot_path)
+        except OSError:
+            continue
+        for name in names:
+            try:
+                file_stat = os.stat(os.path.join(snapshot_path, name))
+            except OSError:
+                continue
+            identity = (file_stat.st_dev, file_stat.st_ino)
+            links_in_snapshots[identity] = links_in_snapshots.get(identity, 0) + 1
+            file_stats[identity] = file_stat
+    pinned_stats = [file_stats[identity] for identity, link_count in links_in_snapshots.items() if link_count >= file_stats[identity].st_nlink]
+    return len(pinned_stats), sum(file_stat.st_size for file_stat in pinned_stats)
+
+def _swap_in(new_directory: str, addon_directory: str, previous_directory: str) -> None:
+    '''
+    Moves the live addon folder to previous_directory and new_directory into its place. If the second rename fails, the first is undone so the game is never left
+    without its addon folder. Raises OSError (PermissionError if the game has a file open) if the swap could not be done.
+    '''
+    had_addon_directory = os.path.isdir(addon_directory)
+    if had_addon_directory:
+        os.rename(addon_directory, previous_directory)
+    try:
+        os.rename(new_directory, addon_directory)
+    except OSError:
+        if had_addon_directory:
+            os.rename(previous_directory, addon_directory)
+        raise
+
+def deploy_staged(addon_directory: str, source_paths: list[str], content_hashes: dict[str, str] | None=None,
+                  snapshot_count: int=DEPLOYMENT_SNAPSHOT_COUNT) -> DeploymentPlan:
+    '''
+    Deploys source_paths to addon_directory (see plan_deployment()) without ever leaving the game with a half written addon folder.
+    The current addon folder is cloned into a staging folder with hard links, the plan is applied to the staging folder, and then the staging folder is swapped in.
+    The replaced addon folder becomes the newest snapshot, and only the newest snapshot_count snapshots are kept (0 keeps none).
+    Returns the plan that was applied. Raises OSError (PermissionError if the game has the files open) if anything fails, in which case the live addon folder is untouched.
+    '''
+    staging_directory = _sibling_directory(addon_directory, STAGING_DIRECTORY_SUFFIX)
+    if os.path.exists(staging_directory): #left over from a deployment that was interrupted
+        shutil.rmtree(staging_directory)
+
+    try:
+        staging_links = _clone_with_hard_links(addon_directory, staging_directory)
+        plan = plan_deployment(staging_directory, source_paths, content_hashes)
+        plan.staging_links = staging_links
+        apply_deployment(plan)
+        snapshot_path = _new_snapshot_path(addon_directory)
+        _swap_in(staging_directory, addon_directory, snapshot_path)
+    except OSError:
+        _remove_directory(staging_directory)
+        raise
+
+    plan.addon_directory = addon_directory
+    prune_snapshots(addon_directory, snapshot_count)
+    return plan
+
+def rollback_deployment(addon_directory: str) -> str | None:
+    '''
+    Swaps the newest snapshot back in as the live addon folder, discarding the current one. This is only two renames, no matter how many mods there are.
+    Returns the path of the snapshot that was restored, or None if there are no snapshots.
+    Raises OSError (PermissionError if the game has the files open) if the swap could not be done, in which case nothing is changed.
+    '''
+    snapshots = list_snapshots(addon_directory)
+    if not snapshots:
+        return None
+    discarded_directory = _sibling_directory(addon_directory, DISCARDED_DIRECTORY_SUFFIX)
+    if os.path.exists(discarded_directory):
+        shutil.rmtree(discarded_directory)
+    _swap_in(snapshots[0], addon_directory, discarded_directory)
+    _remove_directory(discarded_directory)
+    return snapshots[0]
@@ -0,0 +1,154 @@
+from typing import Callable
+import rarfile
+import zipfile
+import shutil
+import os
+
+from mod_store import (INGEST_BUFFER_SIZE, compute_content_hash, copy_stream_with_hash)
+
+SUPPORTED_ARCHIVE_EXTENSIONS = (".zip", ".7z", ".rar")
+
+'''
+Archive backends for the mod manager. Every backend collects all the .vpk members of an archive first and then extracts them together,
+so a solid .7z stream is only decompressed once and a .rar archive only needs a single call to the unrar tool, no matter how many alternate .vpk files it holds.
+See benchmarks/benchmark_archive_extraction.py for a comparison against extracting the members one at a time.
+'''
+
+class ExtractedMod:
+    '''
+    A .vpk file that was written to disk by one of the backends below, along with its content hash (see mod_store.py).
+    member_name is the path of the .vpk inside its archive (or the original file path for raw .vpk files), and file_path is where it was written to.
+    '''
+    def __init__(self, member_name: str, file_path: str, file_size: int, content_hash: str) -> None:
+        self.member_name = member_name
+        self.file_path = file_path
+        self.file_size = file_size
+        self.content_hash = content_hash
+
+def _is_safe_member(member_name: str) -> bool:
+    '''
+    Returns False for archive members that would be written outside of the destination folder (absolute paths or paths containing '..').
+    '''
+    normalized_name = member_name.replace("\\", "/")
+    return not (os.path.isabs(member_name) or normalized_name.startswith("/") or ".." in normalized_name.split("/"))
+
+def _is_vpk_member(member_name: str) -> bool:
+    return os.path.splitext(member_name)[1].lower() == ".vpk" and _is_safe_member(member_name)
+
+def _member_file_path(destination: str, member_name: str) -> str:
+    '''
+    Returns the path that member_name gets extracted to under destination, with the separators of the current os.
+    '''
+    return os.path.normpath(os.path.join(destination, member_name))
+
+def list_vpk_members(archive_path: str) -> list[str]:
+    '''
+    Returns the names of every .vpk file inside the archive at archive_path, in the order they are stored.
+    Raises ValueError for unsupported file types. A .rar archive requires a working unrar tool (see rarfile.UNRAR_TOOL).
+    '''
+    _, file_extension = os.path.splitext(archive_path)
+    match file_extension.lower():
+        case ".zip":
+            with zipfile.ZipFile(archive_path, 'r') as zip_file:
+                return [info.filename for info in zip_file.infolist() if not info.is_dir() and _is_vpk_member(info.filename)]
+        case ".7z":
+            import py7zr #imported on first use, it is slow to import and most imports are .zip or .vpk files
+            with py7zr.SevenZipFile(archive_path, mode='r') as archive:
+                return [info.filename for info in archive.list() if not info.is_directory and _is_vpk_member(info.filename)]
+        case ".rar":
+            with rarfile.RarFile(archive_path) as archive:
+                return [info.filename for info in archive.infolist() if not info.is_dir() and _is_vpk_member(info.filename)]
+        case _:
+            raise ValueError("Unsupported archive type: " + archive_path)
+
+def _extract_zip_members(archive_path: str, member_names: list[str], destination: str, buffer_size: int,
+                         progress_callback: Callable[[str, int, int], None] | None) -> list[ExtractedMod]:
+    '''
+    Streams every member in member_names out of the .zip archive, hashing each one in the same pass (zip members can be read independently of each other).
+    '''
+    extracted_mods = []
+    with zipfile.ZipFile(archive_path, 'r') as zip_file:
+        for member_name in member_names:
+            info = zip_file.getinfo(member_name)
+            file_path = _member_file_path(destination, member_name)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with zip_file.open(info) as source_file:
+                file_size, content_hash = copy_stream_with_hash(source_file, file_path, buffer_size, info.file_size,
+                    (lambda copied, total, name=member_name: progress_callback(name, copied, total)) if progress_callback else None)
+            extracted_mods.append(ExtractedMod(member_name, file_path, file_size, content_hash))
+    return extracted_mods
+
+def _hash_extracted_members(member_names: list[str], destination: str,
+                            progress_callback: Callable[[str, int, int], None] | None) -> list[ExtractedMod]:
+    '''
+    Hashes the members that a .7z or .rar backend has already written under destination. Members that are missing after extraction are skipped.
+    '''
+    extracted_mods = []
+    for member_name in member_names:
+        file_path = _member_file_path(destination, member_name)
+        if not os.path.isfile(file_path):
+            print("Error, could not find extracted file: " + file_path)
+            continue
+        file_size, content_hash = compute_content_hash(file_path)
+        if progress_callback:
+            progress_callback(member_name, file_size, file_size)
+        extracted_mods.append(ExtractedMod(member_name, file_path, file_size, content_hash))
+    return extracted_mods
+
+def _extract_7z_members(archive_path: str, member_names: list[str], destination: str,
+                        progress_callback: Callable[[str, int, int], None] | None) -> list[ExtractedMod]:
+    '''
+    Extracts every member in member_names from the .7z archive in a single decompression pass.
+    '''
+    import py7zr
+    with py7zr.SevenZipFile(archive_path, mode='r') as archive:
+        archive.extract(path=destination, targets=member_names)
+    return _hash_extracted_members(member_names, destination, progress_callback)
+
+def _extract_rar_members(archive_path: str, member_names: list[str], destination: str,
+                         progress_callback: Callable[[str, int, int], None] | None) -> list[ExtractedMod]:
+    '''
+    Extracts every member in member_names from the .rar archive with a single call to the unrar tool.
+    '''
+    with rarfile.RarFile(archive_path) as archive:
+        archive.extractall(path=destination, members=member_names)
+    return _hash_extracted_members(member_names, destination, progress_callback)
+
+def extract_vpk_members(archive_path: str, destination: str, member_names: list[str] | None=None, buffer_size: int=INGEST_BUFFER_SIZE,
+                        progress_callback: Callable[[str, int, int], None] | None=None) -> list[ExtractedMod]:
+    '''
+    Extracts the .vpk files inside the archive at archive_path to destination, keeping their folder structure from within the archive.
+    If member_names is None, every .vpk in the archive is extracted (see list_vpk_members()). All members are extracted together in one pass.
+    progress_callback is called with the member name, the bytes written so far, and the member's total size.
+    Returns the extracted mods in the same order as member_names, with their content hashes.
+    Raises ValueError for unsupported file types, and the archive library's own exceptions for corrupted archives or a missing unrar tool.
+    '''
+    if member_names is None:
+        member_names = list_vpk_members(archive_path)
+    if not member_names:
+        return []
+    os.makedirs(destination, exist_ok=True)
+
+    _, file_extension = os.path.splitext(archive_path)
+    match file_extension.lower():
+        case ".zip":
+            return _extract_zip_members(archive_path, member_names, destination, buffer_size, progress_callback)
+        case ".7z":
+            return _extract_7z_members(archive_path, member_names, destination, progress_callback)
+        case ".rar":
+            return _extract_rar_members(archive_path, member_names, destination, progress_callback)
+        case _:
+            raise ValueError("Unsupported archive type: " + archive_path)
+
+def copy_vpk_file(vpk_path: str, target_path: str, buffer_size: int=INGEST_BUFFER_SIZE,
+                  progress_callback: Callable[[str, int, int], None] | None=None) -> ExtractedMod:
+    '''
+    Copies a raw .vpk file to target_path, hashing it in the same pass. The returned mod's member name is the original vpk_path.
+    '''
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    total_size = os.path.getsize(vpk_path)
+    with open(vpk_path, "rb") as source_file:
+        file_size, content_hash = copy_stream_with_hash(source_file, target_path, buffer_size, total_size,
+            (lambda copied, total: progress_callback(vpk_path, copied, total)) if progress_callback else None)
+    shutil.copymode(vpk_path, target_path)
+    return ExtractedMod(vpk_path, target_path, file_size, content_hash)
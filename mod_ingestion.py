@@ -0,0 +1,293 @@
+from PyQt5.QtCore import (QObject, QThread, pyqtSignal)
+
+from concurrent.futures import (ProcessPoolExecutor, ThreadPoolExecutor, as_completed)
+from typing import Callable
+import multiprocessing
+import threading
+import rarfile
+import os
+
+from constants import *
+from mod_extraction import (SUPPORTED_ARCHIVE_EXTENSIONS, ExtractedMod, copy_vpk_file, extract_vpk_members, list_vpk_members)
+from mod_store import INGEST_BUFFER_SIZE
+
+INGESTION_WORKER_COUNT = max(1, min(4, os.cpu_count() or 1)) #decompression and hashing release the GIL, so a few threads keep the disk and cpu busy
+INGESTION_PROCESS_COUNT = max(1, os.cpu_count() or 1) #used when several archives are imported at once, see IngestionWorker.run()
+
+'''
+The ingestion subsystem does all the slow parts of adding mods (opening archives, extracting, hashing and copying) away from the GUI thread.
+Each file added to the mod manager becomes an ImportJob, which a pool of worker threads turns into an ImportResult. The GUI thread only receives progress
+signals while this happens, and applies every result to the mod list in one batch once all the jobs submitted together are done (see ModManager._apply_import_results()).
+Duplicate detection against the mod list happens on the GUI thread during that batch, since the mod list and its content index belong to the GUI thread.
+
+When more than one archive is imported at once, the jobs are spread over a process pool instead, since decompression (LZMA for .7z, deflate for .zip) is cpu bound.
+The destination of every job is reserved before any of them start, and results are always returned in the order the jobs were given, so the mod list
+(and the names of manually added mods) come out the same no matter which archive finishes first.
+'''
+
+def is_supported_mod_file(file: str) -> bool:
+    '''
+    Returns True if file is a .vpk file or an archive type that the mod manager can extract .vpk files from.
+    '''
+    _, file_extension = os.path.splitext(file)
+    return file_extension == ".vpk" or file_extension in SUPPORTED_ARCHIVE_EXTENSIONS
+
+def get_mod_destination(file: str, gamebanana_item_type: str="", gamebanana_mod_number: int=0) -> str:
+    '''
+    Returns where the mods inside file are written to. For archives this is a folder (the .vpk files keep their folder structure from within the archive),
+    and for raw .vpk files it is the path of the copied file itself. Mods from gamebanana go to a folder that corresponds to both their item type and mod number,
+    while manually added mods receive a new anonymous name within VPK_DIRECTORY, because they are not officially part of the gamebanana library.
+    '''
+    _, file_extension = os.path.splitext(file)
+    match gamebanana_item_type:
+        case "Mod":
+            return os.path.join(MOD_DIRECTORY, str(gamebanana_mod_number), os.path.splitext(os.path.basename(file))[0])
+        case "Sound":
+            return os.path.join(SOUND_DIRECTORY, str(gamebanana_mod_number), os.path.splitext(os.path.basename(file))[0])
+
+    #must ensure a unique name for any manually added mods, the name is reserved immediately so that no other import (or worker) can take it
+    os.makedirs(VPK_DIRECTORY, exist_ok=True)
+    vpk_index = 0
+    while True:
+        file_path = os.path.join(VPK_DIRECTORY, "Unnamed_VPK_" + str(vpk_index))
+        if not (os.path.exists(file_path) or os.path.exists(file_path + ".vpk")):
+            try:
+                if file_extension == ".vpk":
+                    file_path += ".vpk"
+                    with open(file_path, "xb"):
+                        pass
+                else:
+                    os.mkdir(file_path)
+                return file_path
+            except FileExistsError:
+                pass
+        vpk_index += 1
+
+def remove_downloaded_files(file_paths: list[str]) -> None:
+    '''
+    Removes temporary downloaded files, and their parent directory once it is empty.
+    All downloaded files from the same download share the same parent directory.
+    '''
+    for file in file_paths:
+        try:
+            os.remove(file)
+        except:
+            print("Error, could not delete temporary file.")
+    if file_paths:
+        parent_directory = os.path.dirname(file_paths[0])
+        try:
+            if not os.listdir(parent_directory): #empty so now we clean up the folder
+                os.rmdir(parent_directory)
+        except:
+            print("Error, could not delete: Directory is not empty or invalid permissions.")
+
+class ImportJob:
+    '''
+    A single file (.vpk or archive) to be added to the mod list.
+    real_name, item_type and number are only set for mods downloaded from gamebanana, see ModManager.add_mod().
+    If remove_source_file is True, the file is deleted once its mods have been extracted (used for temporary downloads).
+    destination is set by reserve_destination() before the job runs.
+    '''
+    def __init__(self, file: str, from_gamebanana: bool, real_name: str="", item_type: str="", number: int=0, remove_source_file: bool=False) -> None:
+        self.file = file
+        self.from_gamebanana = from_gamebanana
+        self.real_name = real_name
+        self.item_type = item_type
+        self.number = number
+        self.remove_source_file = remove_source_file
+        self.destination = ""
+
+    def is_archive(self) -> bool:
+        return os.path.splitext(self.file)[1] in SUPPORTED_ARCHIVE_EXTENSIONS
+
+    def reserve_destination(self) -> None:
+        '''
+        Picks (and for manually added mods, reserves) where this job's mods are written to, see get_mod_destination().
+        '''
+        if not self.destination:
+            self.destination = get_mod_destination(self.file, self.item_type, self.number)
+
+class ImportResult:
+    '''
+    The outcome of an ImportJob. mods holds a (ExtractedMod, mod name, overwritten) tuple for every .vpk written to disk, where overwritten is True
+    if it replaced an older version of a gamebanana mod at the same path. error is empty unless the job failed.
+    '''
+    def __init__(self, job: ImportJob) -> None:
+        self.job = job
+        self.mods: list[tuple[ExtractedMod, str, bool]] = []
+        self.error = ""
+
+    @property
+    def overwrote_mods(self) -> bool:
+        return any(overwritten for _, _, overwritten in self.mods)
+
+def ingest_file(job: ImportJob, buffer_size: int=INGEST_BUFFER_SIZE, progress_callback: Callable[[str, int, int], None] | None=None) -> ImportResult:
+    '''
+    Writes every .vpk inside job.file (or job.file itself, if it is a raw .vpk) to its destination (see get_mod_destination()), hashing each one while it is written.
+    All the .vpk files inside an archive are extracted together in a single pass (see mod_extraction.py).
+    Does not touch the mod list, so this is safe to call from any thread or process. Never raises, errors are stored in the returned result instead.
+    '''
+    result = ImportResult(job)
+    try:
+        job.reserve_destination()
+        destination = job.destination
+        _, file_extension = os.path.splitext(job.file)
+
+        if file_extension == ".vpk":
+            overwritten_paths = {destination} if job.item_type and os.path.exists(destination) else set()
+            extracted_mods = [copy_vpk_file(job.file, destination, buffer_size, progress_callback)]
+            archive_file_name = "" #the mod name only shows the vpk's path
+        else:
+            member_names = list_vpk_members(job.file)
+            overwritten_paths = set()
+            if job.item_type: #note which older versions of the mod are being overwritten
+                overwritten_paths = {os.path.normpath(os.path.join(destination, name)) for name in member_names if os.path.exists(os.path.join(destination, name))}
+            extracted_mods = extract_vpk_members(job.file, destination, member_names, buffer_size, progress_callback)
+            archive_file_name = job.file
+            if not extracted_mods and not job.item_type:
+                try:
+                    os.rmdir(destination) #the reserved folder is still empty
+                except OSError:
+                    pass
+
+        for extracted_mod in extracted_mods:
+            #the name is a combination of the real_name given and the filename, this is because of multiple file versions
+            mod_name = job.real_name + " (" + os.path.join(os.path.basename(archive_file_name), extracted_mod.member_name) + ")"
+            result.mods.append((extracted_mod, mod_name, extracted_mod.file_path in overwritten_paths))
+    except Exception as e:
+        print("Error with adding mods from " + job.file + ": " + str(e))
+        result.error = str(e)
+
+    if job.remove_source_file:
+        remove_downloaded_files([job.file])
+    return result
+
+def _initialize_import_process(rar_tool_location: str) -> None:
+    '''
+    Runs once in every process of the process pool. Spawned processes don't share the mod manager's module state, so the configured rar tool is passed along here.
+    '''
+    rarfile.UNRAR_TOOL = rar_tool_location
+
+class IngestionWorker(QObject):
+    '''
+    Worker object that runs a batch of ImportJobs on a pool of threads, or a pool of processes if use_process_pool is True and the batch has more than one archive.
+    Bound to its own QThread by IngestionEngine, see IngestionEngine.submit().
+    Results are emitted in the same order as the jobs were given, no matter which job finishes first. Per-vpk progress is only emitted by the thread pool,
+    the process pool only reports finished files.
+    '''
+    progress = pyqtSignal(str, str, int, int) #file, vpk name, bytes written, total bytes of the vpk
+    file_finished = pyqtSignal(int, int) #jobs finished so far, total jobs in the batch
+    finished = pyqtSignal(list) #list of ImportResults
+
+    def __init__(self, jobs: list[ImportJob], buffer_size: int=INGEST_BUFFER_SIZE, use_process_pool: bool=True) -> None:
+        super().__init__()
+        self.jobs = jobs
+        self.buffer_size = buffer_size
+        self.use_process_pool = use_process_pool
+        self._finished_count = 0
+        self._finished_count_lock = threading.Lock()
+
+    def _job_finished(self) -> None:
+        with self._finished_count_lock:
+            self._finished_count += 1
+            self.file_finished.emit(self._finished_count, len(self.jobs))
+
+    def _run_job(self, job: ImportJob) -> ImportResult:
+        result = ingest_file(job, self.buffer_size, lambda vpk_name, copied, total: self.progress.emit(job.file, vpk_name, copied, total))
+        self._job_finished()
+        return result
+
+    def _run_jobs_in_processes(self) -> list[ImportResult]:
+        '''
+        Runs every job on a process pool sized to the cpu count. Processes are spawned rather than forked, since this process has Qt and worker threads running.
+        If a process fails (e.x. the pool breaks), that job is run again on this thread instead.
+        '''
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(INGESTION_PROCESS_COUNT, len(self.jobs)), mp_context=context,
+                                 initializer=_initialize_import_process, initargs=(rarfile.UNRAR_TOOL,)) as executor:
+            futures = [executor.submit(ingest_file, job, self.buffer_size) for job in self.jobs]
+            for _ in as_completed(futures):
+                self._job_finished()
+
+            results = []
+            for job, future in zip(self.jobs, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    print("Error with importing in a separate process, retrying: " + str(e))
+                    results.append(ingest_file(job, self.buffer_size))
+        return results
+
+    def run(self) -> None:
+        '''
+        This is what should occur when the thread is started.
+        '''
+        for job in self.jobs: #reserved in order, so that manually added mods are named in the same order they were selected
+            try:
+                job.reserve_destination()
+            except OSError as e:
+                print("Error, could not reserve a destination for " + job.file + ": " + str(e)) #ingest_file() will try again and report the error
+
+        if self.use_process_pool and sum(1 for job in self.jobs if job.is_archive()) > 1:
+            results = self._run_jobs_in_processes()
+        else:
+            with ThreadPoolExecutor(max_workers=min(INGESTION_WORKER_COUNT, len(self.jobs)) or 1) as executor:
+                results = list(executor.map(self._run_job, self.jobs))
+        self.finished.emit(results)
+
+class IngestionEngine(QObject):
+    '''
+    Owns the threads of every ongoing import, and forwards their signals to the GUI thread. Only interact with this from the GUI thread.
+    '''
+    progress = pyqtSignal(str, str, int, int) #see IngestionWorker
+    file_finished = pyqtSignal(int, int)
+    batch_finished = pyqtSignal(list) #list of ImportResults, in the order the jobs were submitted
+    idle = pyqtSignal() #emitted once every submitted batch has been applied
+
+    def __init__(self, buffer_size: int=INGEST_BUFFER_SIZE, use_process_pool: bool=True) -> None:
+        super().__init__()
+        self.buffer_size = buffer_size
+        self.use_process_pool = use_process_pool #parallel import of multiple archives, can be turned off with "parallel_import" in the settings
+        self.workers_and_threads = {} #these references are needed so that the workers and threads aren't garbage collected while running
+        self._next_batch_id = 0
+
+    def is_busy(self) -> bool:
+        return bool(self.workers_and_threads)
+
+    def submit(self, jobs: list[ImportJob]) -> None:
+        '''
+        Starts importing the jobs on a new worker thread. batch_finished is emitted with all of their results once every job is done.
+        '''
+        if not jobs:
+            return
+        batch_id = self._next_batch_id
+        self._next_batch_id += 1
+
+        thread = QThread()
+        worker = IngestionWorker(jobs, self.buffer_size, self.use_process_pool)
+        worker.moveToThread(thread)
+        self.workers_and_threads[batch_id] = (worker, thread)
+
+        thread.started.connect(worker.run)
+        worker.progress.connect(self.progress)
+        worker.file_finished.connect(self.file_finished)
+        worker.finished.connect(self.batch_finished)
+        worker.finished.connect(thread.quit)
+        worker.finished.connect(worker.deleteLater)
+        thread.finished.connect(lambda: self._cleanup_batch(batch_id))
+        thread.finished.connect(thread.deleteLater)
+        thread.start()
+
+    def _cleanup_batch(self, batch_id: int) -> None:
+        del self.workers_and_threads[batch_id]
+        if not self.workers_and_threads:
+            self.idle.emit()
+
+    def wait_for_all(self) -> None:
+        '''
+        Blocks until every ongoing import thread has stopped. Only call this when the application is closing.
+        The threads are told to quit directly, since the queued quit from their workers can't be delivered while the GUI thread is blocked here.
+        '''
+        for _, thread in list(self.workers_and_threads.values()):
+            thread.quit() #the thread exits as soon as its worker returns
+            thread.wait()
@@ -0,0 +1,239 @@
+from contextlib import contextmanager
+from typing import Iterator
+import sqlite3
+import time
+import os
+
+from constants import *
+
+MOD_LIBRARY_SCHEMA_VERSION = 1
+
+'''
+The mod library is the mod list as it is stored on disk, in an SQLite database at MOD_LIBRARY_PATH instead of the 'mods' array of the settings file.
+Every mod is a row with its own id, so toggling, renaming, removing or moving a mod only updates the rows involved (load order is indexed), rather than rewriting
+the whole list. Duplicate lookups by content hash and lookups by gamebanana item are indexed as well.
+
+Load orders are kept contiguous, starting from 0, so a mod's load order is also its row in the mod list.
+Mod lists saved by older versions in settings.json are moved into the library once, see migrate_mods().
+'''
+
+class ModRecord:
+    '''
+    A mod in the library. item_type and item_number are the gamebanana item the mod was downloaded from (empty and 0 for manually added mods),
+    and file_size and content_hash identify the contents of the .vpk (see mod_store.py). Timestamps are in seconds since the epoch.
+    '''
+    def __init__(self, mod_id: int, name: str, file_path: str, from_gamebanana: bool, item_type: str, item_number: int, file_size: int, content_hash: str,
+                 load_order: int, enabled: bool, added_at: float, updated_at: float) -> None:
+        self.mod_id = mod_id
+        self.name = name
+        self.file_path = file_path
+        self.from_gamebanana = from_gamebanana
+        self.item_type = item_type
+        self.item_number = item_number
+        self.file_size = file_size
+        self.content_hash = content_hash
+        self.load_order = load_order
+        self.enabled = enabled
+        self.added_at = added_at
+        self.updated_at = updated_at
+
+MOD_COLUMNS = "id, name, file_path, from_gamebanana, item_type, item_number, file_size, content_hash, load_order, enabled, added_at, updated_at"
+
+def _record_from_row(row: tuple) -> ModRecord:
+    mod_id, name, file_path, from_gamebanana, item_type, item_number, file_size, content_hash, load_order, enabled, added_at, updated_at = row
+    return ModRecord(mod_id, name, file_path, bool(from_gamebanana), item_type, item_number, file_size, content_hash, load_order, bool(enabled), added_at, updated_at)
+
+def gamebanana_item_from_path(file_path: str) -> tuple[str, int]:
+    '''
+    Returns the gamebanana item type and number of a mod from where it is stored (see mod_ingestion.get_mod_destination()), or ("", 0) if it wasn't downloaded from gamebanana.
+    Used for mods saved before the item was recorded.
+    '''
+    for item_type, directory in (("Mod", MOD_DIRECTORY), ("Sound", SOUND_DIRECTORY)):
+        try:
+            relative_path = os.path.relpath(os.path.abspath(file_path), os.path.abspath(directory))
+        except ValueError: #on a different drive
+            continue
+        first_folder = relative_path.split(os.sep)[0]
+        if not relative_path.startswith("..") and first_folder.isdigit():
+            return item_type, int(first_folder)
+    return "", 0
+
+class ModLibrary:
+    '''
+    The SQLite database holding the mod list. Every method that changes the library commits right away, unless it is called within batch().
+    Methods that change the library return False (or None) and print the error if the database couldn't be written.
+    '''
+    def __init__(self, database_path: str=MOD_LIBRARY_PATH) -> None:
+        self.database_path = database_path
+        self.batch_depth = 0
+        self.connection = sqlite3.connect(database_path)
+        self.connection.execute("PRAGMA journal_mode=WAL") #a commit is an append to the log instead of a rewrite of the database
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version >= MOD_LIBRARY_SCHEMA_VERSION:
+            return
+        with self.connection:
+            self.connection.execute('''
+                CREATE TABLE IF NOT EXISTS mods (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    file_path TEXT NOT NULL UNIQUE,
+                    from_gamebanana INTEGER NOT NULL DEFAULT 0,
+                    item_type TEXT NOT NULL DEFAULT '',
+                    item_number INTEGER NOT NULL DEFAULT 0,
+                    file_size INTEGER NOT NULL DEFAULT 0,
+                    content_hash TEXT NOT NULL DEFAULT '',
+                    load_order INTEGER NOT NULL,
+                    enabled INTEGER NOT NULL DEFAULT 0,
+                    added_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )''')
+            self.connection.execute("CREATE INDEX IF NOT EXISTS mods_by_load_order ON mods (load_order)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS mods_by_content ON mods (file_size, content_hash)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS mods_by_item ON mods (item_type, item_number)")
+            self.connection.execute(f"PRAGMA user_version={MOD_LIBRARY_SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def _commit(self) -> None:
+        if self.batch_depth == 0:
+            self.connection.commit()
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        '''
+        Groups every change made within the with block into a single transaction, e.x. when adding many mods at once.
+        The changes are rolled back if an exception leaves the block.
+        '''
+        self.batch_depth += 1
+        try:
+            yield
+        except:
+            self.batch_depth -= 1
+            if self.batch_depth == 0:
+                self.connection.rollback()
+            raise
+        self.batch_depth -= 1
+        self._commit()
+
+    def count(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM mods").fetchone()[0]
+
+    def list_mods(self) -> list[ModRecord]:
+        '''
+        Returns every mod in the library in load order.
+        '''
+        return [_record_from_row(row) for row in self.connection.execute(f"SELECT {MOD_COLUMNS} FROM mods ORDER BY load_order")]
+
+    def get_mod(self, mod_id: int) -> ModRecord | None:
+        row = self.connection.execute(f"SELECT {MOD_COLUMNS} FROM mods WHERE id = ?", (mod_id,)).fetchone()
+        return _record_from_row(row) if row else None
+
+    def find_by_content(self, file_size: int, content_hash: str) -> ModRecord | None:
+        '''
+        Returns the first mod (in load order) with the given size and content hash, or None if there isn't one.
+        '''
+        row = self.connection.execute(f"SELECT {MOD_COLUMNS} FROM mods WHERE file_size = ? AND content_hash = ? ORDER BY load_order LIMIT 1",
+                                      (file_size, content_hash)).fetchone()
+        return _record_from_row(row) if row else None
+
+    def add_mod(self, name: str, file_path: str, from_gamebanana: bool=False, item_type: str="", item_number: int=0, file_size: int=0, content_hash: str="",
+                enabled: bool=True) -> int | None:
+        '''
+        Adds a mod to the end of the load order. Returns the id of the new mod, or None if it couldn't be added (e.x. a mod with the same file path already exists).
+        '''
+        now = time.time()
+        try:
+            cursor = self.connection.execute(
+                "INSERT INTO mods (name, file_path, from_gamebanana, item_type, item_number, file_size, content_hash, load_order, enabled, added_at, updated_at) "\
+                "VALUES (?, ?, ?, ?, ?, ?, ?, (SELECT COUNT(*) FROM mods), ?, ?, ?)",
+                (name, file_path, int(from_gamebanana), item_type, item_number, file_size, content_hash, int(enabled), now, now))
+            self._commit()
+            return cursor.lastrowid
+        except sqlite3.Error as e:
+            print("Error with adding mod to the library: " + str(e))
+            return None
+
+    def _update(self, mod_id: int, assignments: str, parameters: tuple) -> bool:
+        try:
+            cursor = self.connection.execute(f"UPDATE mods SET {assignments}, updated_at = ? WHERE id = ?", parameters + (time.time(), mod_id))
+            self._commit()
+            return cursor.rowcount == 1
+        except sqlite3.Error as e:
+            print("Error with updating the mod library: " + str(e))
+            return False
+
+    def set_enabled(self, mod_id: int, enabled: bool) -> bool:
+        return self._update(mod_id, "enabled = ?", (int(enabled),))
+
+    def rename_mod(self, mod_id: int, name: str) -> bool:
+        return self._update(mod_id, "name = ?", (name,))
+
+    def set_content_hash(self, mod_id: int, file_size: int, content_hash: str) -> bool:
+        return self._update(mod_id, "file_size = ?, content_hash = ?", (file_size, content_hash))
+
+    def remove_mod(self, mod_id: int) -> bool:
+        '''
+        Removes a mod from the library, and moves every mod after it up by one in the load order.
+        '''
+        try:
+            row = self.connection.execute("SELECT load_order FROM mods WHERE id = ?", (mod_id,)).fetchone()
+            if not row:
+                return False
+            self.connection.execute("DELETE FROM mods WHERE id = ?", (mod_id,))
+            self.connection.execute("UPDATE mods SET load_order = load_order - 1 WHERE load_order > ?", (row[0],))
+            self._commit()
+            return True
+        except sqlite3.Error as e:
+            print("Error with removing mod from the library: " + str(e))
+            return False
+
+    def move_mod(self, mod_id: int, new_load_order: int) -> bool:
+        '''
+        Moves a mod to new_load_order (its new row in the mod list), shifting only the mods between its old and new place.
+        '''
+        try:
+            row = self.connection.execute("SELECT load_order FROM mods WHERE id = ?", (mod_id,)).fetchone()
+            if not row:
+                return False
+            old_load_order = row[0]
+            new_load_order = max(0, min(new_load_order, self.count() - 1))
+            if new_load_order == old_load_order:
+                return True
+            if new_load_order > old_load_order:
+                self.connection.execute("UPDATE mods SET load_order = load_order - 1 WHERE load_order > ? AND load_order <= ?", (old_load_order, new_load_order))
+            else:
+                self.connection.execute("UPDATE mods SET load_order = load_order + 1 WHERE load_order >= ? AND load_order < ?", (new_load_order, old_load_order))
+            self.connection.execute("UPDATE mods SET load_order = ?, updated_at = ? WHERE id = ?", (new_load_order, time.time(), mod_id))
+            self._commit()
+            return True
+        except sqlite3.Error as e:
+            print("Error with moving mod in the library: " + str(e))
+            return False
+
+    def migrate_mods(self, mods: list[dict]) -> int:
+        '''
+        Adds mods in the format of the old 'mods' array of the settings file (name, file_path, toggled_on, from_gamebanana and optionally file_size and content_hash)
+        to the library in a single transaction, keeping their order. Mods whose file path is already in the library are skipped.
+        Returns the number of mods added, or -1 if the migration failed (in which case nothing is added).
+        '''
+        now = time.time()
+        try:
+            with self.connection:
+                added_count = 0
+                for mod in mods:
+                    item_type, item_number = gamebanana_item_from_path(mod["file_path"]) if mod.get("from_gamebanana") else ("", 0)
+                    cursor = self.connection.execute(
+                        "INSERT OR IGNORE INTO mods (name, file_path, from_gamebanana, item_type, item_number, file_size, content_hash, load_order, enabled, added_at, updated_at) "\
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, (SELECT COUNT(*) FROM mods), ?, ?, ?)",
+                        (mod["name"], mod["file_path"], int(bool(mod.get("from_gamebanana"))), item_type, item_number, mod.get("file_size", 0),
+                         mod.get("content_hash", ""), int(bool(mod.get("toggled_on"))), now, now))
+                    added_count += cursor.rowcount
+            return added_count
+        except (sqlite3.Error, KeyError) as e:
+            print("Error with migrating mods to the library: " + str(e))
+            return -1
@@ -0,0 +1,343 @@
+from PyQt5.QtWidgets import (QListView, QStyledItemDelegate, QStyleOptionViewItem, QStyle, QLineEdit, QAbstractItemView, QApplication, QWidget)
+from PyQt5.QtGui import (QPainter, QColor, QPalette, QFont)
+from PyQt5.QtCore import (Qt, QAbstractListModel, QModelIndex, QRect, QSize, QEvent, QAbstractItemModel, pyqtSignal)
+
+from typing import Any
+import os
+
+from mod_library import (ModLibrary, ModRecord)
+
+DEADLOCK_LIGHT_COLOUR = "#EEDFBF"
+DEADLOCK_DARK_COLOUR = "#0D0D0D"
+HIGHLIGHT_COLOUR = "#806A3F"
+
+MOD_LIST_ROW_HEIGHT = 40
+MOD_LIST_BUTTON_SIZE = 20
+MOD_LIST_TOGGLE_SIZE = 18
+MOD_LIST_SPACING = 6
+MOD_LIST_LAYOUT_BATCH_SIZE = 200
+
+#extra data roles of ModListModel, on top of the display (numbered name), edit (name) and check state (enabled) roles
+MOD_ID_ROLE = Qt.UserRole
+FILE_PATH_ROLE = Qt.UserRole + 1
+FROM_GAMEBANANA_ROLE = Qt.UserRole + 2
+HIGHLIGHT_ROLE = Qt.UserRole + 3 #(start, length) of the parts of the display text that match the search, see mod_search_index.py
+
+'''
+The mod list is a model/view list instead of a QListWidget with a QWidget per row. ModListModel holds the mods (as ModRecords, see mod_library.py) in load order
+and writes every change to the mod library, ModListDelegate paints each row (name, gamebanana logo, rename button, toggle and remove button) and handles clicks on it,
+and ModListView shows only the rows that are visible. No widgets are created per mod, so the cost of the list doesn't grow with the number of mods
+(except for the inline editor that exists while a mod is being renamed).
+
+A mod's row in the model is its load order, and the numbers in front of the names are derived from the rows when they are painted.
+'''
+
+class ModListModel(QAbstractListModel):
+    '''
+    The mods in the mod list, in load order. Toggling, renaming and moving (drag and drop) mods through the model saves the change to mod_library right away.
+    '''
+    def __init__(self, mod_library: ModLibrary, parent: QWidget | None=None) -> None:
+        super().__init__(parent)
+        self.mod_library = mod_library
+        self.mods: list[ModRecord] = []
+
+    def rowCount(self, parent: QModelIndex=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.mods)
+
+    def data(self, index: QModelIndex, role: int=Qt.DisplayRole) -> Any:
+        if not index.isValid() or not 0 <= index.row() < len(self.mods):
+            return None
+        mod = self.mods[index.row()]
+        match role:
+            case Qt.DisplayRole:
+                return f"{index.row() + 1}. {mod.name}"
+            case Qt.EditRole:
+                return mod.name
+            case Qt.CheckStateRole:
+                return Qt.Checked if mod.enabled else Qt.Unchecked
+            case Qt.ToolTipRole:
+                return mod.file_path
+            case _ if role == MOD_ID_ROLE:
+                return mod.mod_id
+            case _ if role == FILE_PATH_ROLE:
+                return mod.file_path
+            case _ if role == FROM_GAMEBANANA_ROLE:
+                return mod.from_gamebanana
+        return None
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlags:
+        if not index.isValid():
+            return Qt.ItemIsDropEnabled #mods can only be dropped between other mods, never onto them
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsEditable | Qt.ItemIsUserCheckable | Qt.ItemIsDragEnabled
+
+    def setData(self, index: QModelIndex, value: Any, role: int=Qt.EditRole) -> bool:
+        '''
+        Renames (Qt.EditRole) or toggles (Qt.CheckStateRole) the mod at index, and saves the change to the mod library.
+        '''
+        if not index.isValid():
+            return False
+        mod = self.mods[index.row()]
+        if role == Qt.EditRole:
+            name = str(value).strip()
+            if not name or not self.mod_library.rename_mod(mod.mod_id, name):
+                return False
+            mod.name = name
+        elif role == Qt.CheckStateRole:
+            enabled = value == Qt.Checked
+            if not self.mod_library.set_enabled(mod.mod_id, enabled):
+                return False
+            mod.enabled = enabled
+        else:
+            return False
+        self.dataChanged.emit(index, index, [role, Qt.DisplayRole])
+        return True
+
+    def supportedDropActions(self) -> Qt.DropActions:
+        return Qt.MoveAction
+
+    def moveRows(self, source_parent: QModelIndex, source_row: int, count: int, destination_parent: QModelIndex, destination_child: int) -> bool:
+        '''
+        Moves a single mod so that it ends up before destination_child (as counted before the move), and saves its new load order to the mod library.
+        QListView calls this for internal drag and drop moves.
+        '''
+        if count != 1 or source_parent.isValid() or destination_parent.isValid() or not 0 <= source_row < len(self.mods):
+            return False
+        destination_child = max(0, min(destination_child, len(self.mods)))
+        if destination_child in (source_row, source_row + 1): #dropped onto its own place
+            return False
+        new_row = destination_child if destination_child < source_row else destination_child - 1
+        if not self.mod_library.move_mod(self.mods[source_row].mod_id, new_row):
+            return False
+
+        self.beginMoveRows(QModelIndex(), source_row, source_row, QModelIndex(), destination_child)
+        self.mods.insert(new_row, self.mods.pop(source_row))
+        self.endMoveRows()
+        self._renumber(min(source_row, new_row), max(source_row, new_row))
+        return True
+
+    def _renumber(self, first_row: int, last_row: int) -> None:
+        '''
+        Repaints the numbers in front of the names of the rows between first_row and last_row, after their load order changed.
+        '''
+        last_row = min(last_row, len(self.mods) - 1)
+        if first_row <= last_row:
+            self.dataChanged.emit(self.index(first_row), self.index(last_row), [Qt.DisplayRole])
+
+    def set_mods(self, mods: list[ModRecord]) -> None:
+        '''
+        Replaces every mod in the model with mods (in load order). Doesn't change the mod library.
+        '''
+        self.beginResetModel()
+        self.mods = list(mods)
+        self.endResetModel()
+
+    def append_mods(self, mods: list[ModRecord]) -> None:
+        '''
+        Adds mods (already in the mod library) to the end of the model, e.x. to fill the list a batch at a time at startup. Doesn't change the mod library.
+        '''
+        if not mods:
+            return
+        row = len(self.mods)
+        self.beginInsertRows(QModelIndex(), row, row + len(mods) - 1)
+        self.mods.extend(mods)
+        self.endInsertRows()
+
+    def mod_at(self, row: int) -> ModRecord:
+        return self.mods[row]
+
+    def find_row(self, file_path: str) -> int:
+        '''
+        Returns the row of the mod located at file_path, or -1 if no mod in the list has that path.
+        '''
+        file_path = os.path.normcase(os.path.abspath(file_path))
+        for row, mod in enumerate(self.mods):
+            if os.path.normcase(os.path.abspath(mod.file_path)) == file_path:
+                return row
+        return -1
+
+    def row_of(self, mod_id: int) -> int:
+        '''
+        Returns the row of the mod with the id mod_id, or -1 if it isn't in the list.
+        '''
+        return next((row for row, mod in enumerate(self.mods) if mod.mod_id == mod_id), -1)
+
+    def add_mod(self, name: str, file_path: str, from_gamebanana: bool=False, item_type: str="", item_number: int=0, file_size: int=0, content_hash: str="") -> int:
+        '''
+        Adds an enabled mod to the end of the list and the mod library. Returns its row, or -1 if the mod library couldn't add it.
+        '''
+        mod_id = self.mod_library.add_mod(name, file_path, from_gamebanana, item_type, item_number, file_size, content_hash)
+        mod = self.mod_library.get_mod(mod_id) if mod_id is not None else None
+        if mod is None:
+            return -1
+        row = len(self.mods)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.mods.append(mod)
+        self.endInsertRows()
+        return row
+
+    def remove_row(self, row: int) -> ModRecord | None:
+        '''
+        Removes the mod at row from the list and the mod library. Returns the removed mod, or None if it couldn't be removed. Doesn't delete the mod's files.
+        '''
+        if not 0 <= row < len(self.mods) or not self.mod_library.remove_mod(self.mods[row].mod_id):
+            return None
+        self.beginRemoveRows(QModelIndex(), row, row)
+        mod = self.mods.pop(row)
+        self.endRemoveRows()
+        self._renumber(row, len(self.mods) - 1)
+        return mod
+
+    def set_content_hash(self, row: int, file_size: int, content_hash: str) -> bool:
+        '''
+        Updates the stored size and hash of the mod at row (in the mod library as well), call this when the mod's .vpk file is overwritten.
+        '''
+        mod = self.mods[row]
+        if not self.mod_library.set_content_hash(mod.mod_id, file_size, content_hash):
+            return False
+        mod.file_size = file_size
+        mod.content_hash = content_hash
+        return True
+
+class ModListDelegate(QStyledItemDelegate):
+    '''
+    Paints the rows of the mod list and turns clicks on their buttons into actions. From left to right a row shows the numbered name (and the gamebanana logo),
+    then on the right the rename button, the toggle and the remove button. Renaming uses an inline QLineEdit. Removing is only requested through remove_requested,
+    since it needs to be confirmed by the user and deletes files (see ModManager.confirm_mod_deletion()).
+    '''
+    rename_requested = pyqtSignal(QModelIndex)
+    remove_requested = pyqtSignal(QModelIndex)
+
+    def _control_rects(self, rect: QRect) -> tuple[QRect, QRect, QRect, QRect]:
+        '''
+        Returns the areas of the name, rename button, toggle and remove button within the row at rect.
+        '''
+        center_y = rect.center().y()
+        remove_rect = QRect(rect.right() - MOD_LIST_SPACING - MOD_LIST_BUTTON_SIZE, center_y - MOD_LIST_BUTTON_SIZE // 2, MOD_LIST_BUTTON_SIZE, MOD_LIST_BUTTON_SIZE)
+        toggle_rect = QRect(remove_rect.left() - MOD_LIST_SPACING - MOD_LIST_TOGGLE_SIZE, center_y - MOD_LIST_TOGGLE_SIZE // 2, MOD_LIST_TOGGLE_SIZE, MOD_LIST_TOGGLE_SIZE)
+        rename_rect = QRect(toggle_rect.left() - MOD_LIST_SPACING - MOD_LIST_BUTTON_SIZE, center_y - MOD_LIST_BUTTON_SIZE // 2, MOD_LIST_BUTTON_SIZE, MOD_LIST_BUTTON_SIZE)
+        name_rect = QRect(rect.left() + MOD_LIST_SPACING, rect.top(), max(0, rename_rect.left() - MOD_LIST_SPACING * 2 - rect.left()), rect.height())
+        return name_rect, rename_rect, toggle_rect, remove_rect
+
+    def paint(self, painter: QPainter, option: QStyleOptionViewItem, index: QModelIndex) -> None:
+        painter.save()
+        style = option.widget.style() if option.widget else QApplication.style()
+        panel_option = QStyleOptionViewItem(option)
+        self.initStyleOption(panel_option, index)
+        style.drawPrimitive(QStyle.PE_PanelItemViewItem, panel_option, painter, option.widget) #background and selection highlight
+
+        name_rect, rename_rect, toggle_rect, remove_rect = self._control_rects(option.rect)
+        selected = bool(option.state & QStyle.State_Selected)
+        painter.setFont(option.font)
+        painter.setPen(option.palette.color(QPalette.HighlightedText if selected else QPalette.Text))
+        metrics = option.fontMetrics
+        logo = " 🍌" if index.data(FROM_GAMEBANANA_ROLE) else ""
+        text = metrics.elidedText(index.data(Qt.DisplayRole), Qt.ElideRight, max(0, name_rect.width() - metrics.horizontalAdvance(logo)))
+
+        highlights = index.data(HIGHLIGHT_ROLE)
+        if highlights: #mark the parts of the name that match the search, behind the text
+            painter.save()
+            painter.setClipRect(name_rect)
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(QColor(HIGHLIGHT_COLOUR))
+            text_top = name_rect.center().y() - metrics.height() // 2
+            for start, length in highlights:
+                x = name_rect.left() + metrics.horizontalAdvance(text[:start])
+                painter.drawRect(x, text_top, metrics.horizontalAdvance(text[start:start + length]), metrics.height())
+            painter.restore()
+        painter.drawText(name_rect, Qt.AlignVCenter | Qt.AlignLeft, text + logo)
+
+        painter.setRenderHint(QPainter.Antialiasing, False)
+        button_font = QFont(option.font)
+        button_font.setPixelSize(12)
+        painter.setFont(button_font)
+
+        painter.setPen(QColor(DEADLOCK_LIGHT_COLOUR))
+        painter.setBrush(QColor(DEADLOCK_DARK_COLOUR))
+        painter.drawRect(rename_rect.adjusted(0, 0, -1, -1))
+        painter.drawText(rename_rect, Qt.AlignCenter, "✍️")
+
+        painter.setBrush(QColor("green") if index.data(Qt.CheckStateRole) == Qt.Checked else QColor("red"))
+        painter.drawRect(toggle_rect.adjusted(0, 0, -1, -1))
+
+        painter.setPen(QColor("grey"))
+        painter.setBrush(QColor(DEADLOCK_LIGHT_COLOUR))
+        painter.drawRect(remove_rect.adjusted(0, 0, -1, -1))
+        painter.setPen(QColor(DEADLOCK_DARK_COLOUR))
+        painter.drawText(remove_rect, Qt.AlignCenter, "X")
+        painter.restore()
+
+    def sizeHint(self, option: QStyleOptionViewItem, index: QModelIndex) -> QSize:
+        return QSize(option.rect.width(), MOD_LIST_ROW_HEIGHT)
+
+    def editorEvent(self, event: QEvent, model: QAbstractItemModel, option: QStyleOptionViewItem, index: QModelIndex) -> bool:
+        '''
+        Handles clicks on the buttons of a row (the rest of the row is left to the view, for selecting and dragging), and toggles the mod with the space key.
+        '''
+        if event.type() == QEvent.KeyPress and event.key() == Qt.Key_Space:
+            return model.setData(index, Qt.Unchecked if index.data(Qt.CheckStateRole) == Qt.Checked else Qt.Checked, Qt.CheckStateRole)
+        if event.type() not in (QEvent.MouseButtonPress, QEvent.MouseButtonRelease, QEvent.MouseButtonDblClick) or event.button() != Qt.LeftButton:
+            return False
+
+        _, rename_rect, toggle_rect, remove_rect = self._control_rects(option.rect)
+        position = event.pos()
+        if not any(rect.contains(position) for rect in (rename_rect, toggle_rect, remove_rect)):
+            return False
+        if event.type() == QEvent.MouseButtonRelease: #presses on the buttons are swallowed so they don't start a drag
+            if toggle_rect.contains(position):
+                model.setData(index, Qt.Unchecked if index.data(Qt.CheckStateRole) == Qt.Checked else Qt.Checked, Qt.CheckStateRole)
+            elif rename_rect.contains(position):
+                self.rename_requested.emit(index)
+            else:
+                self.remove_requested.emit(index)
+        return True
+
+    def createEditor(self, parent: QWidget, option: QStyleOptionViewItem, index: QModelIndex) -> QWidget:
+        line_edit = QLineEdit(parent)
+        line_edit.setPlaceholderText("Mod name...")
+        return line_edit
+
+    def setEditorData(self, editor: QLineEdit, index: QModelIndex) -> None:
+        editor.setText(index.data(Qt.EditRole))
+
+    def setModelData(self, editor: QLineEdit, model: QAbstractItemModel, index: QModelIndex) -> None:
+        if editor.text(): #empty names are ignored, the mod keeps its old name
+            model.setData(index, editor.text(), Qt.EditRole)
+
+    def updateEditorGeometry(self, editor: QWidget, option: QStyleOptionViewItem, index: QModelIndex) -> None:
+        name_rect, _, _, _ = self._control_rects(option.rect)
+        editor.setGeometry(name_rect.adjusted(0, MOD_LIST_SPACING, 0, -MOD_LIST_SPACING))
+
+class ModListView(QListView):
+    '''
+    The mod list. Mods can be dragged and dropped to change the load order, toggled with their toggle (or the space key), and renamed with their rename button (or F2).
+    Connect delegate.remove_requested to handle the remove buttons. While the mod list is being searched, the view shows the search results instead (see show_search_results()).
+    '''
+    def __init__(self, model: ModListModel, parent: QWidget | None=None) -> None:
+        super().__init__(parent)
+        self.setObjectName("modlist")
+        self.setModel(model)
+        self.delegate = ModListDelegate(self)
+        self.setItemDelegate(self.delegate)
+        self.delegate.rename_requested.connect(self.edit)
+
+        self.setUniformItemSizes(True) #every row has the same height, so the view never has to measure rows that aren't visible
+        self.setLayoutMode(QListView.Batched) #lay out large lists a batch at a time between events, so filtering or loading them never blocks a whole frame
+        self.setBatchSize(MOD_LIST_LAYOUT_BATCH_SIZE)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.setDragDropMode(QAbstractItemView.InternalMove)
+        self.setDefaultDropAction(Qt.MoveAction)
+        self.setEditTriggers(QAbstractItemView.EditKeyPressed)
+        self.mod_list_model = model
+
+    def show_search_results(self, search_model: QAbstractItemModel | None) -> None:
+        '''
+        Shows search_model (the mods matching a search) instead of the full mod list, or the full mod list again if search_model is None.
+        Drag and drop is only enabled for the full mod list, since search results aren't in load order.
+        '''
+        model = search_model if search_model is not None else self.mod_list_model
+        if self.model() is model:
+            return
+        old_selection_model = self.selectionModel()
+        self.setModel(model)
+        old_selection_model.deleteLater() #setModel() creates a new selection model, but doesn't delete the old one
+        self.setDragDropMode(QAbstractItemView.InternalMove if search_model is None else QAbstractItemView.NoDragDrop)
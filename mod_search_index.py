@@ -0,0 +1,339 @@
+from PyQt5.QtCore import (Qt, QAbstractListModel, QModelIndex, QObject, QTimer)
+
+from typing import Any, Iterable
+import time
+import os
+
+from constants import *
+from mod_library import ModRecord
+from mod_list_model import (ModListModel, HIGHLIGHT_ROLE)
+
+NGRAM_SIZE = 3
+SEARCH_TIME_BUDGET = 0.010 #seconds ModSearchModel scores mods for before letting the event loop run, so typing and painting keep up (a frame is ~16 ms)
+SEARCH_CHUNK_SIZE = 500 #mods scored between checks of the time budget
+
+#how much a match in each field counts towards the rank of a mod, and how much each kind of match counts within a field
+NAME_FIELD_WEIGHT = 3
+SOURCE_FIELD_WEIGHT = 2
+GAMEBANANA_ID_FIELD_WEIGHT = 1
+EXACT_MATCH_SCORE = 100
+PREFIX_MATCH_SCORE = 60
+WORD_MATCH_SCORE = 40
+SUBSTRING_MATCH_SCORE = 20
+
+#the folders mods are imported into, with a trailing separator so that a mod's path can be matched against them with a string comparison
+SOURCE_DIRECTORY_PREFIXES = [os.path.normcase(os.path.join(os.path.abspath(directory), "")) for directory in (MOD_DIRECTORY, SOUND_DIRECTORY, VPK_DIRECTORY)]
+
+'''
+Filter-as-you-type search for the mod list. ModSearchIndex keeps every mod's searchable text (its name, the archive it came from and its gamebanana id)
+in a trigram index: a search term of 3 or more characters only has to look at the mods that contain every trigram of the term, instead of the whole mod list.
+Shorter terms match too many mods for an index to help, so they are checked against every mod directly (which is still fast, since the text is kept lowercased in memory).
+Queries with several words only match mods that contain every word, and mods are ranked by where and how well each word matched (see the scores above).
+
+ModSearchModel shows the results of the current query on top of the mod list model, keeps the index up to date as mods are added, renamed, moved or deleted,
+and tells the delegate which parts of each name matched so they can be highlighted. A query that has to score many mods (e.x. the first letter typed in a large library)
+is scored SEARCH_TIME_BUDGET seconds at a time between events, and the previous results stay shown until it is done. Typing again drops a search that isn't done.
+See benchmarks/benchmark_search_filter.py for how long each keystroke takes on a large library.
+'''
+
+def mod_source_name(file_path: str) -> str:
+    '''
+    Returns the path of a mod's .vpk within the archive (or file) it was imported from, based on where the mod manager stores it.
+    e.x. 'archive/sub/mod.vpk' for '.../GameBanana/Mods/1234/archive/sub/mod.vpk'.
+    '''
+    file_path = os.path.abspath(file_path)
+    comparable_path = os.path.normcase(file_path)
+    for directory in SOURCE_DIRECTORY_PREFIXES:
+        if comparable_path.startswith(directory):
+            parts = file_path[len(directory):].split(os.sep)
+            return "/".join(parts[1:] if len(parts) > 1 else parts) #the first folder is the gamebanana number or the anonymous import folder
+    return os.path.basename(file_path)
+
+def _ngrams(text: str) -> set[str]:
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+def _field_score(field: str, term: str) -> int:
+    '''
+    Returns how well term matches field (both lowercase), or 0 if field doesn't contain term.
+    '''
+    position = field.find(term)
+    if position < 0:
+        return 0
+    if field == term:
+        return EXACT_MATCH_SCORE
+    if position == 0:
+        return PREFIX_MATCH_SCORE
+    while position > 0: #look for an occurrence at the start of a word
+        if not field[position - 1].isalnum():
+            return WORD_MATCH_SCORE
+        position = field.find(term, position + 1)
+    return SUBSTRING_MATCH_SCORE
+
+def find_match_spans(text: str, query: str) -> list[tuple[int, int]]:
+    '''
+    Returns the (start, length) of every case-insensitive occurrence of each word of query in text, for highlighting.
+    '''
+    text = text.lower()
+    spans = []
+    for term in set(query.lower().split()):
+        position = text.find(term)
+        while position >= 0:
+            spans.append((position, len(term)))
+            position = text.find(term, position + len(term))
+    return sorted(spans)
+
+class ModSearchIndex:
+    '''
+    Trigram index over the name, source archive and gamebanana id of every mod, keyed by mod id. Update it whenever a mod is added, renamed or removed.
+    '''
+    def __init__(self) -> None:
+        self.fields: dict[int, tuple[str, str, str]] = {}
+        self.postings: dict[str, set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.fields)
+
+    def clear(self) -> None:
+        self.fields.clear()
+        self.postings.clear()
+
+    def add(self, mod_id: int, name: str, source: str="", gamebanana_id: str="") -> None:
+        '''
+        Adds a mod to the index, replacing its old entry if it was already indexed.
+        '''
+        self.remove(mod_id)
+        fields = (name.lower(), source.lower(), gamebanana_id.lower())
+        self.fields[mod_id] = fields
+        for ngram in _ngrams(fields[0]) | _ngrams(fields[1]) | _ngrams(fields[2]):
+            self.postings.setdefault(ngram, set()).add(mod_id)
+
+    def add_mod(self, mod: ModRecord) -> None:
+        self.add(mod.mod_id, mod.name, mod_source_name(mod.file_path), str(mod.item_number) if mod.item_number else "")
+
+    def remove(self, mod_id: int) -> None:
+        fields = self.fields.pop(mod_id, None)
+        if fields is None:
+            return
+        for ngram in _ngrams(fields[0]) | _ngrams(fields[1]) | _ngrams(fields[2]):
+            posting = self.postings.get(ngram)
+            if posting is not None:
+                posting.discard(mod_id)
+                if not posting:
+                    del self.postings[ngram]
+
+    def _candidates(self, term: str) -> set[int] | None:
+        '''
+        Returns the ids of the mods that may contain term, or None if term is too short to narrow the mods down.
+        '''
+        if len(term) < NGRAM_SIZE:
+            return None
+        postings = sorted((self.postings.get(ngram, set()) for ngram in _ngrams(term)), key=len)
+        if not postings[0]:
+            return set()
+        return set.intersection(*postings)
+
+    def search(self, query: str, within: Iterable[int] | None=None) -> dict[int, int]:
+        '''
+        Returns the ids of the mods that contain every word of query (case-insensitive), mapped to their rank (higher is better).
+        If within is given, only those mods are considered (e.x. the results of a query that this one extends, as the user types).
+        '''
+        terms = query.lower().split()
+        if not terms:
+            return {}
+        return self.score(terms, self.candidates(terms, within))
+
+    def candidates(self, terms: list[str], within: Iterable[int] | None=None) -> Iterable[int]:
+        '''
+        Returns the ids of the mods that may contain every one of terms (lowercase), only out of within if it is given. Pass them to score() to find the ones that do.
+        '''
+        candidates = set(within) if within is not None else None
+        for term in sorted(terms, key=len, reverse=True): #the longest terms narrow the candidates down the most
+            term_candidates = self._candidates(term)
+            if term_candidates is not None:
+                candidates = term_candidates if candidates is None else candidates & term_candidates
+        if candidates is None: #every term is short
+            return self.fields.keys()
+        return candidates
+
+    def score(self, terms: list[str], candidates: Iterable[int]) -> dict[int, int]:
+        '''
+        Returns the ids of the mods out of candidates that contain every one of terms (lowercase), mapped to their rank (higher is better).
+        '''
+        results = {}
+        fields = self.fields
+        for mod_id in candidates:
+            if mod_id not in fields:
+                continue
+            name, source, gamebanana_id = fields[mod_id]
+            score = 0
+            for term in terms:
+                term_score = 0 #only fields that contain the term are scored, most mods match in just one
+                if term in name:
+                    term_score = _field_score(name, term) * NAME_FIELD_WEIGHT
+                if term in source:
+                    term_score = max(term_score, _field_score(source, term) * SOURCE_FIELD_WEIGHT)
+                if term in gamebanana_id:
+                    term_score = max(term_score, _field_score(gamebanana_id, term) * GAMEBANANA_ID_FIELD_WEIGHT)
+                if not term_score:
+                    break
+                score += term_score
+            else:
+                results[mod_id] = score
+        return results
+
+class ModSearchModel(QAbstractListModel):
+    '''
+    The mods of source_model that match the current query, best matches first (ties keep their load order). Rows show the same numbers as in the full mod list,
+    and toggling or renaming a mod here changes it in source_model. Mods can't be dragged while the list is filtered, since the rows aren't in load order.
+    '''
+    def __init__(self, source_model: ModListModel, parent: QObject | None=None) -> None:
+        super().__init__(parent)
+        self.source_model = source_model
+        self.search_index = ModSearchIndex()
+        self.query = ""
+        self.source_rows: list[int] = []
+        self.scores: dict[int, int] | None = None #results of the shown query, reused to narrow down the next query while the user keeps typing
+        self.scores_query = "" #the query that scores and source_rows are the results of, which is behind self.query while a search isn't done
+        self.row_by_mod_id: dict[int, int] | None = None #rows of source_model by mod id, rebuilt only after mods are added, removed or moved
+
+        #the search that is being scored a slice at a time, see _continue_search()
+        self.search_terms: list[str] = []
+        self.search_candidates: list[int] = []
+        self.search_position = 0
+        self.search_scores: dict[int, int] = {}
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(0) #as soon as the events that came in during the last slice are handled
+        self.search_timer.timeout.connect(self._continue_search)
+
+        source_model.modelReset.connect(self._rebuild_index)
+        source_model.rowsInserted.connect(self._index_inserted_rows)
+        source_model.rowsAboutToBeRemoved.connect(self._unindex_removed_rows)
+        source_model.rowsRemoved.connect(self._source_rows_changed)
+        source_model.rowsMoved.connect(self._source_rows_changed)
+        source_model.dataChanged.connect(self._source_data_changed)
+        self._rebuild_index()
+
+    def _rebuild_index(self) -> None:
+        self.search_index.clear()
+        for mod in self.source_model.mods:
+            self.search_index.add_mod(mod)
+        self._source_rows_changed()
+
+    def _index_inserted_rows(self, parent: QModelIndex, first_row: int, last_row: int) -> None:
+        for row in range(first_row, last_row + 1):
+            self.search_index.add_mod(self.source_model.mod_at(row))
+        self._source_rows_changed()
+
+    def _source_rows_changed(self) -> None:
+        self.row_by_mod_id = None
+        self.refresh()
+
+    def _unindex_removed_rows(self, parent: QModelIndex, first_row: int, last_row: int) -> None:
+        for row in range(first_row, last_row + 1):
+            self.search_index.remove(self.source_model.mod_at(row).mod_id)
+
+    def _source_data_changed(self, top_left: QModelIndex, bottom_right: QModelIndex, roles: list[int]=[]) -> None:
+        if Qt.EditRole in roles: #renamed, so the mod may not match anymore (or match differently)
+            for row in range(top_left.row(), bottom_right.row() + 1):
+                self.search_index.add_mod(self.source_model.mod_at(row))
+            self.refresh()
+        elif self.source_rows:
+            self.dataChanged.emit(self.index(0), self.index(len(self.source_rows) - 1), roles)
+
+    def set_query(self, query: str) -> None:
+        '''
+        Filters the rows to the mods matching query, see ModSearchIndex.search(). If query extends the previous query (the user typed more),
+        only the previous results are searched, since nothing else can match.
+        '''
+        self.query = query
+        narrow_down = self.scores is not None and self.scores_query.strip() and query.lower().startswith(self.scores_query.lower())
+        self.refresh(self.scores.keys() if narrow_down else None)
+
+    def refresh(self, within: Iterable[int] | None=None) -> None:
+        '''
+        Runs the current query again (only on the mods in within, if given), dropping the search that is going if there is one. Called whenever the mods in source_model change.
+        The rows change once the query is scored, which is right away unless it takes longer than SEARCH_TIME_BUDGET, see is_searching().
+        '''
+        self.search_timer.stop()
+        self.search_terms = self.query.lower().split()
+        self.search_candidates = list(self.search_index.candidates(self.search_terms, within)) if self.search_terms else []
+        self.search_position = 0
+        self.search_scores = {}
+        self._continue_search()
+
+    def is_searching(self) -> bool:
+        '''
+        Returns True while the current query is still being scored, during which the rows are still the results of the previous query.
+        '''
+        return self.search_timer.isActive()
+
+    def finish_search(self) -> None:
+        '''
+        Scores the rest of the current query right away, if it is still being scored.
+        '''
+        if self.search_timer.isActive():
+            self.search_timer.stop()
+            self._continue_search(time_budget=None)
+
+    def _continue_search(self, time_budget: float | None=SEARCH_TIME_BUDGET) -> None:
+        '''
+        Scores the candidates of the current query for up to time_budget seconds (or all of them if it is None), and shows the results once every candidate is scored.
+        '''
+        deadline = time.perf_counter() + time_budget if time_budget is not None else None
+        while self.search_position < len(self.search_candidates):
+            chunk = self.search_candidates[self.search_position:self.search_position + SEARCH_CHUNK_SIZE]
+            self.search_scores.update(self.search_index.score(self.search_terms, chunk))
+            self.search_position += len(chunk)
+            if deadline is not None and time.perf_counter() > deadline:
+                self.search_timer.start()
+                return
+        self._show_results()
+
+    def _show_results(self) -> None:
+        self.beginResetModel()
+        if self.search_terms:
+            self.scores = self.search_scores
+            if self.row_by_mod_id is None:
+                self.row_by_mod_id = {mod.mod_id: row for row, mod in enumerate(self.source_model.mods)}
+            rows_by_score: dict[int, list[int]] = {} #there are only a few different scores, so sorting the rows of each is much faster than sorting (score, row) pairs
+            row_by_mod_id = self.row_by_mod_id
+            for mod_id, score in self.scores.items():
+                row = row_by_mod_id.get(mod_id)
+                if row is not None:
+                    rows_by_score.setdefault(score, []).append(row)
+            self.source_rows = []
+            for score in sorted(rows_by_score, reverse=True):
+                self.source_rows += sorted(rows_by_score[score])
+        else:
+            self.scores = None
+            self.source_rows = []
+        self.scores_query = self.query
+        self.search_candidates = []
+        self.search_scores = {}
+        self.endResetModel()
+
+    def map_to_source(self, index: QModelIndex) -> QModelIndex:
+        return self.source_model.index(self.source_rows[index.row()]) if index.isValid() else QModelIndex()
+
+    def rowCount(self, parent: QModelIndex=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.source_rows)
+
+    def data(self, index: QModelIndex, role: int=Qt.DisplayRole) -> Any:
+        if not index.isValid() or not 0 <= index.row() < len(self.source_rows):
+            return None
+        if role == HIGHLIGHT_ROLE:
+            mod = self.source_model.mod_at(self.source_rows[index.row()])
+            offset = len(self.source_model.data(self.map_to_source(index), Qt.DisplayRole)) - len(mod.name) #skip the number in front of the name
+            return [(start + offset, length) for start, length in find_match_spans(mod.name, self.scores_query)]
+        return self.source_model.data(self.map_to_source(index), role)
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlags:
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return self.source_model.flags(self.map_to_source(index)) & ~Qt.ItemIsDragEnabled
+
+    def setData(self, index: QModelIndex, value: Any, role: int=Qt.EditRole) -> bool:
+        if not index.isValid():
+            return False
+        return self.source_model.setData(self.map_to_source(index), value, role)
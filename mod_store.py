@@ -0,0 +1,112 @@
+from typing import BinaryIO, Callable
+import hashlib
+import os
+
+HASH_CHUNK_SIZE = 1024 * 1024 #bytes read per iteration when hashing, keeps memory usage flat no matter how large the .vpk is
+INGEST_BUFFER_SIZE = 1024 * 1024 #default buffer size when copying mods out of archives, can be overridden with "ingest_buffer_size" in the settings
+
+'''
+Mods are identified by their content rather than their path, so that the same .vpk is only ever stored once in the mod list.
+A content key is the file size and a streaming sha256 digest of the file, e.x. "10485760:9f86d08...". It is computed once when a mod
+is added and stored with the mod's row in the mod library (file_size and content_hash, see ModLibrary in mod_library.py),
+so duplicate checks never need to read any other mod from disk again.
+'''
+
+def make_content_key(file_size: int, content_hash: str) -> str:
+    '''
+    Combines a file size and a hex digest into the key used by ContentHashIndex.
+    '''
+    return f"{file_size}:{content_hash}"
+
+def compute_content_hash(file_path: str, chunk_size: int=HASH_CHUNK_SIZE) -> tuple[int, str]:
+    '''
+    Streams the file at file_path through a sha256 digest, chunk_size bytes at a time.
+    Returns a tuple containing the file size in bytes and the hex digest of the file's contents.
+    Raises OSError if the file cannot be read.
+    '''
+    digest = hashlib.sha256()
+    file_size = 0
+    with open(file_path, "rb") as file:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            file_size += len(chunk)
+    return file_size, digest.hexdigest()
+
+def copy_stream_with_hash(source_file: BinaryIO, target_path: str, buffer_size: int=INGEST_BUFFER_SIZE, total_size: int=0,
+                          progress_callback: Callable[[int, int], None] | None=None) -> tuple[int, str]:
+    '''
+    Copies source_file (any readable binary stream, like a zipfile.ZipExtFile) to target_path in chunks of buffer_size bytes,
+    computing the sha256 digest of the contents in the same pass. At most one buffer is held in memory at a time, no matter how large the file is.
+    If progress_callback is given, it is called after every chunk with the number of bytes copied so far and total_size (0 if unknown).
+    Returns a tuple containing the file size in bytes and the hex digest, the same as compute_content_hash() would for the written file.
+    '''
+    buffer_size = max(buffer_size, 1)
+    digest = hashlib.sha256()
+    file_size = 0
+    with open(target_path, "wb") as target_file:
+        while True:
+            chunk = source_file.read(buffer_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            target_file.write(chunk)
+            file_size += len(chunk)
+            if progress_callback:
+                progress_callback(file_size, total_size)
+    return file_size, digest.hexdigest()
+
+class ContentHashIndex:
+    '''
+    In-memory index of the mods in the mod list, mapping content keys to file paths (and back).
+    Lookups are constant time, so checking a newly added mod for duplicates does not depend on the size of the mod library.
+    '''
+    def __init__(self) -> None:
+        self._paths_by_key = {}
+        self._keys_by_path = {}
+
+    def __len__(self) -> int:
+        return len(self._keys_by_path)
+
+    def add(self, content_key: str, file_path: str) -> None:
+        '''
+        Registers the mod at file_path under content_key. Replaces any key previously registered for the same file path.
+        If another file path is already registered with the same key, that file path is kept as the original.
+        '''
+        if not content_key:
+            return
+        file_path = os.path.normcase(os.path.abspath(file_path))
+        self.remove(file_path)
+        self._keys_by_path[file_path] = content_key
+        self._paths_by_key.setdefault(content_key, file_path)
+
+    def remove(self, file_path: str) -> None:
+        '''
+        Removes the mod at file_path from the index, if present.
+        '''
+        file_path = os.path.normcase(os.path.abspath(file_path))
+        content_key = self._keys_by_path.pop(file_path, None)
+        if content_key and self._paths_by_key.get(content_key) == file_path:
+            del self._paths_by_key[content_key]
+            for other_path, other_key in self._keys_by_path.items(): #promote another mod with the same content, if one somehow exists
+                if other_key == content_key:
+                    self._paths_by_key[content_key] = other_path
+                    break
+
+    def find(self, content_key: str) -> str | None:
+        '''
+        Returns the file path of the mod registered with content_key, or None if no mod has that content.
+        '''
+        return self._paths_by_key.get(content_key)
+
+    def contains_path(self, file_path: str) -> bool:
+        '''
+        Returns True if the mod at file_path is registered in the index, False if not.
+        '''
+        return os.path.normcase(os.path.abspath(file_path)) in self._keys_by_path
+
+    def clear(self) -> None:
+        self._paths_by_key.clear()
+        self._keys_by_path.clear()
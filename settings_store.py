@@ -0,0 +1,128 @@
+from PyQt5.QtCore import (QObject, QTimer)
+
+from typing import Any, Callable
+import threading
+import json
+import os
+
+from constants import *
+
+SETTINGS_WRITE_DELAY = 500 #milliseconds, changes made within this window of each other are written to the settings file together
+
+'''
+Every part of the mod manager reads and changes its settings through a single SettingsStore, which keeps the settings in memory and writes them behind the changes.
+A change only marks the store as dirty and starts a short timer, so a burst of changes ends up as a single write once it is over.
+Values that are expensive to build can be given as a callable with set_deferred(), which is only called once per write.
+
+Writes go to a temporary file next to the settings file, which is flushed to disk and then renamed over it, so the settings file is never left half written
+if the application crashes or the computer loses power. Call flush() before exiting to write any pending changes.
+'''
+
+class SettingsStore(QObject):
+    '''
+    In-memory settings with coalesced, atomic writes to file_path. Must be used from the GUI thread (the write timer belongs to it).
+    '''
+    def __init__(self, file_path: str=SETTINGS_FILE_PATH, write_delay: int=SETTINGS_WRITE_DELAY, parent: QObject | None=None) -> None:
+        super().__init__(parent)
+        self.file_path = file_path
+        self.settings: dict[str, Any] = {}
+        self.deferred_values: dict[str, Callable[[], Any]] = {}
+        self.dirty = False
+        self.write_count = 0 #number of times the settings file was actually written, useful for checking that changes are coalesced
+        self.write_lock = threading.Lock()
+
+        self.write_timer = QTimer(self)
+        self.write_timer.setSingleShot(True)
+        self.write_timer.setInterval(write_delay)
+        self.write_timer.timeout.connect(self.flush)
+
+    def load(self) -> bool:
+        '''
+        Loads the settings from file_path, replacing the ones in memory. If the file doesn't exist, a blank settings file is created.
+        Returns True if the settings were loaded (or created) successfully, False if not.
+        '''
+        try:
+            if os.path.exists(self.file_path):
+                with open(self.file_path, "r", encoding="utf-8") as settings_file:
+                    self.settings = json.load(settings_file)
+                self.deferred_values.clear()
+                self.dirty = False
+                return True
+            self.settings = {"game_folder_location": "", "rar_tool_location": ""}
+            self.deferred_values.clear()
+            self.dirty = True
+            return self.flush()
+        except (OSError, ValueError) as e:
+            print("Error with loading settings: " + str(e))
+            return False
+
+    def get(self, key: str, default: Any=None) -> Any:
+        '''
+        Returns the value of key, or default if it isn't set. Deferred values are built when they are requested.
+        '''
+        if key in self.deferred_values:
+            return self.deferred_values[key]()
+        return self.settings.get(key, default)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.deferred_values or key in self.settings
+
+    def set(self, key: str, value: Any) -> None:
+        '''
+        Sets key to value and schedules a write. value must be serializable to json.
+        '''
+        self.deferred_values.pop(key, None)
+        self.settings[key] = value
+        self.schedule_write()
+
+    def remove(self, key: str) -> None:
+        '''
+        Removes key from the settings if it is set, and schedules a write.
+        '''
+        if key in self:
+            self.deferred_values.pop(key, None)
+            self.settings.pop(key, None)
+            self.schedule_write()
+
+    def set_deferred(self, key: str, value_function: Callable[[], Any]) -> None:
+        '''
+        Sets key to the value returned by value_function, which is only called when the settings are written (once per write, no matter how many times this is called before).
+        '''
+        self.deferred_values[key] = value_function
+        self.schedule_write()
+
+    def schedule_write(self) -> None:
+        '''
+        Marks the settings as changed, and starts the write timer if it isn't running already. Any changes made before it runs out are written together.
+        '''
+        self.dirty = True
+        if not self.write_timer.isActive():
+            self.write_timer.start()
+
+    def flush(self) -> bool:
+        '''
+        Writes the settings to file_path right away if there are unsaved changes. Returns True if the settings file is up to date, False if it couldn't be written
+        (the changes stay pending and are tried again on the next write).
+        '''
+        self.write_timer.stop()
+        if not self.dirty:
+            return True
+        with self.write_lock:
+            try:
+                for key, value_function in self.deferred_values.items():
+                    self.settings[key] = value_function()
+                self.deferred_values.clear()
+                serialized_settings = json.dumps(self.settings, indent=JSON_INDENT_AMOUNT)
+
+                temporary_path = self.file_path + ".tmp"
+                with open(temporary_path, "w", encoding="utf-8") as settings_file:
+                    settings_file.write(serialized_settings)
+                    settings_file.flush()
+                    os.fsync(settings_file.fileno())
+                os.replace(temporary_path, self.file_path)
+            except (OSError, TypeError, ValueError) as e:
+                print("Error with saving settings: " + str(e))
+                return False
+            self.dirty = False
+            self.write_count += 1
+            return True
@@ -1,7 +1,6 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QPushButton, QFileDialog, QMessageBox)
 from PyQt5.QtGui import QIcon
 
-import json
 import rarfile
 
 from constants import *
@@ -30,6 +29,14 @@ class SettingsMenuWidget(QWidget):
         self.view_folder_button.clicked.connect(main_window.open_application_directory)
         self.layout.addWidget(self.view_folder_button)
 
+        self.preview_deployment_button = QPushButton("Preview Mod Configuration Changes")
+        self.preview_deployment_button.clicked.connect(main_window.preview_mod_deployment)
+        self.layout.addWidget(self.preview_deployment_button)
+
+        self.rollback_deployment_button = QPushButton("Roll Back to Previous Mod Configuration")
+        self.rollback_deployment_button.clicked.connect(main_window.rollback_mod_deployment)
+        self.layout.addWidget(self.rollback_deployment_button)
+
         self.find_unrar_tool_button = QPushButton("Set .rar tool")
         self.find_unrar_tool_button.clicked.connect(self.set_rar_tool)
         self.layout.addWidget(self.find_unrar_tool_button)
@@ -46,14 +53,11 @@ class SettingsMenuWidget(QWidget):
         '''
         tool_location, _ = QFileDialog.getOpenFileName(self, self.tr("Locate rar file tool"), "/home")
         if tool_location:
-            try:
-                settings = {}
-                with open(SETTINGS_FILE_PATH, "r", encoding="utf-8") as settings_file:
-                    settings = json.load(settings_file)
-                settings["rar_tool_location"] = tool_location
-                with open(SETTINGS_FILE_PATH, "w", encoding="utf-8") as settings_file:
-                    json.dump(settings, settings_file, indent=JSON_INDENT_AMOUNT)
-                rarfile.UNRAR_TOOL = tool_location
-                self.main_window.rar_tool_found = True
-            except:
-               QMessageBox(self, "Error", "Could not save rar tool location to settings file.")
\ No newline at end of file
+            self.main_window.settings_store.set("rar_tool_location", tool_location)
+            rarfile.UNRAR_TOOL = tool_location
+            self.main_window.rar_tool_found = True
+            if not self.main_window.settings_store.flush(): #written right away, since this is a deliberate one off change
+                QMessageBox.information(self, "Error", "Could not save rar tool location to settings file.")
+                return False
+            return True
+        return False
@@ -0,0 +1,68 @@
+from contextlib import contextmanager
+from typing import Iterator
+import time
+
+'''
+Timings of the phases of the mod manager's startup, so that a change that makes startup slower shows up as a number instead of a feeling.
+The startup is split into the phases that run before the window is shown (creating the application, loading the fonts and stylesheet, building the window)
+and the ones that run on the event loop once it has been painted (loading the settings, finding a .rar tool, reading the mod library and filling the mod list in batches).
+
+Each phase is timed with phase() (or mark() for time spent waiting on the event loop, e.x. for the first paint), and report() lists them
+along with the time since the timer was created. The report is printed to the console once the mod list has finished loading.
+'''
+
+class StartupTimer:
+    '''
+    Records how long each phase of the startup took, in the order they ran. Create it as early as possible, the total is measured from its creation.
+    '''
+    def __init__(self) -> None:
+        self.start_time = time.perf_counter()
+        self.last_time = self.start_time #when the last phase or mark ended
+        self.phases: list[tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        '''
+        Times the with block as the phase name.
+        '''
+        phase_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.last_time = time.perf_counter()
+            self.phases.append((name, self.last_time - phase_start))
+
+    def mark(self, name: str) -> None:
+        '''
+        Records the time since the last phase or mark ended as the phase name, e.x. the time until the window was first painted.
+        '''
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last_time))
+        self.last_time = now
+
+    def add(self, name: str, seconds: float) -> None:
+        '''
+        Adds seconds to the phase name (creating it if needed), for phases that are spread over several event loop iterations, e.x. filling the mod list in batches.
+        '''
+        for i, (phase_name, phase_seconds) in enumerate(self.phases):
+            if phase_name == name:
+                self.phases[i] = (name, phase_seconds + seconds)
+                return
+        self.phases.append((name, seconds))
+
+    def elapsed(self) -> float:
+        '''
+        Returns the seconds since the timer was created.
+        '''
+        return time.perf_counter() - self.start_time
+
+    def report(self) -> str:
+        '''
+        Returns every phase with its time in milliseconds, followed by the total time since the timer was created.
+        '''
+        name_width = max([len(name) for name, _ in self.phases] + [len("total")])
+        lines = ["Startup timings:"]
+        for name, seconds in self.phases:
+            lines.append(f"  {name.ljust(name_width)} {seconds * 1000:8.1f} ms")
+        lines.append(f"  {'total'.ljust(name_width)} {self.elapsed() * 1000:8.1f} ms")
+        return "\n".join(lines)